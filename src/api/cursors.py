@@ -0,0 +1,89 @@
+"""
+分页游标模块 - 邻域展开的断点续查
+"""
+import base64
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+def encode_cursor(offset: int, token: Optional[str] = None) -> str:
+    """不透明游标：已输出行数 + 挂起展开的令牌"""
+    payload = json.dumps({'o': offset, 't': token}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, Optional[str]]:
+    """解析游标，返回 (offset, token)；不合法时抛出 ValueError"""
+    if not cursor:
+        return 0, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        offset, token = int(payload['o']), payload.get('t')
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("invalid cursor")
+    if offset < 0 or (token is not None and not isinstance(token, str)):
+        raise ValueError("invalid cursor")
+    return offset, token
+
+
+class CursorRegistry:
+    """挂起的邻域展开
+
+    一页输出完时，展开的生成器（连同已访问节点、已输出关系等状态）和多读出的一行按令牌保存，
+    下一页从断点继续展开，代价只与页大小有关，期间的写入也不会让已输出的行错位。
+    令牌只能使用一次；过期、被淘汰或落在其他工作进程时，调用方退回按 offset 重新展开。
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # 令牌 -> (查询键, 行生成器, 多读出的一行, 过期时间)
+        self._entries: 'OrderedDict[str, Tuple[Hashable, Any, Any, float]]' = OrderedDict()
+
+    def _expire(self, now: float) -> List[Any]:
+        """移除已过期的挂起展开（按写入顺序即过期顺序），返回其生成器"""
+        expired = []
+        while self._entries:
+            token, entry = next(iter(self._entries.items()))
+            if entry[3] >= now:
+                break
+            del self._entries[token]
+            expired.append(entry[1])
+        return expired
+
+    def put(self, query: Hashable, rows, pending) -> Tuple[str, List[Any]]:
+        """保存挂起的展开，返回 (令牌, 需要关闭的过期或被淘汰的生成器)"""
+        now = time.monotonic()
+        evicted = self._expire(now)
+        while len(self._entries) >= self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            evicted.append(entry[1])
+        token = uuid.uuid4().hex
+        self._entries[token] = (query, rows, pending, now + self.ttl)
+        return token, evicted
+
+    def take(self, token: Optional[str], query: Hashable) -> Tuple[Optional[Tuple[Any, Any]], List[Any]]:
+        """取出令牌对应的 (行生成器, 多读出的一行)，查询参数不一致或已过期时为None；
+        同时返回需要关闭的过期生成器"""
+        expired = self._expire(time.monotonic())
+        entry = self._entries.get(token) if token is not None else None
+        if entry is None or entry[0] != query:
+            return None, expired
+        del self._entries[token]
+        return (entry[1], entry[2]), expired
+
+    def clear(self) -> List[Any]:
+        rows = [entry[1] for entry in self._entries.values()]
+        self._entries.clear()
+        return rows
+
+
+# 全局实例
+neighborhood_cursors = CursorRegistry(
+    max_entries=int(os.getenv('QUERY_CURSOR_MAX_ENTRIES', '256')),
+    ttl=float(os.getenv('QUERY_CURSOR_TTL', '300'))
+)
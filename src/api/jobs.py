@@ -0,0 +1,173 @@
+"""
+批量抽取任务队列 - 进程池工作层
+"""
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from src.extraction.triple_generator import generate_batch_in_worker, init_worker
+
+
+class QueueFullError(Exception):
+    """排队任务数已达上限"""
+
+
+class ExtractionJob:
+    """一次批量抽取任务，结果按完成顺序追加，附带原文档序号"""
+
+    def __init__(self, texts: List[str], source: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.texts = texts
+        self.total = len(texts)
+        self.source = source
+        self.status = 'queued'
+        self.error: Optional[str] = None
+        self.results: List[Dict] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait(self, seen: int):
+        """等待直到有超过 seen 条结果或任务结束"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.results) > seen or self.done)
+
+    def summary(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'completed': len(self.results),
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ExtractionJobQueue:
+    """批量抽取任务队列
+
+    文档按 chunk_size 切块后提交到进程池，每个工作进程持有一份已加载模型的抽取流水线。
+    同时在途的块数受 concurrency 限制，排队和运行中的任务数受 queue_depth 限制，
+    超出时拒绝提交，避免批量导入占满工作层、拖慢在线查询。
+    workers=0 时在事件循环的默认线程池中执行（调试用）。
+    """
+
+    def __init__(self, workers: int = 2, concurrency: int = None, queue_depth: int = 100,
+                 chunk_size: int = 32, max_documents: int = 10000, job_ttl: float = 3600.0):
+        self.workers = workers
+        self.concurrency = concurrency or max(workers, 1)
+        self.queue_depth = queue_depth
+        self.chunk_size = chunk_size
+        self.max_documents = max_documents
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, ExtractionJob] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_started(self):
+        # 进程池在首个任务提交时才创建，导入API模块不会拉起工作进程
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._executor is None and self.workers > 0:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=init_worker)
+        elif self.workers == 0:
+            init_worker()
+
+    def pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.done)
+
+    def submit(self, texts: List[str], source: Optional[str] = None) -> ExtractionJob:
+        """提交任务，返回任务对象；队列已满时抛出 QueueFullError"""
+        if not texts:
+            raise ValueError("texts must not be empty")
+        if len(texts) > self.max_documents:
+            raise ValueError(f"at most {self.max_documents} documents per job")
+        self._prune()
+        if self.pending() >= self.queue_depth:
+            raise QueueFullError(f"extraction queue is full ({self.queue_depth} jobs)")
+
+        self._ensure_started()
+        job = ExtractionJob(texts, source)
+        self.jobs[job.id] = job
+        # 持有任务引用，避免运行中被回收
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[ExtractionJob]:
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: ExtractionJob):
+        loop = asyncio.get_running_loop()
+
+        async def run_chunk(start: int):
+            chunk = job.texts[start:start + self.chunk_size]
+            async with self._semaphore:
+                if job.status == 'queued':
+                    job.status = 'running'
+                results = await loop.run_in_executor(
+                    self._executor, generate_batch_in_worker, chunk, job.source, self.chunk_size
+                )
+            for offset, result in enumerate(results):
+                job.results.append({'index': start + offset, **result})
+            await job._notify()
+
+        tasks = [asyncio.ensure_future(run_chunk(start)) for start in range(0, len(job.texts), self.chunk_size)]
+        try:
+            await asyncio.gather(*tasks)
+            job.status = 'done'
+        except Exception as e:
+            # 任一块失败即取消其余块：排队中的块不再提交到进程池，已在执行的块结果丢弃
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.texts = []
+            await job._notify()
+
+    def _prune(self):
+        """清理超过保留时间的已结束任务"""
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.done and now - job.finished_at > self.job_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'concurrency': self.concurrency,
+            'queue_depth': self.queue_depth,
+            'pending': self.pending(),
+            'jobs': len(self.jobs)
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 全局实例
+extraction_queue = ExtractionJobQueue(
+    workers=int(os.getenv('EXTRACT_WORKERS', '2')),
+    concurrency=int(os.getenv('EXTRACT_CONCURRENCY', '0')) or None,
+    queue_depth=int(os.getenv('EXTRACT_QUEUE_DEPTH', '100')),
+    chunk_size=int(os.getenv('EXTRACT_CHUNK_SIZE', '32')),
+    max_documents=int(os.getenv('EXTRACT_MAX_DOCUMENTS', '10000'))
+)
@@ -1,14 +1,56 @@
 """
 FastAPI 服务
 """
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Optional
-import uvicorn
+import asyncio
+import inspect
+import json
+import os
+from urllib.parse import quote
 
+from src.extraction.entity_normalizer import entity_normalizer
+from src.extraction.extraction_cache import extraction_cache
+from src.extraction.ner import ner_extractor
 from src.extraction.triple_generator import triple_generator
-from src.storage.neo4j_store import kg_store
+from src.api.cursors import decode_cursor, encode_cursor, neighborhood_cursors
+from src.api.jobs import QueueFullError, extraction_queue
+from src.storage.cache import graph_cache
+from src.storage.cypher import MAX_REPORTED_REJECTIONS, check_identifier, new_bulk_report
+from src.storage.fuzzy_index import fuzzy_index
+from src.storage.vector_store import entity_vectors
+from src.utils.lazy import LazyProxy
+
+# 存储后端: neo4j（默认）或 memory（进程内CSR图）
+KG_BACKEND = os.getenv('KG_BACKEND', 'neo4j')
+
+def _create_store():
+    """按后端创建存储；驱动和图数据在首次使用时才导入/加载"""
+    if KG_BACKEND == 'memory':
+        from src.storage.memory_store import InMemoryGraphStore
+        if os.getenv('KG_SNAPSHOT'):
+            return InMemoryGraphStore.open_snapshot(os.getenv('KG_SNAPSHOT'))
+        return InMemoryGraphStore.from_files(os.getenv('KG_DATA_DIR', 'data/processed'))
+    from src.storage.neo4j_driver_store import async_kg_store
+    return async_kg_store.get()
+
+kg_store = LazyProxy(_create_store, 'kg_store')
+
+# 启动时预热的组件，逗号分隔: extraction（加载NER模型）、store（创建存储并加载图数据）、fuzzy（建立模糊检索索引）、
+# vectors（加载实体向量索引，不存在时建立）
+API_WARMUP = os.getenv('API_WARMUP', '')
+
+# 内存后端路径查询的默认扩展节点预算
+PATH_MAX_EXPANSIONS = int(os.getenv('PATH_MAX_EXPANSIONS', '100000'))
+
+# 模糊检索索引的后台刷新间隔（秒），图谱有写入时才重建；0 表示不自动刷新
+FUZZY_REFRESH_SECONDS = float(os.getenv('FUZZY_REFRESH_SECONDS', '300'))
+# /kg/query 模糊解析实体名称时的最低相似度
+FUZZY_MIN_SCORE = float(os.getenv('FUZZY_MIN_SCORE', '0.5'))
 
 app = FastAPI(
     title="专病知识图谱 API",
@@ -30,6 +72,10 @@ class TextInput(BaseModel):
     text: str
     source: Optional[str] = None
 
+class BatchTextInput(BaseModel):
+    texts: List[str]
+    source: Optional[str] = None
+
 class TripleInput(BaseModel):
     head: str
     head_type: str
@@ -38,16 +84,127 @@ class TripleInput(BaseModel):
     tail_type: str
     properties: Optional[Dict] = None
 
+@app.on_event("startup")
+async def warm_up():
+    """按 API_WARMUP 预先加载模型/存储，避免首个请求承担初始化延迟"""
+    components = _split(API_WARMUP) or []
+    if 'extraction' in components:
+        await run_in_threadpool(ner_extractor.get)
+    if 'store' in components:
+        await run_in_threadpool(kg_store.get)
+    if 'fuzzy' in components:
+        await _refresh_fuzzy_index()
+    if 'vectors' in components:
+        await _ensure_vector_index()
+
+_fuzzy_lock = asyncio.Lock()
+_background_tasks = set()
+
+async def _refresh_fuzzy_index():
+    """从存储读取全部实体名称并在线程池中重建模糊检索索引，同一时间只有一次重建"""
+    async with _fuzzy_lock:
+        # 先记下代数再读取实体：读取和重建期间的写入会让索引保持 stale
+        generation = fuzzy_index.generation
+        entries = await _call(kg_store.entity_names)
+        await run_in_threadpool(fuzzy_index.build, entries, generation)
+
+async def _ensure_fuzzy_index():
+    if not fuzzy_index.ready:
+        await _refresh_fuzzy_index()
+
+_vector_lock = asyncio.Lock()
+
+async def _ensure_vector_index():
+    """加载实体向量索引；磁盘上没有可用索引时从存储读取实体建立"""
+    store = await run_in_threadpool(entity_vectors.get)
+    if store.ready:
+        return
+    async with _vector_lock:
+        if not store.ready:
+            entries = await _call(kg_store.entity_names)
+            await run_in_threadpool(store.build, entries)
+
+@app.on_event("startup")
+async def start_fuzzy_refresh():
+    """后台定期刷新模糊检索索引（索引在首次使用后才参与刷新）"""
+    if FUZZY_REFRESH_SECONDS <= 0:
+        return
+
+    async def refresh_loop():
+        while True:
+            await asyncio.sleep(FUZZY_REFRESH_SECONDS)
+            if fuzzy_index.ready and fuzzy_index.stale:
+                try:
+                    await _refresh_fuzzy_index()
+                except Exception as e:
+                    print(f"模糊检索索引刷新失败: {e}")
+
+    task = asyncio.get_running_loop().create_task(refresh_loop())
+    _background_tasks.add(task)
+
+@app.on_event("startup")
+async def ensure_schema():
+    """启动时创建缺失的约束和索引"""
+    try:
+        report = await _call(kg_store.ensure_schema)
+        for name, error in report['failed'].items():
+            print(f"约束/索引创建失败 {name}: {error}")
+        missing = await _call(kg_store.missing_indexes)
+        if missing:
+            print(f"缺失或未上线的索引: {missing}")
+    except Exception as e:
+        print(f"图谱模式初始化失败: {e}")
+
+@app.on_event("shutdown")
+async def close_store():
+    for task in _background_tasks:
+        task.cancel()
+    extraction_queue.shutdown()
+    triple_generator.shutdown()
+    if extraction_cache is not None:
+        extraction_cache.close()
+    for rows in neighborhood_cursors.clear():
+        await _close_rows(rows)
+    if entity_vectors.initialized:
+        entity_vectors.close()
+    # 未使用过的存储无需创建后再关闭
+    if kg_store.initialized and hasattr(kg_store, 'close'):
+        await _call(kg_store.close)
+
+async def _call(func, *args):
+    """兼容同步（内存）和异步（Neo4j）存储后端；同步方法在线程池中执行，不阻塞事件循环"""
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    result = await run_in_threadpool(func, *args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+NDJSON = "application/x-ndjson"
+
+def _json_response(content: bytes) -> Response:
+    return Response(content=content, media_type="application/json")
+
+def _encode(payload: Dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    """逗号分隔的查询参数"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()] or None
+
 # API端点
 @app.get("/")
-def root():
+async def root():
     return {"message": "专病知识图谱 API", "version": "0.1.0"}
 
 @app.post("/extract/triples")
-def extract_triples(input: TextInput):
+async def extract_triples(input: TextInput):
     """从文本提取三元组"""
     try:
-        result = triple_generator.generate_from_text(input.text, input.source)
+        # CPU密集的抽取放到线程池，避免阻塞事件循环
+        result = await run_in_threadpool(triple_generator.generate_from_text, input.text, input.source)
         return {
             "success": True,
             "data": result
@@ -55,42 +212,376 @@ def extract_triples(input: TextInput):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/extract/cache/stats")
+async def get_extraction_cache_stats():
+    """获取抽取结果缓存统计"""
+    if extraction_cache is None:
+        return {"success": True, "data": None}
+    return {
+        "success": True,
+        "data": await run_in_threadpool(extraction_cache.stats)
+    }
+
+@app.post("/extract/batch", status_code=202)
+async def submit_batch(input: BatchTextInput):
+    """提交批量抽取任务，返回任务ID"""
+    try:
+        job = extraction_queue.submit(input.texts, input.source)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **job.summary()}
+
+def _get_job(job_id: str):
+    job = extraction_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job {job_id} not found")
+    return job
+
+@app.get("/extract/batch/{job_id}")
+async def get_batch(
+    job_id: str,
+    offset: int = Query(0, description="从第几条已完成结果开始返回", ge=0),
+    include_results: bool = Query(True, description="是否返回结果")
+):
+    """查询批量抽取任务状态和已完成的结果（按完成顺序，index 为原文档序号）"""
+    job = _get_job(job_id)
+    response = {"success": True, **job.summary()}
+    if include_results:
+        response["data"] = job.results[offset:]
+    return response
+
+@app.get("/extract/batch/{job_id}/stream")
+async def stream_batch(job_id: str):
+    """以NDJSON流式返回任务结果，完成一条输出一条，末行为任务状态"""
+    job = _get_job(job_id)
+
+    async def lines():
+        seen = 0
+        while True:
+            await job.wait(seen)
+            results = job.results
+            while seen < len(results):
+                yield _encode(results[seen]) + b'\n'
+                seen += 1
+            if job.done and seen >= len(job.results):
+                break
+        yield _encode({"success": job.status == 'done', **job.summary()}) + b'\n'
+
+    return StreamingResponse(lines(), media_type=NDJSON)
+
 @app.post("/kg/add-triple")
-def add_triple(triple: TripleInput):
-    """添加三元组到知识图谱"""
+async def add_triple(triple: TripleInput):
+    """添加三元组到知识图谱（幂等：重复提交只合并置信度和来源）"""
     try:
-        kg_store.add_triple(
+        inserted = await _call(
+            kg_store.add_triple,
             triple.head, triple.head_type,
             triple.relation,
             triple.tail, triple.tail_type,
             triple.properties
         )
-        return {"success": True, "message": "三元组添加成功"}
+        fuzzy_index.mark_stale()
+        return {
+            "success": True,
+            "inserted": bool(inserted),
+            "message": "三元组添加成功" if inserted else "三元组已存在，已合并属性"
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _normalize_triple(item: Dict) -> Dict:
+    """请求中的三元组：顶层 confidence/source 并入 properties"""
+    item = dict(item)
+    properties = item.get('properties')
+    if properties is None:
+        properties = {}
+    if isinstance(properties, dict):
+        properties = dict(properties)
+        for field in ('confidence', 'source'):
+            if field in item and field not in properties:
+                properties[field] = item.pop(field)
+    item['properties'] = properties
+    return item
+
+async def _iter_request_items(request: Request):
+    """逐条解析请求体：NDJSON 按行流式读取，否则为JSON数组（或 {"triples": [...]}）；无法解析的条目产出异常对象"""
+    content_type = request.headers.get('content-type', '')
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        buffer = b''
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        body = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"invalid JSON body: {e}")
+    if isinstance(body, dict):
+        body = body.get('triples')
+    if not isinstance(body, list):
+        raise HTTPException(status_code=400, detail="body must be a JSON array of triples or NDJSON")
+    for item in body:
+        yield item
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"invalid JSON line: {e}")
+
+@app.post("/kg/add-triples")
+async def add_triples(
+    request: Request,
+    batch_size: int = Query(5000, description="每批写入的三元组数", ge=1, le=50000)
+):
+    """批量幂等写入三元组，请求体为JSON数组或NDJSON，按批返回插入/更新/拒绝数"""
+    totals = {'total': 0, 'inserted': 0, 'updated': 0, 'rejected': 0, 'failed': 0}
+    batches = []
+
+    async def write_batch(items: List[Dict], positions: List[int], rejections: List[Dict]):
+        # rejections 为解析阶段已拒绝的条目，positions 为 items 在请求中的序号
+        size = len(items) + len(rejections)
+        report = await _call(kg_store.bulk_add_triples, items, batch_size) if items else new_bulk_report()
+        if report['inserted']:
+            fuzzy_index.mark_stale()
+        rejected = report['rejected'] + len(rejections)
+        rejections = rejections + [{**r, 'row': positions[r['row']]} for r in report['rejections']]
+        batch = {
+            'batch': len(batches) + 1,
+            'size': size,
+            'inserted': report['inserted'],
+            'updated': report['updated'],
+            'rejected': rejected,
+            'failed': report['failed'],
+            'rejections': sorted(rejections, key=lambda r: r['row'])[:MAX_REPORTED_REJECTIONS],
+            'failures': report['failures']
+        }
+        batches.append(batch)
+        for field in ('inserted', 'updated', 'rejected', 'failed'):
+            totals[field] += batch[field]
+
+    items, positions, rejections = [], [], []
+    async for item in _iter_request_items(request):
+        index = totals['total']
+        totals['total'] += 1
+        if isinstance(item, dict):
+            items.append(_normalize_triple(item))
+            positions.append(index)
+        else:
+            error = str(item) if isinstance(item, ValueError) else "triple must be a JSON object"
+            rejections.append({'row': index, 'error': error})
+        if len(items) + len(rejections) >= batch_size:
+            await write_batch(items, positions, rejections)
+            items, positions, rejections = [], [], []
+    if items or rejections:
+        await write_batch(items, positions, rejections)
+
+    return {"success": totals['failed'] == 0, **totals, "batches": batches}
+
+# 超过该大小的邻域分页不写入缓存
+QUERY_CACHE_MAX_BYTES = 1 << 20
+
+async def _aiter(rows):
+    """兼容同步生成器（内存）和异步生成器（Neo4j）"""
+    if hasattr(rows, '__aiter__'):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+async def _close_rows(rows):
+    if hasattr(rows, 'aclose'):
+        await rows.aclose()
+    elif hasattr(rows, 'close'):
+        rows.close()
+
+async def _stream_neighborhood(key, query, name: str, rows, pending, skip: int, offset: int, limit: int):
+    """逐行输出NDJSON，末行为分页信息；整页不超过缓存上限时写入缓存
+
+    rows 为展开生成器：续查时是挂起的生成器（pending 为上一页多读出的一行），
+    否则是新的展开并跳过前 skip 行。还有下一页时生成器挂起到 neighborhood_cursors，不关闭。
+    """
+    chunks, size = [], 0
+    names = {name}
+    count = 0
+    token = None
+    try:
+        if pending is not None:
+            rows_iter = _prepend(pending, rows)
+        else:
+            rows_iter = _aiter(rows)
+        async for row in rows_iter:
+            if skip:
+                skip -= 1
+                continue
+            if count >= limit:
+                token, evicted = neighborhood_cursors.put(query, rows, row)
+                for old in evicted:
+                    await _close_rows(old)
+                break
+            line = _encode(row) + b'\n'
+            yield line
+            count += 1
+            names.update((row['n'].get('name'), row['m'].get('name')))
+            if chunks is not None:
+                size += len(line)
+                if size <= QUERY_CACHE_MAX_BYTES:
+                    chunks.append(line)
+                else:
+                    chunks = None
+    except Exception as e:
+        # 响应头已发送，只能以错误行结束
+        yield _encode({"success": False, "error": str(e)}) + b'\n'
+        return
+    finally:
+        if token is None:
+            await _close_rows(rows)
+
+    tail = _encode({
+        "success": True,
+        "entity": name,
+        "count": count,
+        "next_cursor": encode_cursor(offset + count, token) if token is not None else None
+    }) + b'\n'
+    yield tail
+    if chunks is not None:
+        chunks.append(tail)
+        graph_cache.set(key, b''.join(chunks), entities=names)
+
+async def _prepend(first, rows):
+    yield first
+    async for row in _aiter(rows):
+        yield row
+
 @app.get("/kg/query")
-def query_entity(
+async def query_entity(
     name: str = Query(..., description="实体名称"),
-    depth: int = Query(1, description="查询深度", ge=1, le=3)
+    depth: int = Query(1, description="查询深度", ge=1, le=3),
+    type: Optional[str] = Query(None, description="实体类型"),
+    relations: Optional[str] = Query(None, description="允许的关系类型，逗号分隔"),
+    labels: Optional[str] = Query(None, description="允许的邻居节点类型，逗号分隔"),
+    fanout: str = Query("50", description="每跳每个节点最多展开的关系数，逗号分隔按跳指定，如 50,20,10"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    limit: int = Query(500, description="每页行数", ge=1, le=5000),
+    fuzzy: bool = Query(False, description="名称不精确时按模糊检索的最相似实体查询")
 ):
-    """查询实体相关知识"""
+    """多跳查询实体邻域，以NDJSON流式返回，每行一条关系，末行为分页信息"""
     try:
-        results = kg_store.query_by_entity(name)
+        relation_list, label_list = _split(relations), _split(labels)
+        for identifier in (relation_list or []) + (label_list or []):
+            check_identifier(identifier)
+        fanout_list = [int(value) for value in _split(fanout) or ()]
+        if not fanout_list or min(fanout_list) < 1:
+            raise ValueError("fanout must be positive integers")
+        offset, token = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 别名/变体先归一为规范名称，缓存键和失效标记都以规范名称为准
+    name = entity_normalizer.canonical_name(name, type)
+    if fuzzy:
+        try:
+            await _ensure_fuzzy_index()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        matches = fuzzy_index.search([name], 1, type, FUZZY_MIN_SCORE)[0]
+        if matches:
+            name = matches[0]['name']
+    headers = {"X-Resolved-Name": quote(name)}
+    query = ('query', name, type, depth, tuple(relation_list or ()), tuple(label_list or ()), tuple(fanout_list))
+    key = query + (cursor, limit)
+    cached = graph_cache.get(key)
+    if cached is not None:
+        return Response(content=cached, media_type=NDJSON, headers=headers)
+
+    # 游标指向本进程挂起的展开时从断点继续；否则重新展开并跳过已输出的 offset 行
+    resumed, expired = neighborhood_cursors.take(token, query)
+    for old in expired:
+        await _close_rows(old)
+    if resumed is not None:
+        rows, pending = resumed
+        skip = 0
+    else:
+        rows = kg_store.iter_neighborhood(name, type, depth, fanout_list, relation_list, label_list)
+        pending, skip = None, offset
+    return StreamingResponse(_stream_neighborhood(key, query, name, rows, pending, skip, offset, limit),
+                             media_type=NDJSON, headers=headers)
+
+@app.get("/kg/search")
+async def search_entities(
+    q: List[str] = Query(..., description="查询词，可重复传入多个"),
+    k: int = Query(10, description="每个查询返回的实体数", ge=1, le=100),
+    type: Optional[str] = Query(None, description="实体类型"),
+    min_score: float = Query(0.0, description="最低余弦相似度", ge=0.0, le=1.0)
+):
+    """按名称和别名模糊检索实体（字符n-gram TF-IDF余弦相似度）"""
+    try:
+        await _ensure_fuzzy_index()
+        results = fuzzy_index.search(q, k, type, min_score)
         return {
             "success": True,
-            "entity": name,
-            "count": len(results),
-            "data": results
+            "data": [{"query": query, "matches": matches} for query, matches in zip(q, results)]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/kg/search/stats")
+async def get_search_stats():
+    """获取模糊检索索引状态"""
+    return {
+        "success": True,
+        "data": fuzzy_index.stats()
+    }
+
+@app.get("/kg/similar")
+async def similar_entities(
+    name: str = Query(..., description="实体名称"),
+    type: Optional[str] = Query(None, description="实体类型，同时限定返回实体的类型"),
+    k: int = Query(10, description="返回的实体数", ge=1, le=100)
+):
+    """按实体向量检索最相似的实体（实体未入库时按名称编码检索）"""
+    name = entity_normalizer.canonical_name(name, type)
+    try:
+        await _ensure_vector_index()
+        matches = entity_vectors.similar(name, type, k)
+        return {
+            "success": True,
+            "data": {"name": name, "type": type, "matches": matches}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/kg/similar/stats")
+async def get_similar_stats():
+    """获取实体向量索引状态"""
+    try:
+        stats = await run_in_threadpool(lambda: entity_vectors.stats())
+        return {
+            "success": True,
+            "data": stats
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/kg/statistics")
-def get_statistics():
+async def get_statistics(
+    degree_histogram: bool = Query(False, description="是否返回度分布"),
+    sources: bool = Query(False, description="是否返回按来源的关系计数")
+):
     """获取知识图谱统计信息"""
     try:
-        stats = kg_store.get_statistics()
+        stats = await _call(kg_store.get_statistics, degree_histogram, sources)
         return {
             "success": True,
             "data": stats
@@ -99,23 +590,63 @@ def get_statistics():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/kg/path")
-def find_path(
+async def find_path(
     start: str = Query(..., description="起始实体"),
     end: str = Query(..., description="目标实体"),
-    max_depth: int = Query(3, description="最大深度", ge=1, le=5)
+    max_depth: int = Query(3, description="最大深度", ge=1, le=5),
+    start_type: Optional[str] = Query(None, description="起始实体类型"),
+    end_type: Optional[str] = Query(None, description="目标实体类型"),
+    relations: Optional[str] = Query(None, description="允许的关系类型，逗号分隔"),
+    labels: Optional[str] = Query(None, description="允许的中间节点类型，逗号分隔"),
+    k: int = Query(10, description="返回的最短路径条数", ge=1, le=50),
+    timeout_ms: int = Query(2000, description="查询超时（毫秒）", ge=1, le=60000),
+    max_expansions: Optional[int] = Query(
+        None, description="最大扩展节点数（仅内存后端，缺省 PATH_MAX_EXPANSIONS；Neo4j后端传入时返回400）", ge=1)
 ):
-    """查找两实体间路径"""
+    """查找两实体间的k条最短路径"""
+    if max_expansions is None and KG_BACKEND == 'memory':
+        max_expansions = PATH_MAX_EXPANSIONS
     try:
-        paths = kg_store.query_path(start, end, max_depth)
-        return {
+        relation_list, label_list = _split(relations), _split(labels)
+        start = entity_normalizer.canonical_name(start, start_type)
+        end = entity_normalizer.canonical_name(end, end_type)
+        key = ('path', start, end, max_depth, start_type, end_type,
+               tuple(relation_list or ()), tuple(label_list or ()), k, timeout_ms, max_expansions)
+        cached = graph_cache.get(key)
+        if cached is not None:
+            return _json_response(cached)
+        
+        result = await _call(
+            kg_store.find_paths,
+            start, end, max_depth, start_type, end_type,
+            relation_list, label_list, k, max_expansions, timeout_ms / 1000
+        )
+        paths = result['paths']
+        content = _encode({
             "success": True,
             "start": start,
             "end": end,
             "path_count": len(paths),
+            "truncated": result['truncated'],
             "data": paths
-        }
+        })
+        # 截断的结果取决于当时的负载，不缓存；任意新边都可能产生新路径，路径结果在任何写入后失效
+        if not result['truncated']:
+            graph_cache.set(key, content, entities=[start, end, graph_cache.ANY_WRITE])
+        return _json_response(content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/kg/cache/stats")
+async def get_cache_stats():
+    """获取查询缓存命中统计"""
+    return {
+        "success": True,
+        "data": graph_cache.stats()
+    }
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -3,9 +3,12 @@
 """
 import json
 import csv
+import os
 import requests
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional
 from pathlib import Path
+from src.data.fetcher import EUTILS_BASE, Fetcher, PubMedSource, create_fetcher, iter_url_documents
+from src.data.neo4j_admin_export import Neo4jAdminExporter
 
 class DataCollector:
     """医学数据采集器"""
@@ -26,6 +29,25 @@ class DataCollector:
         self.processed_dir = self.data_dir / 'processed'
         self.raw_dir.mkdir(parents=True, exist_ok=True)
         self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self._fetcher: Optional[Fetcher] = None
+    
+    @property
+    def fetcher(self) -> Fetcher:
+        """下载器（首次使用时创建），响应缓存在 raw/http 下"""
+        if self._fetcher is None:
+            self._fetcher = create_fetcher(str(self.raw_dir / 'http'))
+        return self._fetcher
+    
+    def iter_pubmed_documents(self, terms: Optional[Iterable[str]] = None, retmax: int = 100,
+                              base_url: Optional[str] = None) -> Iterator[Dict]:
+        """检索PubMed摘要并逐篇产出 {text, source}，可直接作为流式抽取流水线的输入"""
+        source = PubMedSource(self.fetcher, base_url=base_url or os.getenv('PUBMED_BASE_URL', EUTILS_BASE),
+                              api_key=os.getenv('NCBI_API_KEY'))
+        return source.iter_documents(terms or self.TARGET_DISEASES, retmax)
+    
+    def iter_url_documents(self, urls: Iterable[str]) -> Iterator[Dict]:
+        """下载指南等网页/PDF并逐篇产出 {text, source}"""
+        return iter_url_documents(self.fetcher, urls)
     
     def generate_demo_data(self) -> Dict:
         """生成演示数据（慢病知识）"""
@@ -281,6 +303,17 @@ class DataCollector:
                 writer.writerow(ent)
         
         return filepath
+    
+    def save_neo4j_admin_import(self, entities: List[Dict], relations: List[Dict], dirname: str = 'neo4j_import') -> Dict:
+        """导出 neo4j-admin import 格式的节点/关系文件"""
+        fields = set()
+        for ent in entities:
+            fields.update(ent.keys())
+        
+        exporter = Neo4jAdminExporter(self.processed_dir / dirname, sorted(fields))
+        exporter.add_entities(entities)
+        exporter.add_triples(relations)
+        return exporter.close()
 
 # 全局实例
 data_collector = DataCollector()
@@ -0,0 +1,402 @@
+"""
+数据下载模块 - 连接复用、并发受限、按主机限速、失败重试、条件请求与磁盘缓存
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 需要重试的HTTP状态码
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+EUTILS_BASE = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils'
+
+
+class FetchError(Exception):
+    """下载失败（重试耗尽或不可重试的状态码），且没有可用的缓存副本"""
+
+
+class HostRateLimiter:
+    """按主机的令牌桶限速：每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, default_rate: float = 2.0, host_rates: Optional[Dict[str, float]] = None, burst: int = 1):
+        self.default_rate = default_rate
+        self.host_rates = dict(host_rates or {})
+        self.burst = burst
+        self._lock = threading.Lock()
+        # 主机 -> (令牌数, 上次补充时间)
+        self._buckets: Dict[str, List[float]] = {}
+
+    def acquire(self, host: str):
+        rate = self.host_rates.get(host, self.default_rate)
+        if rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self._buckets.setdefault(host, [float(self.burst), now])
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                wait = (1 - bucket[0]) / rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """磁盘响应缓存
+
+    每个URL对应 <sha256>.json（状态、ETag、Last-Modified、抓取时间等）和 <sha256>.body，
+    先写临时文件再原子替换，中断的下载不会留下半截缓存。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = self.directory / key[:2]
+        return base / f'{key}.json', base / f'{key}.body'
+
+    def get(self, url: str) -> Optional[Dict]:
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta['path'] = str(body_path)
+        return meta
+
+    def body_writer(self, url: str):
+        """返回 (临时文件对象, 提交函数, 放弃函数)；提交时替换正式文件并写入元数据"""
+        meta_path, body_path = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_body = body_path.with_name(f'{body_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        f = open(tmp_body, 'wb')
+
+        def commit(meta: Dict) -> Dict:
+            f.close()
+            tmp_body.replace(body_path)
+            self.put_meta(url, meta)
+            return dict(meta, path=str(body_path))
+
+        def abort():
+            f.close()
+            tmp_body.unlink(missing_ok=True)
+
+        return f, commit, abort
+
+    def put_meta(self, url: str, meta: Dict):
+        meta_path, _ = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_meta = meta_path.with_name(f'{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in meta.items() if k != 'path'}, f, ensure_ascii=False)
+        tmp_meta.replace(meta_path)
+
+
+class Fetcher:
+    """HTTP下载器
+
+    - 每个线程一个 requests.Session（连接池复用TCP/TLS连接）
+    - fetch_many 用有界线程池下载，同时在途的请求不超过 max_workers 的两倍，结果按输入顺序产出
+    - 按主机令牌桶限速；连接错误、超时、429/5xx 按指数退避加随机抖动重试，
+      服务端给出 Retry-After 时按其要求等待（上限 retry_after_max，只防异常值）
+    - 缓存未超过 max_age 时直接返回；否则带 If-None-Match / If-Modified-Since 请求，304 时复用缓存
+    - 重试耗尽时若有旧缓存则返回旧缓存（stale=True）
+    """
+
+    def __init__(self, cache_dir: Optional[str] = 'data/raw/http', max_workers: int = 4,
+                 rate_limiter: Optional[HostRateLimiter] = None, max_retries: int = 4,
+                 backoff: float = 0.5, backoff_max: float = 30.0, timeout: float = 30.0,
+                 max_age: float = 86400, user_agent: str = 'dkg-collector/0.1',
+                 retry_after_max: float = 600.0):
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.timeout = timeout
+        self.max_age = max_age
+        self.user_agent = user_agent
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+        self.stats = {'requests': 0, 'downloaded': 0, 'not_modified': 0, 'cache_hits': 0,
+                      'retries': 0, 'errors': 0, 'stale': 0}
+        self._stats_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(self.max_workers, 4))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = self.user_agent
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """重试前的等待秒数：指数退避加抖动（不超过 backoff_max）；服务端给出 Retry-After 时至少等到该时刻"""
+        delay = min(self.backoff_max, self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = 0.0
+            # Retry-After 按服务端要求等待，只对明显异常的值设上限
+            delay = max(delay, min(wait, self.retry_after_max))
+        return delay
+
+    @staticmethod
+    def full_url(url: str, params: Optional[Dict] = None) -> str:
+        if not params:
+            return url
+        return requests.Request('GET', url, params=sorted(params.items())).prepare().url
+
+    def fetch(self, url: str, params: Optional[Dict] = None) -> Dict:
+        """下载单个URL，返回 {url, status, content, content_type, path, from_cache, not_modified, stale}"""
+        url = self.full_url(url, params)
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None and time.time() - cached.get('fetched_at', 0) < self.max_age:
+            self._count('cache_hits')
+            return self._result(cached, from_cache=True)
+
+        headers = {}
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        host = urlsplit(url).netloc
+        error: Optional[str] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count('retries')
+            response = None
+            try:
+                self.rate_limiter.acquire(host)
+                self._count('requests')
+                response = self._session().get(url, headers=headers, timeout=self.timeout, stream=True)
+                if response.status_code == 304 and cached is not None:
+                    response.close()
+                    self._count('not_modified')
+                    cached['fetched_at'] = time.time()
+                    self.cache.put_meta(url, cached)
+                    return self._result(cached, from_cache=True, not_modified=True)
+                if response.status_code in RETRY_STATUSES:
+                    error = f"HTTP {response.status_code}"
+                    response.close()
+                elif response.status_code >= 400:
+                    response.close()
+                    self._count('errors')
+                    raise FetchError(f"{url}: HTTP {response.status_code}")
+                else:
+                    return self._store(url, response)
+            except requests.RequestException as e:
+                # 连接错误、超时、传输中断（ChunkedEncodingError）均可重试
+                error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                time.sleep(self._delay(attempt, response))
+
+        self._count('errors')
+        if cached is not None:
+            self._count('stale')
+            print(f"下载失败，使用旧缓存 {url}: {error}")
+            return self._result(cached, from_cache=True, stale=True)
+        raise FetchError(f"{url}: {error}")
+
+    def _store(self, url: str, response: requests.Response) -> Dict:
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', ''),
+            'encoding': response.encoding,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+        self._count('downloaded')
+        try:
+            if self.cache is None:
+                return dict(meta, content=response.content, path=None, from_cache=False,
+                            not_modified=False, stale=False)
+            # 边下载边写入缓存文件，大文件（PDF指南）不整体驻留内存
+            f, commit, abort = self.cache.body_writer(url)
+            try:
+                for chunk in response.iter_content(chunk_size=65536):
+                    f.write(chunk)
+            except BaseException:
+                abort()
+                raise
+            return self._result(commit(meta), from_cache=False)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _result(meta: Dict, from_cache: bool, not_modified: bool = False, stale: bool = False) -> Dict:
+        with open(meta['path'], 'rb') as f:
+            content = f.read()
+        return dict(meta, content=content, from_cache=from_cache, not_modified=not_modified, stale=stale)
+
+    def fetch_many(self, urls: Iterable[str]) -> Iterator[Dict]:
+        """并发下载，按输入顺序产出结果；失败的URL产出 {url, error}"""
+        def task(url):
+            try:
+                return self.fetch(url)
+            except FetchError as e:
+                return {'url': url, 'error': str(e)}
+
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fetch') as pool:
+            pending = deque()
+            for url in urls:
+                pending.append(pool.submit(task, url))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def close(self):
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+
+
+def response_text(result: Dict) -> str:
+    """按内容类型把下载结果转为纯文本：HTML去标签，PDF逐页提取，其余按编码解码"""
+    content_type = (result.get('content_type') or '').lower()
+    content = result['content']
+    if 'pdf' in content_type or result['url'].lower().endswith('.pdf'):
+        import io
+        import pdfplumber
+        with pdfplumber.open(io.BytesIO(content)) as pdf:
+            return '\n'.join(page.extract_text() or '' for page in pdf.pages)
+    text = content.decode(result.get('encoding') or 'utf-8', errors='replace')
+    if 'html' in content_type:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(text, 'html.parser')
+        for tag in soup(['script', 'style', 'nav', 'header', 'footer']):
+            tag.decompose()
+        return '\n'.join(line.strip() for line in soup.get_text('\n').splitlines() if line.strip())
+    return text
+
+
+class PubMedSource:
+    """PubMed E-utilities：esearch 检索PMID，efetch 按批取摘要（XML）"""
+
+    def __init__(self, fetcher: Fetcher, base_url: str = EUTILS_BASE, api_key: Optional[str] = None,
+                 batch_size: int = 200):
+        self.fetcher = fetcher
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.batch_size = batch_size
+
+    def _params(self, **params) -> Dict:
+        if self.api_key:
+            params['api_key'] = self.api_key
+        return params
+
+    def search(self, term: str, retmax: int = 100) -> List[str]:
+        result = self.fetcher.fetch(f'{self.base_url}/esearch.fcgi',
+                                    self._params(db='pubmed', term=term, retmax=retmax, retmode='json'))
+        return json.loads(result['content'])['esearchresult'].get('idlist', [])
+
+    def fetch_urls(self, pmids: List[str]) -> Iterator[str]:
+        for start in range(0, len(pmids), self.batch_size):
+            batch = pmids[start:start + self.batch_size]
+            yield Fetcher.full_url(f'{self.base_url}/efetch.fcgi',
+                                   self._params(db='pubmed', id=','.join(batch), rettype='abstract', retmode='xml'))
+
+    @staticmethod
+    def parse_articles(content: bytes) -> Iterator[Dict]:
+        root = ET.fromstring(content)
+        for article in root.iter('PubmedArticle'):
+            pmid = article.findtext('.//PMID') or ''
+            title_node = article.find('.//ArticleTitle')
+            title = ''.join(title_node.itertext()) if title_node is not None else ''
+            sections = []
+            for node in article.iter('AbstractText'):
+                label = node.get('Label')
+                text = ''.join(node.itertext()).strip()
+                if text:
+                    sections.append(f'{label}: {text}' if label else text)
+            text = '\n'.join(part for part in [title.strip(), *sections] if part)
+            if text:
+                yield {'text': text, 'source': f'pubmed:{pmid}'}
+
+    def iter_documents(self, terms: Iterable[str], retmax: int = 100) -> Iterator[Dict]:
+        """检索并下载摘要，逐篇产出 {text, source}；同一PMID只产出一次"""
+        seen = set()
+        pmids: List[str] = []
+        for term in terms:
+            for pmid in self.search(term, retmax):
+                if pmid not in seen:
+                    seen.add(pmid)
+                    pmids.append(pmid)
+        for result in self.fetcher.fetch_many(self.fetch_urls(pmids)):
+            if 'error' in result:
+                print(f"PubMed 下载失败: {result['error']}")
+                continue
+            yield from self.parse_articles(result['content'])
+
+
+def iter_url_documents(fetcher: Fetcher, urls: Iterable[str]) -> Iterator[Dict]:
+    """下载指南等网页/PDF，逐篇产出 {text, source}"""
+    for result in fetcher.fetch_many(urls):
+        if 'error' in result:
+            print(f"下载失败: {result['error']}")
+            continue
+        try:
+            text = response_text(result)
+        except Exception as e:
+            print(f"解析失败 {result['url']}: {e}")
+            continue
+        if text.strip():
+            yield {'text': text, 'source': result['url']}
+
+
+def create_fetcher(cache_dir: str = 'data/raw/http') -> Fetcher:
+    """按环境变量创建下载器；NCBI 无 API key 时限速每秒3次，有 key 时每秒10次"""
+    host_rates = {urlsplit(EUTILS_BASE).netloc: 10.0 if os.getenv('NCBI_API_KEY') else 3.0}
+    return Fetcher(
+        cache_dir=cache_dir,
+        max_workers=int(os.getenv('FETCH_MAX_WORKERS', '4')),
+        rate_limiter=HostRateLimiter(float(os.getenv('FETCH_RATE', '2')), host_rates),
+        max_retries=int(os.getenv('FETCH_MAX_RETRIES', '4')),
+        timeout=float(os.getenv('FETCH_TIMEOUT', '30')),
+        max_age=float(os.getenv('FETCH_CACHE_MAX_AGE', '86400')),
+        retry_after_max=float(os.getenv('FETCH_RETRY_AFTER_MAX', '600'))
+    )
@@ -4,34 +4,44 @@
 import csv
 import json
 from pathlib import Path
+from typing import Dict
 from src.storage.neo4j_store import kg_store
 
-def import_triples_from_csv(csv_path: str):
-    """从CSV导入三元组"""
-    count = 0
-    
+def _read_triple_rows(csv_path: str, report: Dict):
+    """逐行读取CSV三元组，格式错误的行计入失败"""
     with open(csv_path, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
             try:
-                kg_store.add_triple(
-                    head_name=row['head'],
-                    head_type=row['head_type'],
-                    relation=row['relation'],
-                    tail_name=row['tail'],
-                    tail_type=row['tail_type'],
-                    properties={
-                        'confidence': float(row.get('confidence', 0.5)),
-                        'source': row.get('source', 'unknown')
+                yield {
+                    'head': row['head'],
+                    'head_type': row['head_type'],
+                    'relation': row['relation'],
+                    'tail': row['tail'],
+                    'tail_type': row['tail_type'],
+                    'properties': {
+                        'confidence': float(row.get('confidence') or 0.5),
+                        'source': row.get('source') or 'unknown'
                     }
-                )
-                count += 1
-                if count % 10 == 0:
-                    print(f"已导入 {count} 个三元组")
-            except Exception as e:
+                }
+            except (KeyError, ValueError) as e:
+                report['rejected'] += 1
                 print(f"导入失败: {row} - {e}")
+
+def import_triples_from_csv(csv_path: str, batch_size: int = 5000):
+    """从CSV导入三元组（批量事务）"""
+    parse_report = {'rejected': 0}
+    report = kg_store.bulk_add_triples(_read_triple_rows(csv_path, parse_report), batch_size=batch_size)
     
-    return count
+    for failure in report['failures']:
+        print(f"批次 {failure['batch']} 导入失败 {failure['key']} ({failure['size']} 行): {failure['error']}")
+    for rejection in report['rejections']:
+        print(f"第 {rejection['row'] + 1} 行被拒绝: {rejection['error']}")
+    print(f"共 {report['batches']} 个批次, 新增 {report['inserted']}, 合并 {report['updated']}, "
+          f"拒绝 {report['rejected'] + parse_report['rejected']}, 失败 {report['failed']}, "
+          f"耗时 {report['elapsed']:.2f}s ({report['rate']:.0f} 三元组/秒)")
+    
+    return report['imported']
 
 def import_entities_from_json(json_path: str):
     """从JSON导入实体"""
@@ -70,6 +80,11 @@ def main():
         print("请确保Neo4j已启动")
         return
     
+    # 导入前建立约束/索引，MERGE才能走索引
+    report = kg_store.ensure_schema()
+    for name, error in report['failed'].items():
+        print(f"约束/索引创建失败 {name}: {error}")
+    
     # 导入三元组
     triples_path = Path('data/processed/triples.csv')
     if triples_path.exists():
@@ -0,0 +1,189 @@
+"""
+离线导出模块 - 生成 neo4j-admin database import 所需的CSV文件
+"""
+import ast
+import csv
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.storage.cypher import check_identifier
+
+
+def read_entities_csv(csv_path: str) -> Iterator[Dict]:
+    """逐行读取 entities.csv，将列表字面量还原为列表"""
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            entity = {}
+            for key, value in row.items():
+                if value is None or value == '':
+                    continue
+                if value.startswith('[') and value.endswith(']'):
+                    try:
+                        value = ast.literal_eval(value)
+                    except (ValueError, SyntaxError):
+                        pass
+                entity[key] = value
+            yield entity
+
+
+def read_triples_csv(csv_path: str) -> Iterator[Dict]:
+    """逐行读取 triples.csv"""
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+class Neo4jAdminExporter:
+    """neo4j-admin 导入文件导出器
+
+    节点按标签、关系按类型分别写入数据文件，表头单独成文件。
+    实体按 (type, name) 去重并按首次出现顺序分配稳定的整数ID；
+    内存中只保留节点键到ID的映射，关系逐行写出。
+    """
+
+    ID_SPACE = 'Entity'
+    RELATION_PROPERTIES = [('confidence', 'float'), ('source', 'string')]
+
+    def __init__(self, output_dir: str, property_fields: Optional[List[str]] = None,
+                 array_delimiter: str = ';'):
+        self.output_dir = Path(output_dir)
+        self.nodes_dir = self.output_dir / 'nodes'
+        self.relationships_dir = self.output_dir / 'relationships'
+        self.nodes_dir.mkdir(parents=True, exist_ok=True)
+        self.relationships_dir.mkdir(parents=True, exist_ok=True)
+
+        # 节点属性列在写出数据前固定，类型在关闭时根据实际取值确定
+        self.property_fields = [f for f in (property_fields or []) if f not in ('name', 'type')]
+        self.array_fields = set()
+        self.array_delimiter = array_delimiter
+
+        self.node_ids: Dict[Tuple[str, str], int] = {}
+        self.node_counts: Dict[str, int] = {}
+        self.relationship_counts: Dict[str, int] = {}
+        self._files = {}
+        self._writers = {}
+
+    def _writer(self, kind: str, name: str):
+        key = (kind, name)
+        writer = self._writers.get(key)
+        if writer is None:
+            directory = self.nodes_dir if kind == 'nodes' else self.relationships_dir
+            f = open(directory / f'{name}.csv', 'w', newline='', encoding='utf-8')
+            self._files[key] = f
+            writer = self._writers[key] = csv.writer(f)
+        return writer
+
+    def _format_value(self, field: str, value) -> str:
+        if value is None:
+            return ''
+        if isinstance(value, (list, tuple)):
+            self.array_fields.add(field)
+            return self.array_delimiter.join(str(v) for v in value)
+        return str(value)
+
+    def _node_id(self, entity_type: str, name: str, entity: Optional[Dict] = None) -> int:
+        """返回节点ID，首次出现时写出节点行"""
+        key = (entity_type, name)
+        node_id = self.node_ids.get(key)
+        if node_id is not None:
+            return node_id
+
+        check_identifier(entity_type)
+        node_id = self.node_ids[key] = len(self.node_ids)
+        entity = entity or {}
+        row = [node_id, name] + [self._format_value(f, entity.get(f)) for f in self.property_fields]
+        self._writer('nodes', entity_type).writerow(row)
+        self.node_counts[entity_type] = self.node_counts.get(entity_type, 0) + 1
+        return node_id
+
+    def add_entities(self, entities: Iterable[Dict]) -> int:
+        """写出实体节点，重复的 (type, name) 只保留首次出现的属性"""
+        count = 0
+        for entity in entities:
+            if not entity.get('name') or not entity.get('type'):
+                continue
+            self._node_id(entity['type'], entity['name'], entity)
+            count += 1
+        return count
+
+    def add_triples(self, triples: Iterable[Dict]) -> int:
+        """写出关系，缺失的端点实体自动补建"""
+        count = 0
+        for t in triples:
+            relation = check_identifier(t['relation'])
+            start_id = self._node_id(t['head_type'], t['head'])
+            end_id = self._node_id(t['tail_type'], t['tail'])
+            self._writer('relationships', relation).writerow([
+                start_id, end_id,
+                t.get('confidence', ''), t.get('source', '')
+            ])
+            self.relationship_counts[relation] = self.relationship_counts.get(relation, 0) + 1
+            count += 1
+        return count
+
+    def _write_header(self, path: Path, header: List[str]):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(header)
+
+    def close(self) -> Dict:
+        """关闭数据文件并写出表头，返回导出清单"""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._writers = {}
+
+        node_header = [f':ID({self.ID_SPACE})', 'name'] + [
+            f'{f}:string[]' if f in self.array_fields else f for f in self.property_fields
+        ]
+        for label in self.node_counts:
+            self._write_header(self.nodes_dir / f'{label}.header.csv', node_header)
+
+        relationship_header = [f':START_ID({self.ID_SPACE})', f':END_ID({self.ID_SPACE})'] + [
+            f'{name}:{kind}' for name, kind in self.RELATION_PROPERTIES
+        ]
+        for relation in self.relationship_counts:
+            self._write_header(self.relationships_dir / f'{relation}.header.csv', relationship_header)
+
+        return {
+            'nodes': dict(self.node_counts),
+            'relationships': dict(self.relationship_counts),
+            'command': self.import_command()
+        }
+
+    def import_command(self, database: str = 'neo4j') -> List[str]:
+        """生成 neo4j-admin database import 命令参数"""
+        command = ['neo4j-admin', 'database', 'import', 'full']
+        for label in self.node_counts:
+            command.append(f'--nodes={label}={self.nodes_dir / f"{label}.header.csv"},{self.nodes_dir / f"{label}.csv"}')
+        for relation in self.relationship_counts:
+            header = self.relationships_dir / f'{relation}.header.csv'
+            command.append(f'--relationships={relation}={header},{self.relationships_dir / f"{relation}.csv"}')
+        command.append(f'--array-delimiter={self.array_delimiter}')
+        command.append('--overwrite-destination')
+        command.append(database)
+        return command
+
+
+def export_for_neo4j_admin(triples_csv: str, entities_csv: Optional[str], output_dir: str) -> Dict:
+    """从 triples.csv / entities.csv 流式生成 neo4j-admin 导入文件"""
+    property_fields = []
+    if entities_csv and Path(entities_csv).exists():
+        with open(entities_csv, 'r', encoding='utf-8') as f:
+            property_fields = next(csv.reader(f), [])
+
+    exporter = Neo4jAdminExporter(output_dir, property_fields)
+    if property_fields:
+        exporter.add_entities(read_entities_csv(entities_csv))
+    exporter.add_triples(read_triples_csv(triples_csv))
+    return exporter.close()
+
+
+if __name__ == '__main__':
+    manifest = export_for_neo4j_admin(
+        'data/processed/triples.csv',
+        'data/processed/entities.csv',
+        'data/processed/neo4j_import'
+    )
+    print(f"节点: {manifest['nodes']}")
+    print(f"关系: {manifest['relationships']}")
+    print("导入命令:")
+    print(' '.join(manifest['command']))
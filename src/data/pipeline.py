@@ -0,0 +1,376 @@
+"""
+流式抽取流水线 - 从语料文件逐篇抽取三元组并增量写出
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from itertools import chain, tee
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+TRIPLE_FIELDS = ['head', 'head_type', 'relation', 'tail', 'tail_type', 'confidence', 'source']
+
+# 支持的语料文件类型
+DOCUMENT_SUFFIXES = ('.txt', '.jsonl')
+
+# 队列结束标记
+_END = object()
+
+
+def iter_documents(paths: Iterable[str]) -> Iterator[Dict]:
+    """惰性读取语料文档
+
+    .txt 文件整篇作为一个文档；.jsonl 文件每行一个文档，需包含 text 字段。
+    目录按路径排序递归遍历，保证断点续跑时文档顺序稳定。
+    """
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(p for p in path.rglob('*') if p.is_file() and p.suffix in DOCUMENT_SUFFIXES)
+        else:
+            files = [path]
+
+        for file in files:
+            if file.suffix == '.jsonl':
+                with open(file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        record = json.loads(line)
+                        yield {'text': record['text'], 'source': record.get('source') or file.name}
+            else:
+                with open(file, 'r', encoding='utf-8') as f:
+                    yield {'text': f.read(), 'source': file.name}
+
+
+class TripleWriter(ABC):
+    """三元组增量写出器基类"""
+
+    @abstractmethod
+    def write(self, triples: List[Dict]):
+        """写出一批三元组"""
+
+    def flush(self):
+        pass
+
+    def state(self) -> Optional[int]:
+        """返回可用于断点恢复的写出位置"""
+        return None
+
+    def close(self):
+        pass
+
+
+class _FileTripleWriter(TripleWriter):
+    """基于文件的写出器，续跑时截断到检查点位置"""
+
+    def __init__(self, path: str, resume_size: Optional[int] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume_size is not None and self.path.exists():
+            # 丢弃检查点之后写入的不完整数据
+            with open(self.path, 'r+b') as f:
+                f.truncate(resume_size)
+            self.file = open(self.path, 'a', newline='', encoding='utf-8')
+            self.fresh = False
+        else:
+            self.file = open(self.path, 'w', newline='', encoding='utf-8')
+            self.fresh = True
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def state(self) -> int:
+        # 追加写入时文件大小即写出位置（字节）
+        self.file.flush()
+        return os.fstat(self.file.fileno()).st_size
+
+    def close(self):
+        self.file.close()
+
+
+class CSVTripleWriter(_FileTripleWriter):
+    """CSV三元组写出器"""
+
+    def __init__(self, path: str, resume_size: Optional[int] = None):
+        super().__init__(path, resume_size)
+        self.writer = csv.writer(self.file)
+        if self.fresh:
+            self.writer.writerow(TRIPLE_FIELDS)
+
+    def write(self, triples: List[Dict]):
+        for t in triples:
+            self.writer.writerow([t.get(field, '') for field in TRIPLE_FIELDS])
+
+
+class JSONLTripleWriter(_FileTripleWriter):
+    """JSONL三元组写出器"""
+
+    def write(self, triples: List[Dict]):
+        for t in triples:
+            self.file.write(json.dumps(t, ensure_ascii=False))
+            self.file.write('\n')
+
+
+class Neo4jTripleWriter(TripleWriter):
+    """写入知识图谱存储，攒批后通过 bulk_add_triples 提交"""
+
+    def __init__(self, store, batch_size: int = 5000):
+        self.store = store
+        self.batch_size = batch_size
+        self.buffer: List[Dict] = []
+
+    def write(self, triples: List[Dict]):
+        for t in triples:
+            self.buffer.append({
+                'head': t['head'],
+                'head_type': t['head_type'],
+                'relation': t['relation'],
+                'tail': t['tail'],
+                'tail_type': t['tail_type'],
+                'properties': {'confidence': t.get('confidence', 0.5), 'source': t.get('source', 'unknown')}
+            })
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        report = self.store.bulk_add_triples(self.buffer, batch_size=self.batch_size)
+        self.buffer = []
+        for failure in report['failures']:
+            print(f"写入图谱失败 {failure['key']} ({failure['size']} 行): {failure['error']}")
+
+    def close(self):
+        self.flush()
+
+
+class Checkpoint:
+    """断点记录：已完成的文档数及各输出文件的写出位置"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.offset = 0
+        self.outputs: Dict[str, int] = {}
+        if self.path and self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.offset = data.get('offset', 0)
+            self.outputs = data.get('outputs', {})
+
+    @property
+    def resuming(self) -> bool:
+        return self.offset > 0
+
+    def save(self, offset: int, outputs: Dict[str, int]):
+        self.offset = offset
+        self.outputs = outputs
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'offset': offset, 'outputs': outputs}, f)
+        tmp_path.replace(self.path)
+
+
+class StreamingTriplePipeline:
+    """流式三元组抽取流水线
+
+    读取 -> 抽取 -> 写出 三个阶段由有界队列连接：下游变慢时上游阻塞（背压），
+    内存占用只与队列长度和批大小有关，与语料规模无关。
+    每处理 checkpoint_every 篇文档刷盘并记录断点，崩溃后从断点继续。
+    """
+
+    def __init__(self, generator=None, checkpoint_path: Optional[str] = None,
+                 batch_size: int = 64, n_process: int = 1,
+                 queue_size: int = 256, checkpoint_every: int = 1000):
+        if generator is None:
+            from src.extraction.triple_generator import triple_generator
+            generator = triple_generator
+        self.generator = generator
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.queue_size = queue_size
+        self.checkpoint_every = checkpoint_every
+        self.writers: Dict[str, TripleWriter] = {}
+
+    def add_csv_output(self, path: str):
+        self.writers[str(path)] = CSVTripleWriter(path, self._resume_size(path))
+        return self
+
+    def add_jsonl_output(self, path: str):
+        self.writers[str(path)] = JSONLTripleWriter(path, self._resume_size(path))
+        return self
+
+    def add_store_output(self, store, name: str = 'neo4j'):
+        self.writers[name] = Neo4jTripleWriter(store)
+        return self
+
+    def _resume_size(self, path: str) -> Optional[int]:
+        if not self.checkpoint.resuming:
+            return None
+        return self.checkpoint.outputs.get(str(path))
+
+    def _read_stage(self, documents: Iterator[Dict], skip: int, out_queue: queue.Queue, stop: threading.Event):
+        """读取阶段：跳过已完成的文档"""
+        try:
+            for i, doc in enumerate(documents):
+                if stop.is_set():
+                    return
+                if i < skip:
+                    continue
+                out_queue.put(doc)
+        except Exception as e:
+            out_queue.put(e)
+        finally:
+            out_queue.put(_END)
+
+    def _extract_stage(self, in_queue: queue.Queue, out_queue: queue.Queue, stop: threading.Event):
+        """抽取阶段：批量生成三元组，按输入顺序输出"""
+        errors = []
+
+        def drain():
+            while not stop.is_set():
+                item = in_queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    errors.append(item)
+                    return
+                yield item
+
+        try:
+            docs_for_text, docs_for_source = tee(drain())
+            texts = (doc['text'] for doc in docs_for_text)
+            results = self.generator.iter_from_texts(texts, batch_size=self.batch_size, n_process=self.n_process)
+            for doc, result in zip(docs_for_source, results):
+                triples = [dict(t, source=doc['source']) for t in result['triples']]
+                out_queue.put(triples)
+            if errors:
+                out_queue.put(errors[0])
+        except Exception as e:
+            out_queue.put(e)
+        finally:
+            out_queue.put(_END)
+
+    def _save_checkpoint(self, offset: int):
+        outputs = {}
+        for name, writer in self.writers.items():
+            writer.flush()
+            position = writer.state()
+            if position is not None:
+                outputs[name] = position
+        self.checkpoint.save(offset, outputs)
+
+    def run(self, documents: Iterable[Dict]) -> Dict:
+        """运行流水线，返回处理统计"""
+        doc_queue = queue.Queue(maxsize=self.queue_size)
+        result_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        offset = self.checkpoint.offset
+
+        stages = [
+            threading.Thread(target=self._read_stage, args=(iter(documents), offset, doc_queue, stop), daemon=True),
+            threading.Thread(target=self._extract_stage, args=(doc_queue, result_queue, stop), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        start_offset = offset
+        triple_count = 0
+        start_time = time.time()
+        try:
+            while True:
+                item = result_queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                for writer in self.writers.values():
+                    writer.write(item)
+                triple_count += len(item)
+                offset += 1
+
+                if (offset - start_offset) % self.checkpoint_every == 0:
+                    self._save_checkpoint(offset)
+                    print(f"已处理 {offset} 篇文档，{triple_count} 个三元组")
+
+            self._save_checkpoint(offset)
+        finally:
+            stop.set()
+            # 解除可能阻塞在put上的上游线程
+            for q in (doc_queue, result_queue):
+                while not q.empty():
+                    q.get_nowait()
+            for writer in self.writers.values():
+                writer.close()
+
+        elapsed = time.time() - start_time
+        return {
+            'documents': offset - start_offset,
+            'triples': triple_count,
+            'offset': offset,
+            'elapsed': elapsed
+        }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='流式抽取语料三元组')
+    parser.add_argument('inputs', nargs='*', help='语料文件或目录（.txt/.jsonl）')
+    parser.add_argument('--pubmed', action='append', default=[], help='PubMed检索式，可重复')
+    parser.add_argument('--pubmed-retmax', type=int, default=100, help='每个检索式的最多文献数')
+    parser.add_argument('--url', action='append', default=[], help='下载并抽取的网页/PDF地址，可重复')
+    parser.add_argument('--csv', help='CSV输出路径')
+    parser.add_argument('--jsonl', help='JSONL输出路径')
+    parser.add_argument('--neo4j', action='store_true', help='同时写入Neo4j')
+    parser.add_argument('--checkpoint', help='断点文件路径')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--n-process', type=int, default=1)
+    parser.add_argument('--queue-size', type=int, default=256)
+    parser.add_argument('--checkpoint-every', type=int, default=1000)
+    args = parser.parse_args()
+    if not (args.inputs or args.pubmed or args.url):
+        parser.error('需要至少一个语料文件、--pubmed 或 --url')
+
+    pipeline = StreamingTriplePipeline(
+        checkpoint_path=args.checkpoint,
+        batch_size=args.batch_size,
+        n_process=args.n_process,
+        queue_size=args.queue_size,
+        checkpoint_every=args.checkpoint_every
+    )
+    if args.csv:
+        pipeline.add_csv_output(args.csv)
+    if args.jsonl:
+        pipeline.add_jsonl_output(args.jsonl)
+    if args.neo4j:
+        from src.storage.neo4j_store import kg_store
+        pipeline.add_store_output(kg_store)
+
+    if pipeline.checkpoint.resuming:
+        print(f"从断点继续: 已完成 {pipeline.checkpoint.offset} 篇文档")
+    # 下载结果边取边送入抽取；已下载的响应缓存在 data/raw/http，断点续跑时不会重复请求
+    sources = [iter_documents(args.inputs)]
+    if args.pubmed or args.url:
+        from src.data.collector import data_collector
+        if args.pubmed:
+            sources.append(data_collector.iter_pubmed_documents(args.pubmed, args.pubmed_retmax))
+        if args.url:
+            sources.append(data_collector.iter_url_documents(args.url))
+    stats = pipeline.run(chain.from_iterable(sources))
+    print(f"完成: {stats['documents']} 篇文档, {stats['triples']} 个三元组, 耗时 {stats['elapsed']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+实体归一化模块 - 别名/变体到规范实体的索引
+"""
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.lazy import LazyProxy
+
+try:
+    import opencc
+    try:
+        _opencc = opencc.OpenCC('t2s')
+    except Exception:
+        _opencc = opencc.OpenCC('t2s.json')
+except ImportError:
+    _opencc = None
+
+# 未安装 opencc 时使用的繁简对照（覆盖医学文本中的常见字）
+_T2S_FALLBACK = str.maketrans(
+    '壓腫藥腦臟腎臨癥癒療醫診斷檢驗術種類嚴髮熱頭區發現併變綜徵氣擴張體質衛結膽腸潰瘍創傷鬆靜脈動狀鹼'
+    '劑複雜營養鈣鐵鋅維濃緩釋錠顆噴霧經絡關節風濕紅瘡貧壞細傳導過聽視覺聲帶癢癱瘓絞歷歲齡婦嬰兒產瘧癇'
+    '膚臉齒飲鹽煙鬱憂慮異陽陰錄測試譜圖電護後預處級線濾計數與為無對時應實開間們這個來說',
+    '压肿药脑脏肾临症愈疗医诊断检验术种类严发热头区发现并变综征气扩张体质卫结胆肠溃疡创伤松静脉动状碱'
+    '剂复杂营养钙铁锌维浓缓释锭颗喷雾经络关节风湿红疮贫坏细传导过听视觉声带痒瘫痪绞历岁龄妇婴儿产疟痫'
+    '肤脸齿饮盐烟郁忧虑异阳阴录测试谱图电护后预处级线滤计数与为无对时应实开间们这个来说'
+)
+
+# 规范实体标识: (实体类型, 规范名称)
+EntityId = Tuple[str, str]
+
+
+def to_simplified(text: str) -> str:
+    if _opencc is not None:
+        return _opencc.convert(text)
+    return text.translate(_T2S_FALLBACK)
+
+
+def fold(text: str) -> str:
+    """归一化键：NFKC（全角转半角等）、大小写折叠、繁转简、合并空白"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ' '.join(to_simplified(text).split())
+
+
+class EntityNormalizer:
+    """实体归一化索引
+
+    每个规范实体的名称和别名都以 fold 后的形式登记，任意写法一次哈希查找即得规范实体。
+    按类型和不限类型各维护一张表；同一键冲突时规范名称优先于别名，其余先登记者优先。
+    新实体通过 add 增量登记，无需重建。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # fold 键 -> (规范实体, 是否为规范名称)
+        self._by_key: Dict[str, Tuple[EntityId, bool]] = {}
+        self._by_type_key: Dict[Tuple[str, str], Tuple[str, bool]] = {}
+        # 规范实体 -> 原始写法（名称和别名），供NER词典使用
+        self._surfaces: Dict[EntityId, List[str]] = {}
+        self.version = 0
+        self._fingerprint: Optional[Tuple[int, str]] = None
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+    def _register(self, key: str, entity: EntityId, canonical: bool) -> bool:
+        changed = False
+        current = self._by_key.get(key)
+        if current is None or (canonical and not current[1] and current[0] != entity):
+            self._by_key[key] = (entity, canonical)
+            changed = True
+        typed_key = (entity[0], key)
+        current = self._by_type_key.get(typed_key)
+        if current is None or (canonical and not current[1] and current[0] != entity[1]):
+            self._by_type_key[typed_key] = (entity[1], canonical)
+            changed = True
+        return changed
+
+    def add(self, entity_type: str, name: str, aliases: Iterable[str] = ()) -> EntityId:
+        """登记实体及其别名；名称本身是另一实体的别名时，返回已有的规范实体"""
+        with self._lock:
+            existing = self._by_type_key.get((entity_type, fold(name)))
+            if existing is not None and existing[0] != name and (entity_type, name) not in self._surfaces:
+                entity = (entity_type, existing[0])
+            else:
+                entity = (entity_type, name)
+            surfaces = self._surfaces.setdefault(entity, [])
+            changed = False
+            for surface in [name, *(aliases or ())]:
+                if not surface or not isinstance(surface, str):
+                    continue
+                changed |= self._register(fold(surface), entity, surface == entity[1])
+                if surface not in surfaces:
+                    surfaces.append(surface)
+                    changed = True
+            if changed:
+                self.version += 1
+            return entity
+
+    def add_entity(self, entity_type: str, properties: Dict) -> Optional[EntityId]:
+        """登记带 aliases 属性的实体字典（如 medical_data.json 中的实体）"""
+        name = properties.get('name')
+        if not name:
+            return None
+        return self.add(entity_type, name, properties.get('aliases') or ())
+
+    def resolve(self, name: str, entity_type: str = None) -> Optional[EntityId]:
+        """任意写法 -> 规范实体；未登记时返回None"""
+        key = fold(name)
+        if entity_type:
+            hit = self._by_type_key.get((entity_type, key))
+            return None if hit is None else (entity_type, hit[0])
+        hit = self._by_key.get(key)
+        return None if hit is None else hit[0]
+
+    def canonical_name(self, name: str, entity_type: str = None) -> str:
+        """返回规范名称，未登记的名称原样返回"""
+        if not name:
+            return name
+        entity = self.resolve(name, entity_type)
+        return name if entity is None else entity[1]
+
+    def surface_forms(self, entity_types: Iterable[str] = None) -> Dict[str, List[str]]:
+        """按类型汇总所有名称和别名的原始写法"""
+        allowed = set(entity_types) if entity_types is not None else None
+        forms: Dict[str, List[str]] = {}
+        with self._lock:
+            for (entity_type, _), surfaces in self._surfaces.items():
+                if allowed is None or entity_type in allowed:
+                    forms.setdefault(entity_type, []).extend(surfaces)
+        return forms
+
+    def fingerprint(self) -> str:
+        """登记内容的指纹，随 version 变化重新计算"""
+        cached = self._fingerprint
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        with self._lock:
+            version = self.version
+            payload = json.dumps(sorted((list(k), v) for k, v in self._surfaces.items()), ensure_ascii=False)
+        digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        self._fingerprint = (version, digest)
+        return digest
+
+    def load_json(self, path: str) -> int:
+        """从 medical_data.json 登记实体别名，返回登记的实体数"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        count = 0
+        for entity in data.get('entities', []):
+            if self.add_entity(entity.get('type', 'Entity'), entity) is not None:
+                count += 1
+        return count
+
+
+def _create_normalizer() -> EntityNormalizer:
+    normalizer = EntityNormalizer()
+    path = os.getenv('ENTITY_ALIASES_PATH', 'data/processed/medical_data.json')
+    if path and Path(path).exists():
+        try:
+            normalizer.load_json(path)
+        except (OSError, ValueError) as e:
+            print(f"实体别名文件 {path} 加载失败: {e}")
+    return normalizer
+
+# 全局实例（首次使用时加载别名文件）
+entity_normalizer = LazyProxy(_create_normalizer, 'entity_normalizer')
@@ -0,0 +1,149 @@
+"""
+抽取结果缓存模块 - 基于SQLite的内容寻址持久缓存
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+def normalize_text(text: str) -> Tuple[str, int]:
+    """规范化文本用于缓存寻址，返回 (规范化文本, 相对原文的偏移)
+
+    只去掉首尾空白，不改变正文字符，缓存的实体偏移可直接平移回原文。
+    """
+    stripped = text.lstrip()
+    offset = len(text) - len(stripped)
+    return stripped.rstrip(), offset
+
+
+class ExtractionCache:
+    """抽取结果缓存
+
+    键为 (抽取流水线指纹, 规范化文本) 的SHA-256，词典、关系模板或模型变化后指纹改变，
+    旧条目不再命中，并随LRU淘汰逐步清出。值为zlib压缩的JSON（实体和关系），
+    不含来源等请求参数。总大小超过 max_bytes 时按最近访问时间淘汰至上限的90%。
+    每个进程持有独立连接（fork 出的工作进程不能复用父进程的连接）。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                "key BLOB PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions(accessed)")
+            self._conn = conn
+            self._pid = os.getpid()
+            self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        return self._conn
+
+    @staticmethod
+    def make_key(fingerprint: str, text: str) -> bytes:
+        digest = hashlib.sha256(fingerprint.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Dict]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key: bytes, value: Dict):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM extractions WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time())
+            )
+            self._size += len(blob) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        # 其他进程也在写入，淘汰前重新读取实际总大小
+        self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if self._size <= self.max_bytes:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute("SELECT key, size FROM extractions ORDER BY accessed")
+            victims = []
+            for key, size in cursor:
+                if self._size <= target:
+                    break
+                victims.append((key,))
+                self._size -= size
+            cursor.close()
+            conn.executemany("DELETE FROM extractions WHERE key = ?", victims)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.evictions += len(victims)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM extractions")
+            self._size = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+# 全局实例，EXTRACTION_CACHE_PATH 设为空字符串时不启用
+_cache_path = os.getenv('EXTRACTION_CACHE_PATH', 'data/cache/extraction.sqlite')
+extraction_cache = ExtractionCache(
+    _cache_path,
+    max_bytes=int(os.getenv('EXTRACTION_CACHE_MAX_MB', '512')) * 1024 * 1024
+) if _cache_path else None
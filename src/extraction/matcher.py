@@ -0,0 +1,190 @@
+"""
+多模式匹配模块 - 基于Aho-Corasick自动机的词典匹配
+"""
+import hashlib
+import json
+import pickle
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class AhoCorasickMatcher:
+    """Aho-Corasick多模式匹配器
+
+    一次构建、单遍扫描文本，返回所有命中的词典词条。
+    状态转移表以扁平列表存储，可序列化到磁盘后直接加载，避免重复构建。
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, dictionaries: Optional[Dict[str, List[str]]] = None):
+        # goto[s]: 字符 -> 下一状态
+        self._goto: List[Dict[str, int]] = [{}]
+        # fail[s]: 失配跳转
+        self._fail: List[int] = [0]
+        # output[s]: 以状态s结尾的词条编号（-1表示无）
+        self._output: List[int] = [-1]
+        # dict_link[s]: 沿fail链最近的带输出状态
+        self._dict_link: List[int] = [0]
+        # 词条表: (词条, 实体类型)
+        self.keywords: List[Tuple[str, str]] = []
+        self.fingerprint = ''
+
+        if dictionaries is not None:
+            self.build(dictionaries)
+
+    @staticmethod
+    def compute_fingerprint(dictionaries: Dict[str, List[str]]) -> str:
+        """计算词典指纹，用于校验缓存的自动机是否过期"""
+        payload = json.dumps(dictionaries, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def build(self, dictionaries: Dict[str, List[str]]):
+        """从词典构建自动机"""
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [-1]
+        self._dict_link = [0]
+        self.keywords = []
+        self.fingerprint = self.compute_fingerprint(dictionaries)
+
+        # 1. 构建字典树（同一词条出现在多个类型中时，保留首个类型）
+        for entity_type, words in dictionaries.items():
+            for word in words:
+                if not word:
+                    continue
+                state = 0
+                for ch in word:
+                    nxt = self._goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][ch] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._output.append(-1)
+                        self._dict_link.append(0)
+                    state = nxt
+                if self._output[state] == -1:
+                    self._output[state] = len(self.keywords)
+                    self.keywords.append((word, entity_type))
+
+        # 2. BFS计算fail链和输出链
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = fail_target if fail_target != nxt else 0
+                target = self._fail[nxt]
+                self._dict_link[nxt] = target if self._output[target] != -1 else self._dict_link[target]
+
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """扫描文本，产出所有命中 (start, end, 词条编号)，允许重叠"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_link = self._dict_link
+        keywords = self.keywords
+
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            hit = state if output[state] != -1 else dict_link[state]
+            while hit:
+                idx = output[hit]
+                end = i + 1
+                yield end - len(keywords[idx][0]), end, idx
+                hit = dict_link[hit]
+
+    def match(self, text: str) -> List[Dict]:
+        """最左最长匹配，返回互不重叠的实体"""
+        # 每个起点只保留最长命中
+        longest = {}
+        for start, end, idx in self.iter_matches(text):
+            best = longest.get(start)
+            if best is None or end > best[0]:
+                longest[start] = (end, idx)
+
+        entities = []
+        last_end = 0
+        for start in sorted(longest):
+            if start < last_end:
+                continue
+            end, idx = longest[start]
+            word, entity_type = self.keywords[idx]
+            entities.append({
+                'text': word,
+                'type': entity_type,
+                'start': start,
+                'end': end,
+                'source': 'rule'
+            })
+            last_end = end
+
+        return entities
+
+    def save(self, path: str):
+        """将自动机保存到磁盘"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'version': self.FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'keywords': self.keywords,
+            'goto': self._goto,
+            'fail': self._fail,
+            'output': self._output,
+            'dict_link': self._dict_link,
+        }
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'AhoCorasickMatcher':
+        """从磁盘加载自动机"""
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported automaton version: {state.get('version')}")
+
+        matcher = cls()
+        matcher.fingerprint = state['fingerprint']
+        matcher.keywords = state['keywords']
+        matcher._goto = state['goto']
+        matcher._fail = state['fail']
+        matcher._output = state['output']
+        matcher._dict_link = state['dict_link']
+        return matcher
+
+    @classmethod
+    def load_or_build(cls, dictionaries: Dict[str, List[str]], path: Optional[str] = None) -> 'AhoCorasickMatcher':
+        """优先加载磁盘上的自动机，词典变化或文件缺失时重新构建并保存"""
+        if path is None:
+            return cls(dictionaries)
+
+        fingerprint = cls.compute_fingerprint(dictionaries)
+        if Path(path).exists():
+            try:
+                matcher = cls.load(path)
+                if matcher.fingerprint == fingerprint:
+                    return matcher
+            except (OSError, ValueError, KeyError, pickle.UnpicklingError) as e:
+                print(f"自动机缓存 {path} 无法加载，重新构建: {e}")
+
+        matcher = cls(dictionaries)
+        matcher.save(path)
+        return matcher
@@ -1,9 +1,14 @@
 """
 实体识别模块 - 医学NER
 """
-import spacy
-from typing import List, Dict, Tuple
-import re
+import hashlib
+import os
+import threading
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
+from src.extraction.entity_normalizer import EntityNormalizer, entity_normalizer
+from src.extraction.matcher import AhoCorasickMatcher
+from src.extraction.span_merger import Span, SpanMerger
+from src.utils.lazy import LazyProxy
 
 class MedicalNER:
     """医学实体识别器"""
@@ -19,8 +24,17 @@ class MedicalNER:
         'GENE': '基因/蛋白'
     }
     
-    def __init__(self, model_name='en_core_sci_sm'):
-        """初始化NER模型"""
+    def __init__(self, model_name='en_core_sci_sm', automaton_path: Optional[str] = None,
+                 merge_policy: str = 'longest', normalizer: Optional[EntityNormalizer] = None):
+        """初始化NER模型
+
+        automaton_path: 词典自动机的缓存路径，存在且词典未变化时直接加载
+        merge_policy: 规则与模型结果的冲突合并策略，见 SpanMerger.POLICIES
+        normalizer: 实体归一化索引；其中的名称和别名并入词典，识别结果附带规范名称 name
+        """
+        # spaCy 导入本身就需要数百毫秒，推迟到实例化时
+        import spacy
+        self.spacy_version = spacy.__version__
         try:
             self.nlp = spacy.load(model_name)
         except OSError:
@@ -28,7 +42,47 @@ class MedicalNER:
             self.nlp = None
         
         # 加载医学词典（简化版）
-        self.dictionaries = self._load_dictionaries()
+        self.automaton_path = automaton_path
+        self.normalizer = normalizer
+        self._normalizer_version = None
+        self._sync_lock = threading.Lock()
+        self.reload_dictionaries()
+        self.span_merger = SpanMerger(merge_policy, type_priority=list(self.ENTITY_TYPES))
+    
+    def fingerprint(self) -> str:
+        """识别结果的版本指纹：词典、spaCy模型名称与版本、合并策略"""
+        model = f"{self.nlp.meta.get('name')}@{self.nlp.meta.get('version')}" if self.nlp else 'rules'
+        self._sync_dictionaries()
+        aliases = self.normalizer.fingerprint() if self.normalizer is not None else ''
+        payload = '|'.join([self.matcher.fingerprint, aliases, model, self.spacy_version, self.span_merger.policy])
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def reload_dictionaries(self):
+        """重新加载词典并更新自动机"""
+        dictionaries = self._load_dictionaries()
+        if self.normalizer is not None:
+            self._normalizer_version = self.normalizer.version
+            for entity_type, forms in self.normalizer.surface_forms(self.ENTITY_TYPES).items():
+                words = dictionaries.setdefault(entity_type, [])
+                known = set(words)
+                words.extend(form for form in forms if form not in known)
+        self.dictionaries = dictionaries
+        self.matcher = AhoCorasickMatcher.load_or_build(self.dictionaries, self.automaton_path)
+    
+    def _sync_dictionaries(self):
+        """归一化索引登记了新实体/别名后，在下一次识别前重建自动机"""
+        if self.normalizer is None or self.normalizer.version == self._normalizer_version:
+            return
+        with self._sync_lock:
+            if self.normalizer.version != self._normalizer_version:
+                self.reload_dictionaries()
+    
+    def _canonicalize(self, entities: List[Dict]) -> List[Dict]:
+        """为识别结果附加规范名称 name（未登记的实体即为原文）"""
+        for entity in entities:
+            entity['name'] = (self.normalizer.canonical_name(entity['text'], entity['type'])
+                              if self.normalizer is not None else entity['text'])
+        return entities
     
     def _load_dictionaries(self) -> Dict[str, List[str]]:
         """加载医学词典"""
@@ -43,34 +97,19 @@ class MedicalNER:
     
     def extract_by_rules(self, text: str) -> List[Dict]:
         """基于规则提取实体"""
-        entities = []
-        
-        for entity_type, keywords in self.dictionaries.items():
-            for keyword in keywords:
-                for match in re.finditer(re.escape(keyword), text):
-                    entities.append({
-                        'text': keyword,
-                        'type': entity_type,
-                        'start': match.start(),
-                        'end': match.end(),
-                        'source': 'rule'
-                    })
-        
-        # 去重（按位置）
-        entities = sorted(entities, key=lambda x: (x['start'], -x['end']))
-        filtered = []
-        for e in entities:
-            if not any(f['start'] <= e['start'] and f['end'] >= e['end'] for f in filtered):
-                filtered.append(e)
-        
-        return filtered
+        self._sync_dictionaries()
+        # 单遍扫描，最左最长匹配，结果互不重叠
+        return self.matcher.match(text)
     
     def extract_by_model(self, text: str) -> List[Dict]:
         """基于模型提取实体"""
         if self.nlp is None:
             return []
         
-        doc = self.nlp(text)
+        return self._doc_entities(self.nlp(text))
+    
+    def _doc_entities(self, doc) -> List[Dict]:
+        """将spaCy文档中的实体转换为字典"""
         entities = []
         
         for ent in doc.ents:
@@ -84,8 +123,8 @@ class MedicalNER:
         
         return entities
     
-    def extract(self, text: str, use_rules=True, use_model=True) -> List[Dict]:
-        """提取实体（融合规则和模型）"""
+    def extract_spans(self, text: str, use_rules=True, use_model=True) -> List[Span]:
+        """提取实体，返回紧凑的Span记录"""
         all_entities = []
         
         if use_rules:
@@ -95,13 +134,30 @@ class MedicalNER:
             all_entities.extend(self.extract_by_model(text))
         
         # 合并和去重
-        all_entities = sorted(all_entities, key=lambda x: (x['start'], -x['end']))
-        filtered = []
-        for e in all_entities:
-            if not any(f['start'] <= e['start'] and f['end'] >= e['end'] for f in filtered):
-                filtered.append(e)
+        return self.span_merger.merge(all_entities)
+    
+    def extract(self, text: str, use_rules=True, use_model=True) -> List[Dict]:
+        """提取实体（融合规则和模型）"""
+        return self._canonicalize([span.to_dict() for span in self.extract_spans(text, use_rules, use_model)])
+    
+    def extract_batch(self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1,
+                      use_rules=True, use_model=True) -> Iterator[List[Dict]]:
+        """批量提取实体，按输入顺序逐篇产出
+
+        模型部分通过 nlp.pipe 成批推理，n_process > 1 时由spaCy启动多进程。
+        """
+        if not (use_model and self.nlp):
+            for text in texts:
+                yield self.extract(text, use_rules, use_model=False)
+            return
         
-        return filtered
+        for doc in self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+            all_entities = self.extract_by_rules(doc.text) if use_rules else []
+            all_entities.extend(self._doc_entities(doc))
+            yield self._canonicalize([span.to_dict() for span in self.span_merger.merge(all_entities)])
 
-# 全局实例
-ner_extractor = MedicalNER()
+# 全局实例（首次使用时才加载模型）
+ner_extractor = LazyProxy(
+    lambda: MedicalNER(automaton_path=os.getenv('NER_AUTOMATON_PATH'), normalizer=entity_normalizer),
+    'ner_extractor'
+)
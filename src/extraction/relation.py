@@ -1,9 +1,67 @@
 """
 关系抽取模块 - 医学关系识别
 """
-from typing import List, Dict, Tuple
+from bisect import bisect_left
+from collections import defaultdict
+from typing import List, Dict, Iterator, Optional, Tuple
+import hashlib
+import json
+import os
 import re
 
+from src.extraction.matcher import AhoCorasickMatcher
+from src.extraction.sentence import SENTENCE_DELIMITERS
+
+# 模式模板占位符对应的实体类型
+PLACEHOLDER_TYPES = {
+    'disease': 'DISEASE',
+    'drug': 'DRUG',
+    'drug2': 'DRUG',
+    'symptom': 'SYMPTOM',
+    'examination': 'EXAMINATION'
+}
+
+
+class KeywordIndex:
+    """单篇文档中某类关键词的位置索引
+
+    命中按起点排序，并预先计算后缀最小终点；
+    "区间 [lo, hi) 内是否完整包含某个关键词" 只需一次二分查找。
+    """
+
+    def __init__(self, spans: List[Tuple[int, int]]):
+        spans.sort()
+        self.starts = [start for start, _ in spans]
+        self.min_ends = [end for _, end in spans]
+        for i in range(len(spans) - 2, -1, -1):
+            if self.min_ends[i + 1] < self.min_ends[i]:
+                self.min_ends[i] = self.min_ends[i + 1]
+
+    def contains(self, lo: int, hi: int) -> bool:
+        i = bisect_left(self.starts, lo)
+        return i < len(self.starts) and self.min_ends[i] <= hi
+
+
+class RelationPattern:
+    """编译后的关系模板：{first}<between>{second}<suffix>"""
+
+    __slots__ = ('relation', 'first_type', 'second_type', 'between', 'suffix', 'head_first')
+
+    def __init__(self, relation: str, template: str, head_type: str, tail_type: str):
+        parts = re.split(r'\{(\w+)\}', template)
+        if len(parts) != 5 or parts[0]:
+            raise ValueError(f"Relation template must be '{{a}}...{{b}}...': {template}")
+        _, first, between, second, suffix = parts
+        self.relation = relation
+        self.first_type = PLACEHOLDER_TYPES[first]
+        self.second_type = PLACEHOLDER_TYPES[second]
+        self.between = re.compile(between)
+        self.suffix = re.compile(suffix) if suffix else None
+        # 模板中的先后顺序与关系方向不一定一致，如 {drug}...治疗...{disease}
+        self.head_first = (self.first_type, self.second_type) == (head_type, tail_type)
+        if not self.head_first and (self.second_type, self.first_type) != (head_type, tail_type):
+            raise ValueError(f"Template {template} does not match {relation}({head_type}, {tail_type})")
+
 class RelationExtractor:
     """医学关系抽取器"""
     
@@ -55,75 +113,178 @@ class RelationExtractor:
         ('DISEASE', 'DISEASE'): ['COMPLICATION', 'DIFFERENTIAL']
     }
     
-    def __init__(self):
+    def __init__(self, max_distance: Optional[int] = 100, sentence_window: Optional[int] = 0):
+        """
+        Args:
+            max_distance: 候选实体对之间的最大字符距离，None 表示不限
+            sentence_window: 候选实体对之间最多跨越的句子边界数，None 表示不限
+        """
         self.patterns = self.RELATION_PATTERNS
-    
-    def extract_by_rules(self, text: str, entities: List[Dict]) -> List[Dict]:
-        """基于规则抽取关系"""
+        self.max_distance = max_distance
+        self.sentence_window = sentence_window
+
+        # 关系类型 -> (头实体类型, 尾实体类型)
+        self.relation_types = {
+            relation: pair
+            for pair, relations in self.ENTITY_RELATION_MAP.items()
+            for relation in relations
+        }
+
+        # 所有关系关键词和句子边界合并为一个自动机，每篇文档只扫描一遍
+        self.keyword_relations: Dict[str, List[str]] = defaultdict(list)
+        for rel_type, config in self.patterns.items():
+            for keyword in config.get('keywords', []):
+                self.keyword_relations[keyword].append(rel_type)
+        self.matcher = AhoCorasickMatcher({
+            'KEYWORD': list(self.keyword_relations),
+            'BOUNDARY': [d for d in SENTENCE_DELIMITERS if d not in self.keyword_relations]
+        })
+
+        # 实体类型对 -> 需要检查关键词的关系类型
+        self.rule_relations = {
+            pair: [rel for rel in relations if self.patterns.get(rel, {}).get('keywords')]
+            for pair, relations in self.ENTITY_RELATION_MAP.items()
+        }
+
+        # 模板预编译，按 (先出现的实体类型, 后出现的实体类型) 分组
+        self.compiled_patterns: Dict[Tuple[str, str], List[RelationPattern]] = defaultdict(list)
+        for rel_type, config in self.patterns.items():
+            head_type, tail_type = self.relation_types[rel_type]
+            for template in config.get('patterns', []):
+                pattern = RelationPattern(rel_type, template, head_type, tail_type)
+                self.compiled_patterns[(pattern.first_type, pattern.second_type)].append(pattern)
+
+        payload = json.dumps([
+            self.patterns, sorted(self.ENTITY_RELATION_MAP.items()), list(SENTENCE_DELIMITERS),
+            self.max_distance, self.sentence_window
+        ], ensure_ascii=False, sort_keys=True)
+        self._fingerprint = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def fingerprint(self) -> str:
+        """抽取结果的版本指纹：关系模板、关键词和候选窗口配置"""
+        return self._fingerprint
+
+    def _scan(self, text: str) -> Tuple[Dict[str, KeywordIndex], List[int]]:
+        """单遍扫描文档，返回 (关系类型 -> 关键词位置索引, 句子边界位置)"""
+        spans = defaultdict(list)
+        boundaries = []
+        for start, end, idx in self.matcher.iter_matches(text):
+            word, kind = self.matcher.keywords[idx]
+            if kind == 'BOUNDARY':
+                boundaries.append(start)
+                continue
+            for rel_type in self.keyword_relations[word]:
+                spans[rel_type].append((start, end))
+            if len(word) == 1 and word in SENTENCE_DELIMITERS:
+                boundaries.append(start)
+        return {rel_type: KeywordIndex(s) for rel_type, s in spans.items()}, sorted(boundaries)
+
+    def _candidate_pairs(self, entities: List[Dict], boundaries: List[int],
+                         sentence_window: Optional[int] = None) -> Iterator[Tuple[Dict, Dict]]:
+        """按位置产出前后实体对 (first, second)，first 在 second 之前且二者距离在窗口内"""
+        sentence_window = self.sentence_window if sentence_window is None else sentence_window
+        ordered = sorted(entities, key=lambda e: (e['start'], e['end']))
+        starts = [e['start'] for e in ordered]
+        for first in ordered:
+            j = bisect_left(starts, first['end'])
+            while j < len(ordered):
+                second = ordered[j]
+                j += 1
+                if self.max_distance is not None and second['start'] - first['end'] > self.max_distance:
+                    break
+                if sentence_window is not None:
+                    crossed = bisect_left(boundaries, second['start']) - bisect_left(boundaries, first['end'])
+                    if crossed > sentence_window:
+                        break
+                yield first, second
+
+    def extract_by_rules(self, text: str, entities: List[Dict], scan=None) -> List[Dict]:
+        """基于规则抽取关系：头实体在前、尾实体在后，且二者之间出现关系关键词"""
         relations = []
-        
-        # 构建实体位置索引
-        entity_map = {}
-        for i, ent in enumerate(entities):
-            key = (ent['start'], ent['end'])
-            entity_map[key] = ent
-        
-        # 遍历实体对
-        for i, head in enumerate(entities):
-            for j, tail in enumerate(entities):
-                if i == j:
-                    continue
-                
-                # 检查实体对是否支持关系
-                relation_types = self.ENTITY_RELATION_MAP.get(
-                    (head['type'], tail['type']), []
-                )
-                
-                for rel_type in relation_types:
-                    # 检查文本中是否有关系关键词
-                    between_text = text[head['end']:tail['start']]
-                    
-                    if rel_type in self.patterns:
-                        keywords = self.patterns[rel_type].get('keywords', [])
-                        if any(kw in between_text for kw in keywords):
-                            relations.append({
-                                'head': head['text'],
-                                'head_type': head['type'],
-                                'relation': rel_type,
-                                'tail': tail['text'],
-                                'tail_type': tail['type'],
-                                'confidence': 0.7,
-                                'source': 'rule'
-                            })
-        
+        keyword_index, boundaries = scan or self._scan(text)
+
+        for head, tail in self._candidate_pairs(entities, boundaries):
+            for rel_type in self.rule_relations.get((head['type'], tail['type']), ()):
+                index = keyword_index.get(rel_type)
+                if index is not None and index.contains(head['end'], tail['start']):
+                    relations.append(self._relation(head, rel_type, tail, 0.7, 'rule'))
+
         return relations
-    
-    def extract_by_patterns(self, text: str, entities: List[Dict]) -> List[Dict]:
-        """基于正则模式抽取关系"""
+
+    def extract_by_patterns(self, text: str, entities: List[Dict], scan=None) -> List[Dict]:
+        """基于预编译的正则模板抽取关系（模板只在句内匹配）
+
+        模板中的 .*? 可以跨过句内其他实体，两实体之间夹着与任一端同类型的实体时不匹配，
+        如"阿司匹林用于治疗冠心病，二甲双胍用于治疗糖尿病"不产生 糖尿病-阿司匹林。
+        """
         relations = []
-        
-        # 简化实现 - 实际项目需要更复杂的模式匹配
-        # 这里仅作为示例
-        
+        _, boundaries = scan or self._scan(text)
+        spans = defaultdict(list)
+        for entity in entities:
+            spans[entity['type']].append((entity['start'], entity['end']))
+        entity_index = {entity_type: KeywordIndex(s) for entity_type, s in spans.items()}
+
+        for first, second in self._candidate_pairs(entities, boundaries, sentence_window=0):
+            patterns = self.compiled_patterns.get((first['type'], second['type']))
+            if not patterns:
+                continue
+            if any(entity_index[t].contains(first['end'], second['start']) for t in {first['type'], second['type']}):
+                continue
+            for pattern in patterns:
+                if not pattern.between.fullmatch(text, first['end'], second['start']):
+                    continue
+                if pattern.suffix is not None:
+                    k = bisect_left(boundaries, second['end'])
+                    end = boundaries[k] if k < len(boundaries) else len(text)
+                    if not pattern.suffix.match(text, second['end'], end):
+                        continue
+                head, tail = (first, second) if pattern.head_first else (second, first)
+                relations.append(self._relation(head, pattern.relation, tail, 0.8, 'pattern'))
+
         return relations
+
+    @staticmethod
+    def _relation(head: Dict, rel_type: str, tail: Dict, confidence: float, source: str) -> Dict:
+        # 实体带规范名称时使用规范名称，同一实体的不同写法合并为一个节点
+        return {
+            'head': head.get('name') or head['text'],
+            'head_type': head['type'],
+            'relation': rel_type,
+            'tail': tail.get('name') or tail['text'],
+            'tail_type': tail['type'],
+            'confidence': confidence,
+            'source': source
+        }
     
     def extract(self, text: str, entities: List[Dict]) -> List[Dict]:
         """抽取关系"""
+        scan = self._scan(text)
         relations = []
         
-        # 规则抽取
-        relations.extend(self.extract_by_rules(text, entities))
+        # 规则抽取 + 模板抽取
+        relations.extend(self.extract_by_rules(text, entities, scan))
+        relations.extend(self.extract_by_patterns(text, entities, scan))
         
-        # 去重
-        seen = set()
-        unique_relations = []
+        # 去重，同一三元组保留置信度最高的一条
+        unique_relations = {}
         for rel in relations:
             key = (rel['head'], rel['relation'], rel['tail'])
-            if key not in seen:
-                seen.add(key)
-                unique_relations.append(rel)
+            if key not in unique_relations or rel['confidence'] > unique_relations[key]['confidence']:
+                unique_relations[key] = rel
         
-        return unique_relations
+        return list(unique_relations.values())
+    
+    def extract_batch(self, texts: List[str], entities_list: List[List[Dict]]) -> List[List[Dict]]:
+        """批量抽取关系，结果与输入顺序一致"""
+        return [self.extract(text, entities) for text, entities in zip(texts, entities_list)]
+
+def _optional_int(value: Optional[str], default: Optional[int]) -> Optional[int]:
+    if value is None:
+        return default
+    return None if value.lower() in ('', 'none') else int(value)
 
 # 全局实例
-relation_extractor = RelationExtractor()
+relation_extractor = RelationExtractor(
+    max_distance=_optional_int(os.getenv('RELATION_MAX_DISTANCE'), 100),
+    sentence_window=_optional_int(os.getenv('RELATION_SENTENCE_WINDOW'), 0)
+)
@@ -0,0 +1,79 @@
+"""
+分句模块 - 中英文句子切分
+"""
+import re
+from typing import List, Tuple
+
+# 句末标点；英文句点需额外判断（小数、缩写、编号）
+SENTENCE_DELIMITERS = '。！？；!?;\n'
+
+# 句末标点之后仍属于本句的闭合引号/括号
+CLOSING_CHARS = set('”’"\'）)]】」』')
+
+# 句点之后不断句的常见缩写
+ABBREVIATIONS = {'e.g', 'i.e', 'etc', 'vs', 'dr', 'mr', 'mrs', 'ms', 'prof', 'fig', 'al', 'no', 'approx', 'ca'}
+
+_WORD_BEFORE = re.compile(r'([\w.]+)$')
+
+
+class SentenceSplitter:
+    """按中英文句末标点切分句子，返回句子在原文中的字符区间
+
+    句子区间去掉首尾空白，不含空句；区间之间的文本只有空白，
+    因此句内偏移加上句子起点即为原文偏移。
+    """
+
+    def __init__(self, delimiters: str = SENTENCE_DELIMITERS, abbreviations=ABBREVIATIONS):
+        self.abbreviations = {a.lower() for a in abbreviations}
+        self._pattern = re.compile('[' + re.escape(delimiters + '.') + ']+')
+
+    def _is_period_boundary(self, text: str, sentence_start: int, pos: int, end: int) -> bool:
+        """判断 text[pos:end] 处的连续句点是否为句末"""
+        # 句点后紧跟ASCII字母/数字/标点：小数 2.5、缩写 e.g.、网址等
+        if end < len(text):
+            nxt = text[end]
+            if not (nxt.isspace() or nxt in CLOSING_CHARS or not nxt.isascii()):
+                return False
+        match = _WORD_BEFORE.search(text, max(sentence_start, pos - 16), pos)
+        if match is None:
+            return True
+        word = match.group(1)
+        if word.lower().rstrip('.') in self.abbreviations:
+            return False
+        # 人名首字母 J. Smith
+        if len(word) == 1 and word.isupper():
+            return False
+        # 句首编号 1. 2.
+        if word.isdigit() and not text[sentence_start:match.start()].strip():
+            return False
+        return True
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        spans = []
+        start = 0
+        for m in self._pattern.finditer(text):
+            end = m.end()
+            if m.group().strip('.') == '' and not self._is_period_boundary(text, start, m.start(), end):
+                continue
+            while end < len(text) and text[end] in CLOSING_CHARS:
+                end += 1
+            self._append(spans, text, start, end)
+            start = end
+        self._append(spans, text, start, len(text))
+        return spans
+
+    @staticmethod
+    def _append(spans: List[Tuple[int, int]], text: str, start: int, end: int):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+
+    def split(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.spans(text)]
+
+
+# 全局实例
+sentence_splitter = SentenceSplitter()
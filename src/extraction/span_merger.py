@@ -0,0 +1,109 @@
+"""
+实体片段合并模块 - 排序扫描去除嵌套/冲突实体
+"""
+from typing import Dict, Iterable, List, Optional, Union
+
+
+class Span:
+    """紧凑的实体片段记录"""
+
+    __slots__ = ('text', 'type', 'start', 'end', 'source')
+
+    def __init__(self, text: str, type: str, start: int, end: int, source: str = 'rule'):
+        self.text = text
+        self.type = type
+        self.start = start
+        self.end = end
+        self.source = source
+
+    def __getitem__(self, key: str):
+        # 兼容按字典方式读取字段
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Span):
+            return NotImplemented
+        return (self.text, self.type, self.start, self.end, self.source) == \
+            (other.text, other.type, other.start, other.end, other.source)
+
+    def __repr__(self) -> str:
+        return f"Span({self.text!r}, {self.type!r}, {self.start}, {self.end}, {self.source!r})"
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Span':
+        return cls(data['text'], data['type'], data['start'], data['end'], data.get('source', 'rule'))
+
+    def to_dict(self) -> Dict:
+        return {
+            'text': self.text,
+            'type': self.type,
+            'start': self.start,
+            'end': self.end,
+            'source': self.source
+        }
+
+
+class SpanMerger:
+    """实体片段合并器
+
+    按 (start, -end) 排序后单遍扫描。保留的片段起止位置均严格递增，
+    因此包含当前片段的已保留片段总是列表末尾的一段，无需两两比较。
+
+    合并策略:
+        longest         - 保留外层（最长）片段，与原嵌套过滤行为一致
+        model_priority  - 模型结果优先于规则结果，同来源再比较长度
+        type_aware      - 按实体类型优先级裁决冲突，同类型再比较长度
+    """
+
+    POLICIES = ('longest', 'model_priority', 'type_aware')
+
+    DEFAULT_SOURCE_PRIORITY = ['model', 'rule']
+
+    def __init__(self, policy: str = 'longest',
+                 source_priority: Optional[List[str]] = None,
+                 type_priority: Optional[List[str]] = None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unsupported merge policy: {policy}")
+        self.policy = policy
+
+        # 列表中越靠前优先级越高
+        sources = source_priority or self.DEFAULT_SOURCE_PRIORITY
+        self._source_rank = {s: len(sources) - i for i, s in enumerate(sources)}
+        types = type_priority or []
+        self._type_rank = {t: len(types) - i for i, t in enumerate(types)}
+
+    def _rank(self, span: Span):
+        if self.policy == 'model_priority':
+            return (self._source_rank.get(span.source, 0), span.end - span.start)
+        if self.policy == 'type_aware':
+            return (self._type_rank.get(span.type, 0), span.end - span.start)
+        return (span.end - span.start,)
+
+    def merge(self, spans: Iterable[Union[Span, Dict]]) -> List[Span]:
+        """合并实体片段，返回保留的片段（按起始位置排序）"""
+        items = [s if isinstance(s, Span) else Span.from_dict(s) for s in spans]
+        items.sort(key=lambda s: (s.start, -s.end))
+
+        kept: List[Span] = []
+        for span in items:
+            # 已保留片段的 start <= span.start，end 递增：包含span的是末尾一段
+            i = len(kept)
+            while i and kept[i - 1].end >= span.end:
+                i -= 1
+            if i == len(kept):
+                kept.append(span)
+                continue
+
+            # span被包含：只有在优先级严格高于所有外层片段时才替换它们
+            rank = self._rank(span)
+            if all(rank > self._rank(outer) for outer in kept[i:]):
+                del kept[i:]
+                kept.append(span)
+
+        return kept
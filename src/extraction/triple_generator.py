@@ -1,26 +1,170 @@
 """
 三元组生成模块 - 从文本生成知识三元组
 """
-from typing import List, Dict
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice, repeat
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from src.extraction.extraction_cache import ExtractionCache, extraction_cache, normalize_text
 from src.extraction.ner import ner_extractor
 from src.extraction.relation import relation_extractor
+from src.extraction.sentence import SentenceSplitter, sentence_splitter
+from src.utils.lazy import LazyProxy
+
+
+def _batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """按固定大小切分可迭代对象"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _shift_entities(entities: List[Dict], offset: int) -> List[Dict]:
+    if not offset:
+        return entities
+    return [{**e, 'start': e['start'] + offset, 'end': e['end'] + offset} for e in entities]
+
+
+# 工作进程内的生成器实例
+_worker_generator = None
+
+def init_worker(config: Optional[Dict] = None):
+    """进程池初始化：按 TripleGenerator.worker_config() 在工作进程内构建生成器，未指定时使用全局实例
+
+    只传可pickle的普通配置，spawn/forkserver 启动方式下也不会序列化父进程的模型、池和连接。
+    NER模型和关系模板由工作进程按同样的环境变量加载；父进程已加载模型时 fork 出的工作进程直接继承，
+    否则各工作进程在首次抽取时加载一次。
+    """
+    global _worker_generator
+    _worker_generator = triple_generator if config is None else TripleGenerator.from_worker_config(config)
+
+def generate_batch_in_worker(texts: List[str], source: str, batch_size: int) -> List[Dict]:
+    # 文档级进程池已占满CPU，工作进程内不再按句子二次并行
+    return _worker_generator.generate_batch(texts, source, batch_size, parallel=False)
+
+def extract_units_in_worker(units: List[str], batch_size: int) -> List[Tuple[List[Dict], List[Dict]]]:
+    return _worker_generator._extract_units(units, batch_size)
+
 
 class TripleGenerator:
     """知识三元组生成器"""
     
-    def __init__(self):
+    # 抽取逻辑本身变化（而非词典/模板/模型）时递增，使旧缓存失效
+    CACHE_VERSION = '2'
+    
+    def __init__(self, splitter: Optional[SentenceSplitter] = sentence_splitter,
+                 sentence_workers: int = 1, sentence_pool: str = 'process',
+                 min_parallel_sentences: int = 64, cache: Optional[ExtractionCache] = None):
+        """
+        Args:
+            splitter: 分句器；NER和关系抽取按句执行，偏移映射回原文。
+                None 表示整篇处理，此时关系抽取的 sentence_window 才会放开跨句实体对
+            sentence_workers: 句子级并行度，>1 时句子按块分发到线程/进程池
+            sentence_pool: 'process' 或 'thread'
+            min_parallel_sentences: 句子数少于该值时直接在当前线程执行
+            cache: 抽取结果缓存，命中时跳过NER和关系抽取
+        """
+        if sentence_pool not in ('process', 'thread'):
+            raise ValueError(f"Unsupported sentence pool: {sentence_pool}")
         self.ner = ner_extractor
         self.relation_extractor = relation_extractor
+        self.splitter = splitter
+        self.sentence_workers = sentence_workers
+        self.sentence_pool = sentence_pool
+        self.min_parallel_sentences = min_parallel_sentences
+        self.cache = cache
+        self._executor: Optional[Executor] = None
+        self._executor_pid: Optional[int] = None
+    
+    def worker_config(self) -> Dict:
+        """工作进程重建生成器所需的配置，见 init_worker；工作进程内不再按句子二次并行"""
+        return {
+            'segment_sentences': self.splitter is not None,
+            'cache_path': self.cache.path if self.cache is not None else None,
+            'cache_max_bytes': self.cache.max_bytes if self.cache is not None else None
+        }
+    
+    @classmethod
+    def from_worker_config(cls, config: Dict) -> 'TripleGenerator':
+        cache = None
+        if config['cache_path']:
+            # 与全局缓存同一文件时复用全局实例（各进程各自连接）
+            if extraction_cache is not None and extraction_cache.path == config['cache_path']:
+                cache = extraction_cache
+            else:
+                cache = ExtractionCache(config['cache_path'], max_bytes=config['cache_max_bytes'])
+        return cls(splitter=sentence_splitter if config['segment_sentences'] else None, cache=cache)
     
     def generate_from_text(self, text: str, source: str = None) -> Dict:
         """从文本生成三元组"""
-        # 1. 实体识别
-        entities = self.ner.extract(text)
-        
-        # 2. 关系抽取
-        relations = self.relation_extractor.extract(text, entities)
+        return self.generate_batch([text], source)[0]
+    
+    def fingerprint(self) -> str:
+        """抽取流水线的版本指纹，作为抽取缓存键的一部分"""
+        return '|'.join([
+            self.CACHE_VERSION, self.ner.fingerprint(), self.relation_extractor.fingerprint(),
+            'sentences' if self.splitter is not None else 'document'
+        ])
+    
+    def _extract_units(self, units: List[str], batch_size: int = 64) -> List[Tuple[List[Dict], List[Dict]]]:
+        """对一组互相独立的文本单元（句子）做实体识别和关系抽取"""
+        entities_list = list(self.ner.extract_batch(units, batch_size=batch_size))
+        relations_list = self.relation_extractor.extract_batch(units, entities_list)
+        return list(zip(entities_list, relations_list))
+    
+    def _get_executor(self) -> Executor:
+        # 进程池在首次需要时创建；fork 出的子进程不能复用父进程的池
+        if self._executor is None or self._executor_pid != os.getpid():
+            if self.sentence_pool == 'thread':
+                self._executor = ThreadPoolExecutor(self.sentence_workers)
+            else:
+                self._executor = ProcessPoolExecutor(self.sentence_workers, initializer=init_worker,
+                                                     initargs=(self.worker_config(),))
+            self._executor_pid = os.getpid()
+        return self._executor
+    
+    def _run_units(self, units: List[str], batch_size: int = 64,
+                   parallel: bool = True) -> List[Tuple[List[Dict], List[Dict]]]:
+        """抽取所有句子，句子足够多时按块分发到池中并行，结果与输入顺序一致"""
+        if not parallel or self.sentence_workers <= 1 or len(units) < self.min_parallel_sentences:
+            return self._extract_units(units, batch_size)
         
-        # 3. 构建三元组
+        # 每个工作者约分到4块，兼顾负载均衡与调度开销
+        chunk_size = max(-(-len(units) // (self.sentence_workers * 4)), 1)
+        chunks = [units[i:i + chunk_size] for i in range(0, len(units), chunk_size)]
+        fn = self._extract_units if self.sentence_pool == 'thread' else extract_units_in_worker
+        results = []
+        for part in self._get_executor().map(fn, chunks, repeat(batch_size)):
+            results.extend(part)
+        return results
+    
+    def shutdown(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+    
+    @staticmethod
+    def _assemble(spans: List[Tuple[int, int]],
+                  results: List[Tuple[List[Dict], List[Dict]]]) -> Tuple[List[Dict], List[Dict]]:
+        """合并一篇文档各句的结果：实体偏移加上句子起点，关系跨句去重保留最高置信度"""
+        entities = []
+        relations = {}
+        for (offset, _), (sentence_entities, sentence_relations) in zip(spans, results):
+            for entity in sentence_entities:
+                entities.append({**entity, 'start': entity['start'] + offset, 'end': entity['end'] + offset})
+            for rel in sentence_relations:
+                key = (rel['head'], rel['relation'], rel['tail'])
+                if key not in relations or rel['confidence'] > relations[key]['confidence']:
+                    relations[key] = rel
+        return entities, list(relations.values())
+    
+    def _build_result(self, text: str, entities: List[Dict], relations: List[Dict], source: str = None) -> Dict:
+        """由实体和关系构建三元组结果"""
         triples = []
         for rel in relations:
             triples.append({
@@ -40,13 +184,91 @@ class TripleGenerator:
             'triples': triples
         }
     
-    def generate_from_texts(self, texts: List[str], source: str = None) -> List[Dict]:
-        """批量生成三元组"""
-        results = []
+    def generate_batch(self, texts: List[str], source: str = None, batch_size: int = 64,
+                       parallel: bool = True) -> List[Dict]:
+        """处理一个批次：先查抽取缓存，未命中的文档再按批执行NER和关系抽取"""
+        if self.cache is None:
+            extracted = self._extract_documents(texts, batch_size, parallel)
+            return [
+                self._build_result(text, entities, relations, source)
+                for text, (entities, relations) in zip(texts, extracted)
+            ]
+        
+        fingerprint = self.fingerprint()
+        keys, offsets = [], []
+        results: List[Optional[Tuple[List[Dict], List[Dict]]]] = []
         for text in texts:
-            result = self.generate_from_text(text, source)
-            results.append(result)
-        return results
+            normalized, offset = normalize_text(text)
+            key = self.cache.make_key(fingerprint, normalized)
+            cached = self.cache.get(key)
+            keys.append(key)
+            offsets.append(offset)
+            results.append(None if cached is None else
+                           (_shift_entities(cached['entities'], offset), cached['relations']))
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            extracted = self._extract_documents([texts[i] for i in missing], batch_size, parallel)
+            for i, (entities, relations) in zip(missing, extracted):
+                results[i] = (entities, relations)
+                # 缓存中的偏移相对规范化文本
+                self.cache.set(keys[i], {
+                    'entities': _shift_entities(entities, -offsets[i]),
+                    'relations': relations
+                })
+        
+        return [
+            self._build_result(text, entities, relations, source)
+            for text, (entities, relations) in zip(texts, results)
+        ]
+    
+    def _extract_documents(self, texts: List[str], batch_size: int = 64,
+                           parallel: bool = True) -> List[Tuple[List[Dict], List[Dict]]]:
+        """对一批文档做NER和关系抽取，返回每篇的 (实体, 关系)
+
+        启用分句时整批文档的句子展平为一个序列统一推理，再按文档重新组装。
+        """
+        if self.splitter is None:
+            return self._extract_units(texts, batch_size)
+        
+        spans_list = [self.splitter.spans(text) for text in texts]
+        units = [text[start:end] for text, spans in zip(texts, spans_list) for start, end in spans]
+        results = self._run_units(units, batch_size, parallel)
+        
+        output = []
+        pos = 0
+        for spans in spans_list:
+            output.append(self._assemble(spans, results[pos:pos + len(spans)]))
+            pos += len(spans)
+        return output
+    
+    def iter_from_texts(self, texts: Iterable[str], source: str = None,
+                        batch_size: int = 64, n_process: int = 1) -> Iterator[Dict]:
+        """批量生成三元组，按输入顺序逐篇产出
+
+        n_process > 1 时每个工作进程持有一份完整的抽取流水线，
+        批次按提交顺序取回，同时在途的批次数受限，避免输入被一次性读入。
+        """
+        batches = _batched(texts, batch_size)
+        
+        if n_process <= 1:
+            for batch in batches:
+                yield from self.generate_batch(batch, source, batch_size)
+            return
+        
+        with multiprocessing.Pool(n_process, initializer=init_worker, initargs=(self.worker_config(),)) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.apply_async(generate_batch_in_worker, (batch, source, batch_size)))
+                if len(pending) >= n_process * 2:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+    
+    def generate_from_texts(self, texts: List[str], source: str = None,
+                            batch_size: int = 64, n_process: int = 1) -> List[Dict]:
+        """批量生成三元组"""
+        return list(self.iter_from_texts(texts, source, batch_size, n_process))
     
     def export_triples(self, triples: List[Dict], format: str = 'csv') -> str:
         """导出三元组"""
@@ -64,5 +286,13 @@ class TripleGenerator:
         else:
             raise ValueError(f"Unsupported format: {format}")
 
-# 全局实例
-triple_generator = TripleGenerator()
+def _create_triple_generator() -> TripleGenerator:
+    return TripleGenerator(
+        splitter=sentence_splitter if os.getenv('EXTRACT_SEGMENT_SENTENCES', '1') != '0' else None,
+        sentence_workers=int(os.getenv('EXTRACT_SENTENCE_WORKERS', '1')),
+        sentence_pool=os.getenv('EXTRACT_SENTENCE_POOL', 'process'),
+        cache=extraction_cache
+    )
+
+# 全局实例（首次使用时才创建）
+triple_generator = LazyProxy(_create_triple_generator, 'triple_generator')
@@ -0,0 +1,107 @@
+"""
+图谱查询缓存模块 - 进程内LRU/TTL读穿缓存
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional
+
+
+class GraphQueryCache:
+    """图谱查询结果缓存
+
+    条目保存已序列化的响应体（bytes），命中时既不访问数据库也不再做JSON编码。
+    每个条目登记其涉及的实体名称，写入时只淘汰相关条目；
+    登记了 ANY_WRITE 标记的条目（如路径查询）在任意写入后失效。
+    """
+
+    ANY_WRITE = object()
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._tags: Dict[object, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """读取缓存，过期或不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: bytes, entities: Iterable = (), ttl: Optional[float] = None):
+        """写入缓存，entities 为该结果涉及的实体名称"""
+        tags = frozenset(entities)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_entities(self, names: Iterable[str]) -> int:
+        """淘汰涉及给定实体的条目，返回淘汰数量"""
+        removed = 0
+        with self._lock:
+            for tag in list(names) + [self.ANY_WRITE]:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+# 全局实例
+graph_cache = GraphQueryCache(
+    max_entries=int(os.getenv('KG_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('KG_CACHE_TTL', '300'))
+)
@@ -0,0 +1,471 @@
+"""
+Cypher辅助模块 - 各存储后端共用的查询片段
+"""
+import re
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 标签和关系类型无法参数化，拼接进Cypher前需校验
+IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def check_identifier(name: str) -> str:
+    """校验标签/关系类型名称"""
+    if not isinstance(name, str) or not IDENTIFIER_PATTERN.match(name):
+        raise ValueError(f"Invalid label or relationship type: {name!r}")
+    return name
+
+def merge_entity_query(entity_type: str) -> str:
+    """按 (类型, 名称) 幂等写入实体，参数 $name / $properties（其余属性合并覆盖）
+
+    与唯一约束配合：重复导入或数据中重复的 (类型, 名称) 合并为同一节点，而不是违反约束。
+    """
+    return f"MERGE (n:`{check_identifier(entity_type)}` {{name: $name}}) SET n += $properties RETURN n"
+
+
+def match_entity(var: str, param: str, labels: List[str], entity_type: Optional[str] = None) -> str:
+    """按名称匹配实体的子句
+
+    指定类型时直接带标签匹配；否则对每个实体类型各匹配一次再UNION，
+    使每个分支都能命中 (label, name) 唯一约束的索引，避免全节点扫描。
+    """
+    if entity_type:
+        return f"MATCH ({var}:`{check_identifier(entity_type)}` {{name: ${param}}})"
+    branches = '\n        UNION\n        '.join(
+        f"MATCH ({var}:`{check_identifier(label)}` {{name: ${param}}}) RETURN {var}"
+        for label in labels
+    )
+    return f"""CALL {{
+        {branches}
+        }}"""
+
+
+def bulk_triples_query(head_type: str, relation: str, tail_type: str) -> str:
+    """同一 (head_type, relation, tail_type) 的批量幂等写入语句，参数 $rows（见 triple_row）
+
+    同一 (head, relation, tail) 只保留一条关系：已存在时置信度取较大值、来源并入 sources 列表、
+    其余属性覆盖。返回新插入行的 index 列表（其余行为更新）和更新行新并入的来源。
+    """
+    head_type, relation, tail_type = (check_identifier(name) for name in (head_type, relation, tail_type))
+    return f"""
+    UNWIND $rows AS row
+    MERGE (h:`{head_type}` {{name: row.head}})
+    MERGE (t:`{tail_type}` {{name: row.tail}})
+    WITH h, t, row
+    CALL {{
+        WITH h, t
+        OPTIONAL MATCH (h)-[e:`{relation}`]->(t)
+        RETURN count(e) AS existing,
+            head(collect(coalesce(e.sources, [s IN [e.source] WHERE s IS NOT NULL]))) AS known
+    }}
+    MERGE (h)-[r:`{relation}`]->(t)
+    ON CREATE SET r += row.extra, r.confidence = row.confidence, r.source = row.source, r.sources = row.sources
+    ON MATCH SET r += row.extra,
+        r.confidence = CASE
+            WHEN row.confidence IS NULL THEN r.confidence
+            WHEN r.confidence IS NULL OR row.confidence > r.confidence THEN row.confidence
+            ELSE r.confidence END,
+        r.sources = coalesce(r.sources, [s IN [r.source] WHERE s IS NOT NULL])
+            + [s IN row.sources WHERE NOT s IN coalesce(r.sources, [s IN [r.source] WHERE s IS NOT NULL])]
+    RETURN collect(CASE WHEN existing = 0 THEN row.index END) AS inserted,
+        collect(CASE WHEN existing > 0 THEN [s IN row.sources WHERE NOT s IN known] END) AS merged_sources
+    """
+
+
+# 关系属性只接受基本类型及其列表
+_PROPERTY_TYPES = (str, int, float, bool)
+
+# 报告中最多保留的拒绝明细条数
+MAX_REPORTED_REJECTIONS = 100
+
+
+def validate_triple(t: Dict):
+    """校验一条输入三元组，不合法时抛出 ValueError"""
+    for field in ('head', 'head_type', 'relation', 'tail', 'tail_type'):
+        value = t.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"missing or empty field: {field}")
+    for field in ('head_type', 'relation', 'tail_type'):
+        check_identifier(t[field])
+    properties = t.get('properties') or {}
+    if not isinstance(properties, dict):
+        raise ValueError("properties must be an object")
+    for name, value in properties.items():
+        values = value if isinstance(value, list) else [value]
+        if not all(v is None or isinstance(v, _PROPERTY_TYPES) for v in values):
+            raise ValueError(f"unsupported value for property {name!r}")
+    confidence = properties.get('confidence')
+    if confidence is not None:
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float, str)):
+            raise ValueError("confidence must be a number")
+        try:
+            confidence = float(confidence)
+        except ValueError:
+            raise ValueError("confidence must be a number")
+        if not 0.0 <= confidence <= 1.0:
+            raise ValueError("confidence must be within [0, 1]")
+
+
+def triple_row(head: str, tail: str, properties: Optional[Dict] = None, index: int = 0) -> Dict:
+    """bulk_triples_query 的一行：置信度和来源单独列出，其余属性放入 extra"""
+    extra = dict(properties or {})
+    confidence = extra.pop('confidence', None)
+    source = extra.pop('source', None)
+    source = None if source is None else str(source)
+    return {
+        'index': index,
+        'head': head,
+        'tail': tail,
+        'confidence': None if confidence is None else float(confidence),
+        'source': source,
+        'sources': [source] if source else [],
+        'extra': extra
+    }
+
+
+def _merge_rows(row: Dict, other: Dict):
+    """合并批内重复的 (head, tail)"""
+    if other['confidence'] is not None and (row['confidence'] is None or other['confidence'] > row['confidence']):
+        row['confidence'] = other['confidence']
+    row['sources'] += [s for s in other['sources'] if s not in row['sources']]
+    row['extra'].update(other['extra'])
+
+
+def iter_triple_batches(triples: Iterable[Dict], batch_size: int, report: Dict,
+                        normalize: Optional[Callable[[str, str], str]] = None) -> Iterator[Tuple[Tuple[str, str, str], List[Dict]]]:
+    """校验、批内去重并按 (head_type, relation, tail_type) 分组攒批，产出 (分组键, 行列表)
+
+    不合法的三元组计入 rejected；批内重复的三元组合并为一行，计入 updated。
+    normalize(名称, 类型) 给出时头尾实体先归一为规范名称，别名写法的重复也会合并。
+    """
+    groups = defaultdict(dict)
+
+    def flush(key):
+        rows = list(groups.pop(key).values())
+        for i, row in enumerate(rows):
+            row['index'] = i
+        return key, rows
+
+    for t in triples:
+        report['total'] += 1
+        try:
+            validate_triple(t)
+        except ValueError as e:
+            report['rejected'] += 1
+            if len(report['rejections']) < MAX_REPORTED_REJECTIONS:
+                report['rejections'].append({'row': report['total'] - 1, 'error': str(e)})
+            continue
+
+        key = (t['head_type'], t['relation'], t['tail_type'])
+        group = groups[key]
+        head, tail = t['head'], t['tail']
+        if normalize is not None:
+            head, tail = normalize(head, t['head_type']), normalize(tail, t['tail_type'])
+        row = triple_row(head, tail, t.get('properties'))
+        existing = group.get((row['head'], row['tail']))
+        if existing is not None:
+            _merge_rows(existing, row)
+            report['updated'] += 1
+            continue
+        group[(row['head'], row['tail'])] = row
+        if len(group) >= batch_size:
+            yield flush(key)
+
+    for key in list(groups):
+        yield flush(key)
+
+
+def record_batch_result(report: Dict, rows: List[Dict], records: List[Dict]) -> List[Dict]:
+    """根据 bulk_triples_query 的返回更新报告，返回新插入的行"""
+    inserted = set(records[0]['inserted']) if records else set()
+    report['imported'] += len(rows)
+    report['inserted'] += len(inserted)
+    report['updated'] += len(rows) - len(inserted)
+    return [row for row in rows if row['index'] in inserted]
+
+
+def merged_sources(records: List[Dict]) -> List[str]:
+    """bulk_triples_query 返回中并入已有关系的来源"""
+    return [source for sources in (records[0]['merged_sources'] if records else []) for source in sources]
+
+
+def new_bulk_report() -> Dict:
+    return {
+        'total': 0, 'imported': 0, 'inserted': 0, 'updated': 0, 'rejected': 0, 'failed': 0,
+        'batches': 0, 'failures': [], 'rejections': []
+    }
+
+
+def entity_relations_query(labels: List[str], entity_type: Optional[str] = None) -> str:
+    """实体一跳关系查询，参数 $name"""
+    return f"""
+    {match_entity('n', 'name', labels, entity_type)}
+    MATCH (n)-[r]-(m)
+    RETURN n, r, m
+    """
+
+
+def _path_pattern(min_depth: int, max_depth: int, relations: Optional[List[str]] = None) -> str:
+    """变长关系模式，如 [:`A`|`B`*1..3]"""
+    types = '|'.join(f"`{check_identifier(r)}`" for r in relations or ())
+    return f"[{':' + types if types else ''}*{int(min_depth)}..{int(max_depth)}]"
+
+
+def _path_filter(node_labels: Optional[List[str]] = None, simple: bool = True) -> str:
+    """路径过滤：simple 时节点不重复；指定 node_labels 时中间节点须带其中之一的标签（参数 $node_labels）"""
+    conditions = []
+    if simple:
+        conditions.append("all(n IN nodes(path) WHERE single(m IN nodes(path) WHERE m = n))")
+    if node_labels:
+        conditions.append("all(n IN nodes(path)[1..-1] WHERE any(l IN labels(n) WHERE l IN $node_labels))")
+    return 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+
+def shortest_paths_query(labels: List[str], max_depth: int,
+                         start_type: Optional[str] = None, end_type: Optional[str] = None,
+                         relations: Optional[List[str]] = None, node_labels: Optional[List[str]] = None) -> str:
+    """两实体间所有最短路径，参数 $start_name / $end_name / $limit"""
+    return f"""
+    {match_entity('source', 'start_name', labels, start_type)}
+    {match_entity('target', 'end_name', labels, end_type)}
+    WITH source, target WHERE source <> target
+    MATCH path = allShortestPaths((source)-{_path_pattern(1, max_depth, relations)}-(target))
+    {_path_filter(node_labels, simple=False)}
+    RETURN path, length(path) AS length
+    LIMIT $limit
+    """
+
+
+def path_query(labels: List[str], max_depth: int,
+               start_type: Optional[str] = None, end_type: Optional[str] = None,
+               relations: Optional[List[str]] = None, node_labels: Optional[List[str]] = None,
+               min_depth: int = 1) -> str:
+    """两实体间长度在 [min_depth, max_depth] 内的路径，参数 $start_name / $end_name / $limit"""
+    return f"""
+    {match_entity('source', 'start_name', labels, start_type)}
+    {match_entity('target', 'end_name', labels, end_type)}
+    MATCH path = (source)-{_path_pattern(min_depth, max_depth, relations)}-(target)
+    {_path_filter(node_labels)}
+    RETURN path, length(path) AS length
+    LIMIT $limit
+    """
+
+
+class PathSearch:
+    """Neo4j端的k最短路径查询计划
+
+    先用 allShortestPaths 取最短长度的路径；不足k条时按长度逐层（*d..d）补足，
+    每层带 LIMIT，不需要枚举、排序全部路径。每条语句使用剩余的时间预算作为事务超时；
+    超时或预算耗尽时停止，结果标记为 truncated。
+    服务端无法统计扩展次数，Neo4j后端不接受 max_expansions（见 check_path_budget）。
+    """
+
+    def __init__(self, labels: List[str], start_name: str, end_name: str, max_depth: int = 3, k: int = 10,
+                 start_type: Optional[str] = None, end_type: Optional[str] = None,
+                 relations: Optional[List[str]] = None, node_labels: Optional[List[str]] = None,
+                 timeout: Optional[float] = None):
+        self.labels = labels
+        self.max_depth = max_depth
+        self.k = k
+        self.start_type = start_type
+        self.end_type = end_type
+        self.relations = relations
+        self.node_labels = node_labels
+        self.params = {'start_name': start_name, 'end_name': end_name}
+        if node_labels:
+            self.params['node_labels'] = list(node_labels)
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.paths: List[Dict] = []
+        self.truncated = False
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def steps(self) -> Iterator[Tuple[str, Dict, Optional[float]]]:
+        """产出 (语句, 参数, 超时秒数)；调用方执行后通过 add() 回填结果"""
+        yield (shortest_paths_query(self.labels, self.max_depth, self.start_type, self.end_type,
+                                    self.relations, self.node_labels),
+               {**self.params, 'limit': self.k}, self.remaining())
+        if not self.paths:
+            return
+        shortest = self.paths[0]['length']
+        for depth in range(shortest + 1, self.max_depth + 1):
+            if len(self.paths) >= self.k:
+                return
+            timeout = self.remaining()
+            if timeout is not None and timeout <= 0:
+                self.truncated = True
+                return
+            yield (path_query(self.labels, depth, self.start_type, self.end_type,
+                              self.relations, self.node_labels, min_depth=depth),
+                   {**self.params, 'limit': self.k - len(self.paths)}, timeout)
+
+    def add(self, records: List[Dict]):
+        self.paths.extend(records)
+
+    def result(self) -> Dict:
+        return {'paths': self.paths[:self.k], 'truncated': self.truncated}
+
+
+def check_path_budget(max_expansions: Optional[int] = None, timeout: Optional[float] = None,
+                      supports_timeout: bool = True):
+    """Neo4j后端的路径查询预算校验：无法在服务端执行的预算直接拒绝，而不是静默忽略"""
+    if max_expansions is not None:
+        raise ValueError("max_expansions is only supported by the memory backend")
+    if timeout is not None and not supports_timeout:
+        raise ValueError("timeout is not supported by the py2neo backend")
+
+
+def neighborhood_seed_query(labels: List[str], entity_type: Optional[str] = None) -> str:
+    """邻域展开的起点，参数 $name"""
+    return f"""
+    {match_entity('n', 'name', labels, entity_type)}
+    RETURN elementId(n) AS node_id
+    """
+
+
+def neighborhood_hop_query(relations: Optional[List[str]] = None, node_labels: Optional[List[str]] = None) -> str:
+    """一跳展开，参数 $frontier（elementId列表）/ $fanout（每个节点最多展开的关系数）
+
+    只返回名称、类型和属性映射，不传输整个节点对象；子查询内按关系编号排序，保证分页稳定。
+    """
+    types = ':' + '|'.join(f"`{check_identifier(r)}`" for r in relations) if relations else ''
+    label_filter = "WHERE any(l IN labels(m) WHERE l IN $node_labels)" if node_labels else ''
+    return f"""
+    UNWIND $frontier AS node_id
+    MATCH (n) WHERE elementId(n) = node_id
+    CALL {{
+        WITH n
+        MATCH (n)-[r{types}]-(m)
+        {label_filter}
+        RETURN r, m
+        ORDER BY elementId(r)
+        LIMIT $fanout
+    }}
+    RETURN node_id, n.name AS n_name, labels(n)[0] AS n_type,
+           elementId(r) AS r_id, type(r) AS r_type, properties(r) AS r_props, startNode(r) = n AS outgoing,
+           elementId(m) AS m_id, labels(m)[0] AS m_type, properties(m) AS m_props
+    """
+
+
+class NeighborhoodExpansion:
+    """Neo4j端多跳邻域展开计划
+
+    逐跳展开，每跳的 frontier 按 chunk_size 分块查询，每个节点最多展开 fanout[hop] 条关系；
+    已访问节点不再展开，同一关系只输出一次。调用方依次执行 queries() 产出的语句，
+    并把结果交给 rows() 转换为 {'hop', 'n', 'r', 'm'} 行。
+    """
+
+    def __init__(self, labels: List[str], name: str, entity_type: Optional[str] = None, depth: int = 1,
+                 fanout: Tuple[int, ...] = (50,), relations: Optional[List[str]] = None,
+                 node_labels: Optional[List[str]] = None, chunk_size: int = 200):
+        self.labels = labels
+        self.name = name
+        self.entity_type = entity_type
+        self.depth = depth
+        self.fanout = tuple(fanout)
+        self.relations = relations
+        self.node_labels = node_labels
+        self.chunk_size = chunk_size
+        self.hop = 0
+        self.visited = set()
+        self.seen_edges = set()
+        self.next_frontier: List[str] = []
+
+    def queries(self) -> Iterator[Tuple[str, Dict]]:
+        yield neighborhood_seed_query(self.labels, self.entity_type), {'name': self.name}
+        query = neighborhood_hop_query(self.relations, self.node_labels)
+        for hop in range(1, self.depth + 1):
+            frontier, self.next_frontier = self.next_frontier, []
+            if not frontier:
+                return
+            self.hop = hop
+            params = {'fanout': self.fanout[min(hop, len(self.fanout)) - 1]}
+            if self.node_labels:
+                params['node_labels'] = list(self.node_labels)
+            for i in range(0, len(frontier), self.chunk_size):
+                yield query, {**params, 'frontier': frontier[i:i + self.chunk_size]}
+
+    def rows(self, records: List[Dict]) -> Iterator[Dict]:
+        if self.hop == 0:
+            for record in records:
+                if record['node_id'] not in self.visited:
+                    self.visited.add(record['node_id'])
+                    self.next_frontier.append(record['node_id'])
+            return
+
+        for record in records:
+            if record['r_id'] in self.seen_edges:
+                continue
+            self.seen_edges.add(record['r_id'])
+            m_name = (record['m_props'] or {}).get('name')
+            start, end = (record['n_name'], m_name) if record['outgoing'] else (m_name, record['n_name'])
+            yield {
+                'hop': self.hop,
+                'n': {'type': record['n_type'], 'name': record['n_name']},
+                'r': {'type': record['r_type'], 'start': start, 'end': end, **(record['r_props'] or {})},
+                'm': {'type': record['m_type'], **(record['m_props'] or {})}
+            }
+            if record['m_id'] not in self.visited:
+                self.visited.add(record['m_id'])
+                self.next_frontier.append(record['m_id'])
+
+
+def quote_identifier(name: str) -> str:
+    """转义来自数据库的标签/关系类型名称"""
+    return '`' + name.replace('`', '``') + '`'
+
+
+# 标签和关系类型取自令牌表，不扫描数据
+TOKENS_QUERY = """
+    CALL { CALL db.labels() YIELD label RETURN collect(label) AS labels }
+    CALL { CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) AS types }
+    RETURN labels, types
+"""
+
+
+def count_store_query(labels: List[str], relation_types: List[str]) -> Optional[str]:
+    """按标签、关系类型计数
+
+    单标签的节点计数和单类型的有向关系计数都由计数存储直接给出，与图规模无关；
+    有向模式也避免了 ()-[r]-() 把每条关系计两次。
+    """
+    branches = [
+        f"MATCH (n:{quote_identifier(label)}) RETURN 'entity' AS kind, {i} AS index, count(n) AS count"
+        for i, label in enumerate(labels)
+    ] + [
+        f"MATCH ()-[r:{quote_identifier(rel)}]->() RETURN 'relation' AS kind, {i} AS index, count(r) AS count"
+        for i, rel in enumerate(relation_types)
+    ]
+    return '\nUNION ALL\n'.join(branches) or None
+
+
+def count_store_result(records: List[Dict], labels: List[str],
+                       relation_types: List[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    entities, relations = {}, {}
+    for record in records:
+        if record['kind'] == 'entity':
+            entities[labels[record['index']]] = record['count']
+        else:
+            relations[relation_types[record['index']]] = record['count']
+    return entities, relations
+
+
+# 以下两条为全量扫描，只在首次请求来源计数/度分布或统计过期（见 GraphStatistics.expire_stale）时执行
+SOURCE_COUNTS_QUERY = """
+    MATCH ()-[r]->()
+    UNWIND CASE WHEN size(coalesce(r.sources, [])) > 0 THEN r.sources
+        ELSE [coalesce(toString(r.source), '')] END AS source
+    RETURN source, count(*) AS count
+"""
+
+DEGREE_QUERY = """
+    MATCH (n)
+    RETURN labels(n)[0] AS type, n.name AS name, COUNT { (n)--() } AS degree
+"""
+
+# 模糊检索建索引用的全部实体名称和别名
+ENTITY_NAMES_QUERY = """
+    MATCH (n) WHERE n.name IS NOT NULL
+    RETURN labels(n)[0] AS type, n.name AS name, coalesce(n.aliases, []) AS aliases
+"""
@@ -0,0 +1,264 @@
+"""
+实体模糊检索模块 - 字符n-gram TF-IDF稀疏向量与余弦相似度
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.extraction.entity_normalizer import fold
+
+# (实体类型, 规范名称, 别名列表)
+EntityEntry = Tuple[str, str, Sequence[str]]
+
+
+class FuzzyEntityIndex:
+    """实体名称/别名的模糊检索索引
+
+    每个名称和别名按 fold 归一后切成1~3字符的n-gram，以L2归一化的TF-IDF稀疏向量表示，
+    余弦相似度即向量点积。检索分两步：先沿查询中2字符及以上n-gram的倒排列表累加部分得分，
+    取得分最高的数百个写法为候选（单字倒排列表过长，只在查询没有命中任何长n-gram时使用），
+    再将候选行与查询向量相乘得到精确余弦分数；代价取决于倒排列表长度而非名称总数。
+    同一实体的多个写法只保留最高分。
+    重建在后台完成后整体替换，查询始终读取一份完整的索引。
+    """
+
+    # 参与精确打分的最少候选数
+    RESCORE_MIN = 256
+    # 单个查询累加的倒排列表总长上限
+    POSTINGS_BUDGET = 50000
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 3), max_df: float = 0.2):
+        self.ngram_range = ngram_range
+        self.max_df = max_df
+        self._lock = threading.Lock()
+        self._state = None
+        self.built_at: Optional[float] = None
+        self.stale = True
+        # 每次 mark_stale 递增；重建只在期间没有新的写入时清除 stale
+        self.generation = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    def __len__(self) -> int:
+        return 0 if self._state is None else len(self._state['names'])
+
+    def mark_stale(self):
+        """图谱写入后调用，下一次后台刷新时重建"""
+        with self._lock:
+            self.generation += 1
+            self.stale = True
+
+    def build(self, entries: Iterable[EntityEntry], generation: Optional[int] = None) -> int:
+        """由 (类型, 名称, 别名) 序列重建索引，返回登记的写法数
+
+        generation 为读取 entries 之前的 self.generation（缺省取调用时的值）；
+        之后又有 mark_stale 时索引照常替换，但保持 stale，下一次刷新再重建。
+        """
+        if generation is None:
+            generation = self.generation
+        types: List[str] = []
+        type_index: Dict[str, int] = {}
+        names: List[str] = []
+        entity_types: List[int] = []
+        surfaces: List[str] = []
+        surface_entity: List[int] = []
+        seen = set()
+        for entity_type, name, aliases in entries:
+            if not name or (entity_type, name) in seen:
+                continue
+            seen.add((entity_type, name))
+            if entity_type not in type_index:
+                type_index[entity_type] = len(types)
+                types.append(entity_type)
+            entity = len(names)
+            names.append(name)
+            entity_types.append(type_index[entity_type])
+            for surface in dict.fromkeys([name, *(aliases or ())]):
+                if isinstance(surface, str) and surface:
+                    surfaces.append(surface)
+                    surface_entity.append(entity)
+
+        if not surfaces:
+            self._swap(None, generation)
+            return 0
+
+        # sklearn 导入较慢，首次建索引时才导入，不拖慢 API 启动
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        # 常见单字（如"病"）区分度低且倒排列表极长，按文档频率截断
+        max_df = self.max_df if len(surfaces) >= 1000 else 1.0
+        vectorizer = CountVectorizer(analyzer='char', preprocessor=fold, lowercase=False,
+                                     ngram_range=self.ngram_range, max_df=max_df, dtype=np.float32)
+        counts = vectorizer.fit_transform(surfaces).tocsr()
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        # 平滑IDF，与 TfidfTransformer(smooth_idf=True) 一致
+        idf = (np.log((1 + len(surfaces)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = self._weigh(counts, idf)
+        gram_lengths = np.fromiter((len(g) for g in vectorizer.get_feature_names_out()), dtype=np.int8)
+        state = {
+            'vectorizer': vectorizer,
+            'idf': idf,
+            # 写法 × n-gram，用于候选精确打分
+            'matrix': matrix,
+            # n-gram × 写法，CSR 行即倒排列表
+            'postings': matrix.T.tocsr(),
+            'selective': gram_lengths >= 2,
+            'surfaces': surfaces,
+            'surface_entity': np.asarray(surface_entity, dtype=np.int32),
+            'surface_types': np.asarray(entity_types, dtype=np.int16)[surface_entity],
+            'names': names,
+            'entity_types': np.asarray(entity_types, dtype=np.int16),
+            'types': types,
+            'type_index': type_index
+        }
+        self._swap(state, generation)
+        return len(surfaces)
+
+    def _swap(self, state: Optional[Dict], generation: int):
+        with self._lock:
+            self._state = state
+            self.built_at = time.time()
+            self.stale = self.generation != generation
+
+    @staticmethod
+    def _weigh(counts, idf: np.ndarray):
+        """次线性TF × IDF 后按行L2归一化"""
+        from sklearn.preprocessing import normalize
+        counts.data = (np.log(counts.data) + 1) * idf[counts.indices]
+        return normalize(counts, copy=False)
+
+    def search(self, queries: List[str], k: int = 10, entity_type: Optional[str] = None,
+               min_score: float = 0.0) -> List[List[Dict]]:
+        """批量检索，每个查询返回按相似度降序的至多k个实体"""
+        state = self._state
+        if state is None or not queries:
+            return [[] for _ in queries]
+
+        type_code = None
+        if entity_type is not None:
+            type_code = state['type_index'].get(entity_type)
+            if type_code is None:
+                return [[] for _ in queries]
+
+        vectors = self._weigh(state['vectorizer'].transform(queries).tocsr(), state['idf'])
+        # 实体去重和类型过滤会丢掉部分候选，精确打分的候选数按k放大
+        rescore = max(k * 16, self.RESCORE_MIN)
+        # 查询向量展开到稠密缓冲区后与候选行相乘，避免稀疏转置带来的全词表转换
+        dense = np.zeros(vectors.shape[1], dtype=np.float32)
+        results = []
+        for i in range(len(queries)):
+            vector = vectors[i]
+            candidates = self._candidates(state, vector, rescore, type_code, self.POSTINGS_BUDGET)
+            if not len(candidates):
+                results.append([])
+                continue
+            dense[vector.indices] = vector.data
+            scores = state['matrix'][candidates] @ dense
+            dense[vector.indices] = 0
+            results.append(self._top_k(state, candidates, scores, k, type_code, min_score))
+        return results
+
+    @staticmethod
+    def _candidates(state: Dict, vector, limit: int, type_code: Optional[int],
+                    budget: int) -> np.ndarray:
+        """沿查询长n-gram的倒排列表累加部分点积，取部分得分最高的至多limit个写法
+
+        没有长n-gram命中时退回单字倒排列表。
+        """
+        postings, selective = state['postings'], state['selective']
+        grams, weights = vector.indices, vector.data
+        mask = selective[grams]
+        for columns, column_weights in ((grams[mask], weights[mask]), (grams, weights)):
+            starts, ends = postings.indptr[columns], postings.indptr[columns + 1]
+            lengths = ends - starts
+            if not lengths.sum():
+                continue
+            # 从最稀有（IDF最高）的n-gram起累加，倒排列表总长超出预算后舍弃余下的常见n-gram
+            order = np.argsort(lengths, kind='stable')
+            used = max(1, int(np.searchsorted(np.cumsum(lengths[order]), budget, side='right')))
+            order = order[:used]
+            starts, ends, lengths, column_weights = starts[order], ends[order], lengths[order], column_weights[order]
+            positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+            ids = postings.indices[positions]
+            contributions = postings.data[positions] * np.repeat(column_weights, lengths)
+            surface_count = postings.shape[1]
+            if len(ids) * 8 < surface_count:
+                # 倒排列表较短：只在命中的写法上累加
+                candidates, inverse = np.unique(ids, return_inverse=True)
+                partial = np.bincount(inverse, weights=contributions)
+            else:
+                # 倒排列表覆盖大量写法时，按全部写法稠密累加比排序去重更快
+                partial = np.bincount(ids, weights=contributions, minlength=surface_count)
+                candidates = np.arange(surface_count)
+            if type_code is not None:
+                keep = state['surface_types'][candidates] == type_code
+                candidates, partial = candidates[keep], partial[keep]
+            if len(candidates) > limit:
+                top = np.argpartition(-partial, limit - 1)[:limit]
+                candidates, partial = candidates[top], partial[top]
+            return np.sort(candidates[partial > 0])
+        return np.empty(0, dtype=np.int32)
+
+    @staticmethod
+    def _top_k(state: Dict, surface_ids: np.ndarray, values: np.ndarray, k: int,
+               type_code: Optional[int], min_score: float) -> List[Dict]:
+        keep = values > 0 if min_score <= 0 else values >= min_score
+        entity_ids = state['surface_entity'][surface_ids]
+        if type_code is not None:
+            type_mask = state['entity_types'][entity_ids] == type_code
+            keep &= type_mask
+        surface_ids, values, entity_ids = surface_ids[keep], values[keep], entity_ids[keep]
+        if not len(values):
+            return []
+
+        # 先取前若干个候选再按实体去重，候选不足k个实体时退回全量排序
+        limit = min(len(values), k * 8)
+        while True:
+            if limit < len(values):
+                top = np.argpartition(-values, limit - 1)[:limit]
+            else:
+                top = np.arange(len(values))
+            top = top[np.argsort(-values[top], kind='stable')]
+            _, first = np.unique(entity_ids[top], return_index=True)
+            best = top[np.sort(first)][:k]
+            if len(best) >= k or limit >= len(values):
+                break
+            limit = len(values)
+
+        names, surfaces, types = state['names'], state['surfaces'], state['types']
+        entity_types = state['entity_types']
+        return [
+            {
+                'name': names[entity_ids[j]],
+                'type': types[entity_types[entity_ids[j]]],
+                'matched': surfaces[surface_ids[j]],
+                'score': round(float(values[j]), 6)
+            }
+            for j in best
+        ]
+
+    def stats(self) -> Dict:
+        state = self._state
+        return {
+            'entities': 0 if state is None else len(state['names']),
+            'surfaces': 0 if state is None else len(state['surfaces']),
+            'ngrams': 0 if state is None else state['postings'].shape[0],
+            'built_at': self.built_at,
+            'stale': self.stale
+        }
+
+    @classmethod
+    def from_snapshot(cls, path: str, **kwargs) -> 'FuzzyEntityIndex':
+        """直接由快照文件建立索引"""
+        from src.storage.memory_store import InMemoryGraphStore
+        index = cls(**kwargs)
+        index.build(InMemoryGraphStore.open_snapshot(path).entity_names())
+        return index
+
+
+# 全局实例（首次检索或后台刷新时建立）
+fuzzy_index = FuzzyEntityIndex()
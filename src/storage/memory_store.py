@@ -0,0 +1,562 @@
+"""
+知识图谱存储模块 - 进程内CSR邻接数组存储
+"""
+import csv
+import json
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.extraction.entity_normalizer import EntityNormalizer, entity_normalizer
+from src.storage.cache import graph_cache
+from src.storage.cypher import iter_triple_batches, new_bulk_report, triple_row, validate_triple
+from src.storage.path_finder import PathFinder, SearchBudget
+from src.storage.statistics import GraphStatistics
+
+
+class InMemoryGraphStore:
+    """进程内知识图谱存储
+
+    与 KnowledgeGraphStore 接口一致，适用于规模在数百万边、很少变更的图谱。
+    实体名称、实体类型、关系类型、来源均驻留为整数编码；
+    边以CSR格式存储（int32 偏移/目标数组），出边、入边各一份，邻居查询为一次数组切片。
+    写入先追加到缓冲区，下一次读取时统一重建CSR；重建后释放缓冲区和去重索引，
+    只读阶段只保留 numpy 数组，下一次写入边时再从数组恢复（见 _thaw_edges）。
+
+    也可以直接打开 mmap 快照（见 open_snapshot）：此时所有数组均引用映射内存，
+    名称查找在快照的有序字符串表上二分，不在进程内建立字典；首次写入时才转为可变结构。
+    """
+
+    def __init__(self, normalizer: Optional[EntityNormalizer] = None):
+        self._lock = threading.RLock()
+        self._snapshot = None
+        # 实体归一化索引：查询和写入的名称先归一为规范名称
+        self.normalizer = normalizer if normalizer is not None else entity_normalizer
+        self.clear_graph()
+
+    # ---------- 编码 ----------
+
+    @staticmethod
+    def _intern(value: str, table: List[str], index: Dict[str, int]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(table)
+            table.append(value)
+        return code
+
+    def _node_id(self, entity_type: str, name: str, create: bool = True) -> Optional[int]:
+        if self._snapshot is not None:
+            if not create:
+                nodes = self._find_nodes(name, entity_type)
+                return nodes[0] if nodes else None
+            self._materialize()
+
+        type_code = self._type_index.get(entity_type)
+        if type_code is not None:
+            node_id = self._node_index.get((type_code, name))
+            if node_id is not None or not create:
+                return node_id
+        elif not create:
+            return None
+
+        type_code = self._intern(entity_type, self._types, self._type_index)
+        node_id = self._node_index[(type_code, name)] = len(self._names)
+        self._names.append(name)
+        self._node_types.append(type_code)
+        self._by_name.setdefault(name, []).append(node_id)
+        self.stats.record_entity(entity_type)
+        return node_id
+
+    def _find_nodes(self, name: str, entity_type: str = None) -> List[int]:
+        name = self.normalizer.canonical_name(name, entity_type)
+        if self._snapshot is not None:
+            nodes = self._snapshot.names.find(name)
+            if entity_type:
+                type_code = self._type_index.get(entity_type)
+                nodes = [n for n in nodes if self._node_types[n] == type_code]
+            return nodes
+        if entity_type:
+            node_id = self._node_id(entity_type, name, create=False)
+            return [] if node_id is None else [node_id]
+        return list(self._by_name.get(name, ()))
+
+    def _node_dict(self, node_id: int) -> Dict:
+        return {
+            'type': self._types[self._node_types[node_id]],
+            'name': self._names[node_id],
+            **(self._node_props.get(node_id) or {})
+        }
+
+    def _edge_dict(self, edge_id: int) -> Dict:
+        return {
+            **(self._edge_props.get(edge_id) or {}),
+            'type': self._relations[self._edge_rel[edge_id]],
+            'start': self._names[self._edge_src[edge_id]],
+            'end': self._names[self._edge_dst[edge_id]],
+            'confidence': round(float(self._edge_conf[edge_id]), 6),
+            'source': self._sources[self._edge_source[edge_id]],
+            'sources': self.sources_of(edge_id)
+        }
+
+    # ---------- CSR ----------
+
+    @staticmethod
+    def _build_csr(keys: np.ndarray, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+        """按 keys 分组，返回 (offsets, 排序后的边编号)"""
+        order = np.argsort(keys, kind='stable').astype(np.int32)
+        counts = np.bincount(keys, minlength=num_nodes)
+        offsets = np.zeros(num_nodes + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets, order
+
+    def _ensure_built(self):
+        if not self._dirty and self._src_buffer is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                # 只合并了已有边：边数组已同步更新，直接释放缓冲区
+                if self._src_buffer is not None:
+                    self._free_edge_buffers()
+                return
+            if self._src_buffer is not None:
+                self._edge_src = np.asarray(self._src_buffer, dtype=np.int32)
+                self._edge_dst = np.asarray(self._dst_buffer, dtype=np.int32)
+                self._edge_rel = np.asarray(self._rel_buffer, dtype=np.int16)
+                self._edge_conf = np.asarray(self._conf_buffer, dtype=np.float32)
+                self._edge_source = np.asarray(self._source_buffer, dtype=np.int32)
+                self._free_edge_buffers()
+
+            num_nodes = len(self._names)
+            self._out_offsets, self._out_edges = self._build_csr(self._edge_src, num_nodes)
+            self._in_offsets, self._in_edges = self._build_csr(self._edge_dst, num_nodes)
+            self._out_targets = self._edge_dst[self._out_edges]
+            self._in_targets = self._edge_src[self._in_edges]
+            self._dirty = False
+
+    def _free_edge_buffers(self):
+        self._src_buffer = self._dst_buffer = self._rel_buffer = None
+        self._conf_buffer = self._source_buffer = None
+        self._edge_index = None
+
+    def _thaw_edges(self):
+        """写入边之前从边数组恢复缓冲区和 (head, relation, tail) 去重索引"""
+        if self._src_buffer is not None:
+            return
+        self._src_buffer = self._edge_src.tolist()
+        self._dst_buffer = self._edge_dst.tolist()
+        self._rel_buffer = self._edge_rel.tolist()
+        self._conf_buffer = self._edge_conf.tolist()
+        self._source_buffer = self._edge_source.tolist()
+        self._edge_index = {
+            edge: i for i, edge in enumerate(zip(self._src_buffer, self._rel_buffer, self._dst_buffer))
+        }
+
+    def neighbors(self, node_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回无向邻居 (邻居节点数组, 边编号数组)"""
+        self._ensure_built()
+        out_start, out_end = self._out_offsets[node_id], self._out_offsets[node_id + 1]
+        in_start, in_end = self._in_offsets[node_id], self._in_offsets[node_id + 1]
+        targets = np.concatenate((self._out_targets[out_start:out_end], self._in_targets[in_start:in_end]))
+        edges = np.concatenate((self._out_edges[out_start:out_end], self._in_edges[in_start:in_end]))
+        return targets, edges
+
+    # ---------- 写入 ----------
+
+    def create_entity(self, entity_type: str, properties: Dict) -> Dict:
+        """创建实体节点（同类型同名实体合并属性）；名称和 aliases 登记到归一化索引，别名写法合并到已有实体"""
+        properties = dict(properties)
+        name = properties.pop('name')
+        _, name = self.normalizer.add(entity_type, name, properties.get('aliases') or ())
+        with self._lock:
+            node_id = self._node_id(entity_type, name)
+            if properties:
+                self._node_props.setdefault(node_id, {}).update(properties)
+            self._dirty = True
+        graph_cache.invalidate_entities([name])
+        return self._node_dict(node_id)
+
+    def get_entity(self, entity_type: str, name: str) -> Optional[Dict]:
+        """根据名称获取实体（名称可以是别名或大小写/全半角/繁简变体）"""
+        node_id = self._node_id(entity_type, self.normalizer.canonical_name(name, entity_type), create=False)
+        return None if node_id is None else self._node_dict(node_id)
+
+    def _upsert_edge(self, head_name: str, head_type: str, relation: str,
+                     tail_name: str, tail_type: str, row: Dict) -> bool:
+        """写入一行（见 triple_row）；同一 (head, relation, tail) 已存在时合并置信度、来源和其余属性，返回是否新插入"""
+        head = self._node_id(head_type, head_name)
+        tail = self._node_id(tail_type, tail_name)
+        rel_code = self._intern(relation, self._relations, self._relation_index)
+        self._thaw_edges()
+        edge = self._edge_index.get((head, rel_code, tail))
+        if edge is not None:
+            confidence = row['confidence']
+            if confidence is not None and confidence > self._conf_buffer[edge]:
+                self._conf_buffer[edge] = confidence
+                if not self._dirty:
+                    self._edge_conf[edge] = confidence
+            if row['extra']:
+                self._edge_props.setdefault(edge, {}).update(row['extra'])
+            known = self.sources_of(edge)
+            added = [s for s in row['sources'] if s not in known]
+            if added:
+                self._edge_extra_sources.setdefault(edge, []).extend(added)
+                self.stats.record_sources(added)
+            return False
+
+        source_code = self._intern(row['source'] or '', self._sources, self._source_index)
+        self._edge_index[(head, rel_code, tail)] = len(self._src_buffer)
+        self._src_buffer.append(head)
+        self._dst_buffer.append(tail)
+        self._rel_buffer.append(rel_code)
+        self._conf_buffer.append(row['confidence'] or 0.5)
+        self._source_buffer.append(source_code)
+        edge = len(self._src_buffer) - 1
+        if row['extra']:
+            self._edge_props[edge] = dict(row['extra'])
+        extra_sources = [s for s in row['sources'] if s != row['source']]
+        if extra_sources:
+            self._edge_extra_sources[edge] = extra_sources
+        self.stats.record_relation(relation, head, tail, self._sources[source_code])
+        self.stats.record_sources(extra_sources)
+        self._dirty = True
+        return True
+
+    def sources_of(self, edge_id: int) -> List[str]:
+        """关系的全部来源（首个来源 + 合并进来的来源）"""
+        buffer = self._source_buffer
+        primary = self._sources[buffer[edge_id] if buffer is not None else self._edge_source[edge_id]]
+        return ([primary] if primary else []) + self._edge_extra_sources.get(edge_id, [])
+
+    def add_triple(self, head_name: str, head_type: str, relation: str, tail_name: str, tail_type: str, properties: Dict = None) -> bool:
+        """添加三元组（幂等：已存在同一关系时合并置信度和来源），返回是否新插入"""
+        validate_triple({'head': head_name, 'head_type': head_type, 'relation': relation,
+                         'tail': tail_name, 'tail_type': tail_type, 'properties': properties})
+        head_name = self.normalizer.canonical_name(head_name, head_type)
+        tail_name = self.normalizer.canonical_name(tail_name, tail_type)
+        with self._lock:
+            inserted = self._upsert_edge(head_name, head_type, relation, tail_name, tail_type,
+                                         triple_row(head_name, tail_name, properties))
+        graph_cache.invalidate_entities([head_name, tail_name])
+        return inserted
+
+    def bulk_add_triples(self, triples: Iterable[Dict], batch_size: int = 5000) -> Dict:
+        """批量添加三元组，校验、去重规则与Neo4j后端一致"""
+        report = new_bulk_report()
+        names = set()
+        start_time = time.time()
+        with self._lock:
+            for (head_type, relation, tail_type), rows in iter_triple_batches(
+                    triples, batch_size, report, self.normalizer.canonical_name):
+                report['batches'] += 1
+                for row in rows:
+                    inserted = self._upsert_edge(row['head'], head_type, relation, row['tail'], tail_type, row)
+                    report['inserted' if inserted else 'updated'] += 1
+                    names.update((row['head'], row['tail']))
+                report['imported'] += len(rows)
+        graph_cache.invalidate_entities(names)
+        report['elapsed'] = time.time() - start_time
+        report['rate'] = report['imported'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+        return report
+
+    def ensure_schema(self) -> Dict:
+        """内存存储无需约束/索引"""
+        return {'applied': [], 'failed': {}}
+
+    def missing_indexes(self) -> List[str]:
+        return []
+
+    def clear_graph(self):
+        """清空图谱"""
+        with self._lock:
+            self._snapshot = None
+            self._names: List[str] = []
+            self._node_types: List[int] = []
+            self._node_props: Dict[int, Dict] = {}
+            self._node_index: Dict[Tuple[int, str], int] = {}
+            self._by_name: Dict[str, List[int]] = {}
+            self._types: List[str] = []
+            self._type_index: Dict[str, int] = {}
+            self._relations: List[str] = []
+            self._relation_index: Dict[str, int] = {}
+            self._sources: List[str] = []
+            self._source_index: Dict[str, int] = {}
+            self.stats = GraphStatistics()
+
+            # 边缓冲区和去重索引；CSR重建后为None
+            self._src_buffer: Optional[List[int]] = []
+            self._dst_buffer: Optional[List[int]] = []
+            self._rel_buffer: Optional[List[int]] = []
+            self._conf_buffer: Optional[List[float]] = []
+            self._source_buffer: Optional[List[int]] = []
+            self._edge_index: Optional[Dict[Tuple[int, int, int], int]] = {}
+            self._edge_extra_sources: Dict[int, List[str]] = {}
+            self._edge_props: Dict[int, Dict] = {}
+            self._dirty = True
+        graph_cache.clear()
+
+    # ---------- 查询 ----------
+
+    def query_by_entity(self, entity_name: str, entity_type: str = None) -> List[Dict]:
+        """查询实体相关关系"""
+        results = []
+        for node_id in self._find_nodes(entity_name, entity_type):
+            targets, edges = self.neighbors(node_id)
+            n = self._node_dict(node_id)
+            for target, edge in zip(targets.tolist(), edges.tolist()):
+                results.append({'n': n, 'r': self._edge_dict(edge), 'm': self._node_dict(target)})
+        return results
+
+    def iter_neighborhood(self, entity_name: str, entity_type: str = None, depth: int = 1,
+                          fanout: Iterable[int] = (50,), relations: List[str] = None,
+                          labels: List[str] = None) -> Iterator[Dict]:
+        """多跳邻域展开，逐行产出 {'hop', 'n', 'r', 'm'}
+
+        每跳每个节点最多展开 fanout[hop] 条关系，已访问节点不再展开，同一关系只输出一次。
+        """
+        fanout = tuple(fanout)
+        frontier = self._find_nodes(entity_name, entity_type)
+        visited = set(frontier)
+        seen_edges = set()
+        neighbors = self._path_neighbors(relations)
+        node_allowed = self._path_node_filter(labels)
+
+        for hop in range(1, depth + 1):
+            limit = fanout[min(hop, len(fanout)) - 1]
+            next_frontier = []
+            for node in frontier:
+                n = {'type': self._types[self._node_types[node]], 'name': self._names[node]}
+                expanded = 0
+                for target, edge in neighbors(node):
+                    if expanded >= limit:
+                        break
+                    if edge in seen_edges or (node_allowed is not None and not node_allowed(target)):
+                        continue
+                    expanded += 1
+                    seen_edges.add(edge)
+                    yield {'hop': hop, 'n': n, 'r': self._edge_dict(edge), 'm': self._node_dict(target)}
+                    if target not in visited:
+                        visited.add(target)
+                        next_frontier.append(target)
+            frontier = next_frontier
+
+    def query_path(self, start_name: str, end_name: str, max_depth: int = 3,
+                   start_type: str = None, end_type: str = None, limit: int = 10) -> List[Dict]:
+        """查询两实体间路径（按长度递增的最多limit条简单路径）"""
+        return self.find_paths(start_name, end_name, max_depth, start_type, end_type, k=limit)['paths']
+
+    def find_paths(self, start_name: str, end_name: str, max_depth: int = 3,
+                   start_type: str = None, end_type: str = None,
+                   relations: List[str] = None, labels: List[str] = None, k: int = 10,
+                   max_expansions: int = None, timeout: float = None) -> Dict:
+        """k最短路径查询（双向BFS + Yen算法），返回 {'paths': [...], 'truncated': bool}
+
+        relations 限定关系类型，labels 限定中间节点类型；
+        max_expansions（扩展节点数）和 timeout（秒）为整次查询的预算，超出时返回已找到的路径并标记 truncated。
+        """
+        sources = self._find_nodes(start_name, start_type)
+        targets = self._find_nodes(end_name, end_type)
+        self._ensure_built()
+        finder = PathFinder(self._path_neighbors(relations), self._path_node_filter(labels))
+        budget = SearchBudget(max_expansions, timeout)
+
+        found, truncated = [], False
+        for source in sources:
+            for target in targets:
+                if source != target and not truncated:
+                    paths, truncated = finder.k_shortest_paths(source, target, k, max_depth, budget)
+                    found.extend(paths)
+        found.sort(key=lambda path: len(path[1]))
+
+        return {
+            'paths': [{
+                'path': {
+                    'nodes': [self._node_dict(n) for n in nodes],
+                    'relationships': [self._edge_dict(e) for e in edges]
+                },
+                'length': len(edges)
+            } for nodes, edges in found[:k]],
+            'truncated': truncated
+        }
+
+    def _path_neighbors(self, relations: Optional[List[str]]):
+        """路径搜索用的邻接函数，可按关系类型过滤"""
+        if not relations:
+            return lambda node: zip(*(a.tolist() for a in self.neighbors(node)))
+        codes = np.array([self._relation_index[r] for r in relations if r in self._relation_index], dtype=np.int16)
+
+        def neighbors(node):
+            targets, edges = self.neighbors(node)
+            mask = np.isin(self._edge_rel[edges], codes)
+            return zip(targets[mask].tolist(), edges[mask].tolist())
+        return neighbors
+
+    def _path_node_filter(self, labels: Optional[List[str]]):
+        if not labels:
+            return None
+        codes = {self._type_index[t] for t in labels if t in self._type_index}
+        return lambda node: self._node_types[node] in codes
+
+    def get_statistics(self, degree_histogram: bool = False, sources: bool = False) -> Dict:
+        """获取图谱统计信息（增量计数器；来源计数和度分布首次请求时由边数组统计一次）"""
+        if (sources and not self.stats.tracks_sources) or (degree_histogram and not self.stats.tracks_degrees):
+            with self._lock:
+                self._ensure_built()
+                if sources and not self.stats.tracks_sources:
+                    # 每条关系按其全部来源计数（首个来源 + 合并进来的来源）
+                    counts = np.bincount(self._edge_source, minlength=len(self._sources))
+                    source_counts = Counter({self._sources[i]: int(c) for i, c in enumerate(counts) if c})
+                    for extra in self._edge_extra_sources.values():
+                        source_counts.update(extra)
+                    self.stats.seed_sources(dict(source_counts))
+                if degree_histogram and not self.stats.tracks_degrees:
+                    degrees = (np.bincount(self._edge_src, minlength=len(self._names))
+                               + np.bincount(self._edge_dst, minlength=len(self._names)))
+                    self.stats.seed_degrees(zip(np.flatnonzero(degrees).tolist(), degrees[degrees > 0].tolist()))
+        return self.stats.report(degree_histogram=degree_histogram, sources=sources)
+
+    def entity_names(self) -> List[Tuple[str, str, List[str]]]:
+        """全部实体的 (类型, 名称, 别名列表)，供模糊检索建索引"""
+        with self._lock:
+            names, node_types, props = self._names, self._node_types, self._node_props
+            return [
+                (self._types[node_types[node_id]], names[node_id], (props.get(node_id) or {}).get('aliases') or [])
+                for node_id in range(len(names))
+            ]
+
+    def graph_arrays(self) -> Dict:
+        """边数组、节点类型编码及编码表（只读引用），供批量图计算使用"""
+        with self._lock:
+            self._ensure_built()
+            return {
+                'names': self._names,
+                'node_types': np.asarray(self._node_types, dtype=np.int16),
+                'types': list(self._types),
+                'relations': list(self._relations),
+                'edge_src': self._edge_src,
+                'edge_dst': self._edge_dst,
+                'edge_rel': self._edge_rel,
+                'edge_conf': self._edge_conf
+            }
+
+    # ---------- 加载 ----------
+
+    def load_triples_csv(self, csv_path: str) -> int:
+        """从 triples.csv 加载三元组"""
+        def rows():
+            with open(csv_path, 'r', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    yield {
+                        'head': row['head'], 'head_type': row['head_type'],
+                        'relation': row['relation'],
+                        'tail': row['tail'], 'tail_type': row['tail_type'],
+                        'properties': {'confidence': float(row.get('confidence') or 0.5), 'source': row.get('source') or ''}
+                    }
+        return self.bulk_add_triples(rows())['imported']
+
+    def load_json(self, json_path: str) -> int:
+        """从 medical_data.json 加载实体属性和关系"""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for entity in data.get('entities', []):
+            entity = dict(entity)
+            entity_type = entity.pop('type', 'Entity')
+            self.create_entity(entity_type, entity)
+        report = self.bulk_add_triples({
+            **rel,
+            'properties': {'confidence': rel.get('confidence', 0.5), 'source': rel.get('source', '')}
+        } for rel in data.get('relations', []))
+        return report['imported']
+
+    @classmethod
+    def from_neo4j(cls, source) -> 'InMemoryGraphStore':
+        """从 Neo4j（DriverGraphStore）流式导出"""
+        store = cls()
+        for entity in source.iter_entities():
+            entity_type = entity.pop('type', None) or 'Entity'
+            if entity.get('name') is not None:
+                store.create_entity(entity_type, entity)
+        store.bulk_add_triples(source.iter_triples())
+        store._ensure_built()
+        return store
+    
+    # ---------- 快照 ----------
+
+    @classmethod
+    def open_snapshot(cls, path: str) -> 'InMemoryGraphStore':
+        """以 mmap 方式打开快照文件（只读共享，首次写入时复制）"""
+        from src.storage.snapshot import GraphSnapshot
+        snapshot = GraphSnapshot(path)
+        meta = snapshot.meta
+
+        store = cls()
+        store._snapshot = snapshot
+        store._names = snapshot.names
+        store._node_types = snapshot['node_types']
+        store._node_props = snapshot.props
+        store._edge_extra_sources = snapshot.edge_sources
+        store._edge_props = snapshot.edge_props
+        store._types = list(meta['types'])
+        store._type_index = {t: i for i, t in enumerate(store._types)}
+        store._relations = list(meta['relations'])
+        store._relation_index = {r: i for i, r in enumerate(store._relations)}
+        store._sources = list(meta['sources'])
+        store._source_index = {s: i for i, s in enumerate(store._sources)}
+        store.stats.seed_counts(
+            {store._types[int(k)]: v for k, v in meta['entity_counts'].items()},
+            {store._relations[int(k)]: v for k, v in meta['relation_counts'].items()}
+        )
+
+        for name in ('edge_src', 'edge_dst', 'edge_rel', 'edge_conf', 'edge_source',
+                     'out_offsets', 'out_edges', 'out_targets', 'in_offsets', 'in_edges', 'in_targets'):
+            setattr(store, f'_{name}', snapshot[name])
+        store._free_edge_buffers()
+        store._dirty = False
+        return store
+
+    def save_snapshot(self, path: str):
+        """保存为快照文件"""
+        from src.storage.snapshot import write_snapshot
+        with self._lock:
+            return write_snapshot(self, path)
+
+    def _materialize(self):
+        """将快照转为进程内可变结构"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        num_nodes = len(snapshot.names)
+        self._names = list(snapshot.names)
+        self._node_types = self._node_types.tolist()
+        self._node_props = {}
+        for node_id in range(num_nodes):
+            props = snapshot.props.get(node_id)
+            if props:
+                self._node_props[node_id] = props
+        self._node_index = {(t, n): i for i, (t, n) in enumerate(zip(self._node_types, self._names))}
+        self._by_name = {}
+        for node_id, name in enumerate(self._names):
+            self._by_name.setdefault(name, []).append(node_id)
+
+        # 边数组复制出映射内存（可写），缓冲区在写入边时由 _thaw_edges 恢复
+        for name in ('edge_src', 'edge_dst', 'edge_rel', 'edge_conf', 'edge_source'):
+            setattr(self, f'_{name}', np.array(getattr(self, f'_{name}')))
+        self._edge_extra_sources = dict(snapshot.edge_sources.items())
+        self._edge_props = dict(snapshot.edge_props.items())
+        self._snapshot = None
+        self._dirty = True
+
+    @classmethod
+    def from_files(cls, data_dir: str = 'data/processed') -> 'InMemoryGraphStore':
+        """从数据目录加载：优先 medical_data.json（含实体属性），否则 triples.csv"""
+        store = cls()
+        data_dir = Path(data_dir)
+        if (data_dir / 'medical_data.json').exists():
+            store.load_json(str(data_dir / 'medical_data.json'))
+        elif (data_dir / 'triples.csv').exists():
+            store.load_triples_csv(str(data_dir / 'triples.csv'))
+        store._ensure_built()
+        return store
@@ -0,0 +1,449 @@
+"""
+知识图谱存储模块 - 基于官方 neo4j 驱动的同步/异步存储
+"""
+import os
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from neo4j import AsyncGraphDatabase, GraphDatabase, unit_of_work
+from neo4j.exceptions import Neo4jError
+from neo4j.graph import Node, Path, Relationship
+
+from src.storage.cypher import (
+    DEGREE_QUERY, ENTITY_NAMES_QUERY, SOURCE_COUNTS_QUERY, TOKENS_QUERY, count_store_query, count_store_result,
+    bulk_triples_query, check_identifier, check_path_budget, entity_relations_query, iter_triple_batches,
+    merge_entity_query, new_bulk_report, merged_sources, record_batch_result, triple_row, validate_triple, NeighborhoodExpansion, PathSearch
+)
+from src.storage.schema import GraphSchema
+from src.storage.cache import graph_cache
+from src.storage.statistics import GraphStatistics
+from src.utils.lazy import LazyProxy
+from src.extraction.entity_normalizer import entity_normalizer
+
+load_dotenv()
+
+
+def driver_config() -> Dict:
+    """连接池配置，可通过环境变量调整"""
+    return {
+        'max_connection_pool_size': int(os.getenv('NEO4J_MAX_POOL_SIZE', '100')),
+        'connection_acquisition_timeout': float(os.getenv('NEO4J_ACQUIRE_TIMEOUT', '30')),
+        'max_connection_lifetime': float(os.getenv('NEO4J_MAX_LIFETIME', '3600')),
+        'keep_alive': True,
+    }
+
+
+def to_python(value):
+    """将驱动返回的节点/关系/路径转换为可JSON序列化的字典"""
+    if isinstance(value, Node):
+        labels = sorted(value.labels)
+        return {'type': labels[0] if labels else None, **dict(value)}
+    if isinstance(value, Relationship):
+        return {
+            'type': value.type,
+            'start': value.start_node['name'] if value.start_node is not None else None,
+            'end': value.end_node['name'] if value.end_node is not None else None,
+            **dict(value)
+        }
+    if isinstance(value, Path):
+        return {
+            'nodes': [to_python(n) for n in value.nodes],
+            'relationships': [to_python(r) for r in value.relationships]
+        }
+    if isinstance(value, list):
+        return [to_python(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_python(v) for k, v in value.items()}
+    return value
+
+
+def _records(result) -> List[Dict]:
+    return [{key: to_python(record[key]) for key in record.keys()} for record in result]
+
+
+async def _async_records(result) -> List[Dict]:
+    return [{key: to_python(record[key]) for key in record.keys()} async for record in result]
+
+
+def _is_timeout(error: Neo4jError) -> bool:
+    return 'TransactionTimedOut' in (error.code or '')
+
+
+class DriverGraphStore:
+    """Neo4j知识图谱存储（官方驱动，同步）
+
+    读写分别通过 execute_read / execute_write 提交，集群部署时自动路由到
+    读副本或主节点；驱动自带连接池，可在多个线程间共享同一实例。
+    """
+
+    def __init__(self, uri=None, user=None, password=None, database=None, **config):
+        self.uri = uri or os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+        self.user = user or os.getenv('NEO4J_USER', 'neo4j')
+        self.password = password or os.getenv('NEO4J_PASSWORD', 'password')
+        self.database = database or os.getenv('NEO4J_DATABASE')
+        self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password), **{**driver_config(), **config})
+        self._schema = None
+        self.stats = GraphStatistics(track_counts=False)
+        self.normalizer = entity_normalizer
+
+    @property
+    def schema(self) -> GraphSchema:
+        if self._schema is None:
+            self._schema = GraphSchema()
+        return self._schema
+
+    def close(self):
+        self.driver.close()
+
+    def _read(self, query: str, **params) -> List[Dict]:
+        with self.driver.session(database=self.database) as session:
+            return session.execute_read(lambda tx: _records(tx.run(query, **params)))
+
+    def _read_timed(self, query: str, timeout: Optional[float], params: Dict) -> List[Dict]:
+        """带事务超时（秒）的只读查询，超时由服务端终止事务"""
+        work = unit_of_work(timeout=timeout)(lambda tx: _records(tx.run(query, **params)))
+        with self.driver.session(database=self.database) as session:
+            return session.execute_read(work)
+
+    def _write(self, query: str, **params) -> List[Dict]:
+        with self.driver.session(database=self.database) as session:
+            return session.execute_write(lambda tx: _records(tx.run(query, **params)))
+
+    def _run(self, query: str, **params) -> List[Dict]:
+        # 模式管理语句需以自动提交方式执行
+        with self.driver.session(database=self.database) as session:
+            return _records(session.run(query, **params))
+
+    def ensure_schema(self) -> Dict:
+        """创建唯一约束和全文索引（幂等）"""
+        return self.schema.ensure(self._run)
+
+    def missing_indexes(self) -> List[str]:
+        """返回缺失或未上线的约束/索引"""
+        return self.schema.missing(self._run)
+
+    def create_entity(self, entity_type: str, properties: Dict) -> Dict:
+        """创建或合并实体节点（按类型和名称 MERGE，其余属性覆盖；名称和 aliases 登记到归一化索引，别名写法归一为规范名称）"""
+        if not properties.get('name'):
+            raise ValueError("entity name is required")
+        _, name = self.normalizer.add(entity_type, properties['name'], properties.get('aliases') or ())
+        properties = {**properties, 'name': name}
+        records = self._write(merge_entity_query(entity_type), name=name, properties=properties)
+        graph_cache.invalidate_entities([name])
+        return records[0]['n']
+
+    def get_entity(self, entity_type: str, name: str) -> Optional[Dict]:
+        """根据名称获取实体"""
+        query = f"MATCH (n:`{check_identifier(entity_type)}` {{name: $name}}) RETURN n LIMIT 1"
+        records = self._read(query, name=self.normalizer.canonical_name(name, entity_type))
+        return records[0]['n'] if records else None
+
+    def add_triple(self, head_name: str, head_type: str, relation: str, tail_name: str, tail_type: str, properties: Dict = None):
+        """添加三元组（幂等：已存在同一关系时合并置信度和来源），返回是否新插入"""
+        triple = {'head': head_name, 'head_type': head_type, 'relation': relation,
+                  'tail': tail_name, 'tail_type': tail_type, 'properties': properties}
+        validate_triple(triple)
+        head_name = self.normalizer.canonical_name(head_name, head_type)
+        tail_name = self.normalizer.canonical_name(tail_name, tail_type)
+        rows = [triple_row(head_name, tail_name, properties)]
+        records = self._write(bulk_triples_query(head_type, relation, tail_type), rows=rows)
+        inserted = record_batch_result(new_bulk_report(), rows, records)
+        self.stats.record_rows(relation, head_type, tail_type, inserted)
+        self.stats.record_sources(merged_sources(records))
+        graph_cache.invalidate_entities([head_name, tail_name])
+        return bool(inserted)
+
+    def bulk_add_triples(self, triples: Iterable[Dict], batch_size: int = 5000) -> Dict:
+        """批量添加三元组"""
+        report = new_bulk_report()
+        start_time = time.time()
+
+        for key, rows in iter_triple_batches(triples, batch_size, report, self.normalizer.canonical_name):
+            report['batches'] += 1
+            try:
+                records = self._write(bulk_triples_query(*key), rows=rows)
+                inserted = record_batch_result(report, rows, records)
+                self.stats.record_rows(key[1], key[0], key[2], inserted)
+                self.stats.record_sources(merged_sources(records))
+                graph_cache.invalidate_entities(name for row in rows for name in (row['head'], row['tail']))
+            except Exception as e:
+                report['failed'] += len(rows)
+                report['failures'].append({'batch': report['batches'], 'key': key, 'size': len(rows), 'error': str(e)})
+
+        report['elapsed'] = time.time() - start_time
+        report['rate'] = report['imported'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+        return report
+
+    def query_by_entity(self, entity_name: str, entity_type: str = None) -> List[Dict]:
+        """查询实体相关关系"""
+        return self._read(entity_relations_query(self.schema.entity_types, entity_type),
+                          name=self.normalizer.canonical_name(entity_name, entity_type))
+
+    def iter_neighborhood(self, entity_name: str, entity_type: str = None, depth: int = 1,
+                          fanout: Iterable[int] = (50,), relations: List[str] = None,
+                          labels: List[str] = None) -> Iterator[Dict]:
+        """多跳邻域展开，逐行产出 {'hop', 'n', 'r', 'm'}"""
+        entity_name = self.normalizer.canonical_name(entity_name, entity_type)
+        expansion = NeighborhoodExpansion(self.schema.entity_types, entity_name, entity_type, depth,
+                                          tuple(fanout), relations, labels)
+        for query, params in expansion.queries():
+            yield from expansion.rows(self._read(query, **params))
+
+    def query_path(self, start_name: str, end_name: str, max_depth: int = 3,
+                   start_type: str = None, end_type: str = None) -> List[Dict]:
+        """查询两实体间路径"""
+        return self.find_paths(start_name, end_name, max_depth, start_type, end_type)['paths']
+
+    def find_paths(self, start_name: str, end_name: str, max_depth: int = 3,
+                   start_type: str = None, end_type: str = None,
+                   relations: List[str] = None, labels: List[str] = None, k: int = 10,
+                   max_expansions: int = None, timeout: float = None) -> Dict:
+        """k最短路径查询，返回 {'paths': [...], 'truncated': bool}
+
+        timeout 作为每条语句的事务超时在服务端执行；max_expansions 无法在服务端统计，传入时抛出 ValueError。
+        """
+        check_path_budget(max_expansions, timeout)
+        start_name = self.normalizer.canonical_name(start_name, start_type)
+        end_name = self.normalizer.canonical_name(end_name, end_type)
+        search = PathSearch(self.schema.entity_types, start_name, end_name, max_depth, k,
+                            start_type, end_type, relations, labels, timeout)
+        for query, params, step_timeout in search.steps():
+            try:
+                search.add(self._read_timed(query, step_timeout, params))
+            except Neo4jError as e:
+                if not _is_timeout(e):
+                    raise
+                search.truncated = True
+                break
+        return search.result()
+
+    def get_statistics(self, degree_histogram: bool = False, sources: bool = False) -> Dict:
+        """获取图谱统计信息（计数存储，与图规模无关；可选来源计数和度分布）"""
+        tokens = (self._read(TOKENS_QUERY))[0]
+        labels, types = tokens['labels'], tokens['types']
+        query = count_store_query(labels, types)
+        entities, relations = count_store_result(self._read(query) if query else [], labels, types)
+        self.stats.expire_stale(sum(relations.values()))
+        if sources and not self.stats.tracks_sources:
+            self.stats.seed_sources({r['source']: r['count'] for r in self._read(SOURCE_COUNTS_QUERY)})
+        if degree_histogram and not self.stats.tracks_degrees:
+            self.stats.seed_degrees(((r['type'], r['name']), r['degree']) for r in self._read(DEGREE_QUERY))
+        return self.stats.report(entities, relations, degree_histogram, sources)
+
+    def entity_names(self) -> List[Tuple[str, str, List[str]]]:
+        """全部实体的 (类型, 名称, 别名列表)，供模糊检索建索引"""
+        return [(r['type'], r['name'], r['aliases']) for r in self._read(ENTITY_NAMES_QUERY)]
+
+    def clear_graph(self):
+        """清空图谱（慎用）"""
+        self._write("MATCH (n) DETACH DELETE n")
+        self.stats.clear()
+        graph_cache.clear()
+
+    def iter_entities(self) -> Iterator[Dict]:
+        """流式导出全部实体"""
+        with self.driver.session(database=self.database) as session:
+            for record in session.run("MATCH (n) RETURN labels(n)[0] AS type, properties(n) AS properties"):
+                yield {**record['properties'], 'type': record['type']}
+
+    def iter_triples(self) -> Iterator[Dict]:
+        """流式导出全部三元组"""
+        query = """
+        MATCH (h)-[r]->(t)
+        RETURN h.name AS head, labels(h)[0] AS head_type, type(r) AS relation,
+               t.name AS tail, labels(t)[0] AS tail_type, properties(r) AS properties
+        """
+        with self.driver.session(database=self.database) as session:
+            for record in session.run(query):
+                yield record.data()
+
+
+class AsyncDriverGraphStore:
+    """Neo4j知识图谱存储（官方驱动，异步）
+
+    供 async 接口使用：等待Bolt往返时不占用事件循环或线程池。
+    """
+
+    def __init__(self, uri=None, user=None, password=None, database=None, **config):
+        self.uri = uri or os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+        self.user = user or os.getenv('NEO4J_USER', 'neo4j')
+        self.password = password or os.getenv('NEO4J_PASSWORD', 'password')
+        self.database = database or os.getenv('NEO4J_DATABASE')
+        self.driver = AsyncGraphDatabase.driver(self.uri, auth=(self.user, self.password), **{**driver_config(), **config})
+        self._schema = None
+        self.stats = GraphStatistics(track_counts=False)
+        self.normalizer = entity_normalizer
+
+    @property
+    def schema(self) -> GraphSchema:
+        if self._schema is None:
+            self._schema = GraphSchema()
+        return self._schema
+
+    async def close(self):
+        await self.driver.close()
+
+    async def _read(self, query: str, **params) -> List[Dict]:
+        async def work(tx):
+            return await _async_records(await tx.run(query, **params))
+        async with self.driver.session(database=self.database) as session:
+            return await session.execute_read(work)
+
+    async def _read_timed(self, query: str, timeout: Optional[float], params: Dict) -> List[Dict]:
+        """带事务超时（秒）的只读查询，超时由服务端终止事务"""
+        @unit_of_work(timeout=timeout)
+        async def work(tx):
+            return await _async_records(await tx.run(query, **params))
+        async with self.driver.session(database=self.database) as session:
+            return await session.execute_read(work)
+
+    async def _write(self, query: str, **params) -> List[Dict]:
+        async def work(tx):
+            return await _async_records(await tx.run(query, **params))
+        async with self.driver.session(database=self.database) as session:
+            return await session.execute_write(work)
+
+    async def _run(self, query: str, **params) -> List[Dict]:
+        async with self.driver.session(database=self.database) as session:
+            return await _async_records(await session.run(query, **params))
+
+    async def ensure_schema(self) -> Dict:
+        """创建唯一约束和全文索引（幂等）"""
+        report = {'applied': [], 'failed': {}}
+        for name, statement in self.schema.statements().items():
+            try:
+                await self._run(statement)
+                report['applied'].append(name)
+            except Exception as e:
+                report['failed'][name] = str(e)
+        return report
+
+    async def missing_indexes(self) -> List[str]:
+        """返回缺失或未上线的约束/索引"""
+        indexes = await self._run('SHOW INDEXES YIELD name, state')
+        constraints = await self._run('SHOW CONSTRAINTS YIELD name, ownedIndex')
+        return self.schema.missing(lambda query: indexes if 'INDEXES' in query else constraints)
+
+    async def create_entity(self, entity_type: str, properties: Dict) -> Dict:
+        """创建或合并实体节点（按类型和名称 MERGE，其余属性覆盖；名称和 aliases 登记到归一化索引，别名写法归一为规范名称）"""
+        if not properties.get('name'):
+            raise ValueError("entity name is required")
+        _, name = self.normalizer.add(entity_type, properties['name'], properties.get('aliases') or ())
+        properties = {**properties, 'name': name}
+        records = await self._write(merge_entity_query(entity_type), name=name, properties=properties)
+        graph_cache.invalidate_entities([name])
+        return records[0]['n']
+
+    async def get_entity(self, entity_type: str, name: str) -> Optional[Dict]:
+        """根据名称获取实体"""
+        query = f"MATCH (n:`{check_identifier(entity_type)}` {{name: $name}}) RETURN n LIMIT 1"
+        records = await self._read(query, name=self.normalizer.canonical_name(name, entity_type))
+        return records[0]['n'] if records else None
+
+    async def add_triple(self, head_name: str, head_type: str, relation: str, tail_name: str, tail_type: str, properties: Dict = None):
+        """添加三元组（幂等：已存在同一关系时合并置信度和来源），返回是否新插入"""
+        triple = {'head': head_name, 'head_type': head_type, 'relation': relation,
+                  'tail': tail_name, 'tail_type': tail_type, 'properties': properties}
+        validate_triple(triple)
+        head_name = self.normalizer.canonical_name(head_name, head_type)
+        tail_name = self.normalizer.canonical_name(tail_name, tail_type)
+        rows = [triple_row(head_name, tail_name, properties)]
+        records = await self._write(bulk_triples_query(head_type, relation, tail_type), rows=rows)
+        inserted = record_batch_result(new_bulk_report(), rows, records)
+        self.stats.record_rows(relation, head_type, tail_type, inserted)
+        self.stats.record_sources(merged_sources(records))
+        graph_cache.invalidate_entities([head_name, tail_name])
+        return bool(inserted)
+
+    async def bulk_add_triples(self, triples: Iterable[Dict], batch_size: int = 5000) -> Dict:
+        """批量添加三元组"""
+        report = new_bulk_report()
+        start_time = time.time()
+
+        for key, rows in iter_triple_batches(triples, batch_size, report, self.normalizer.canonical_name):
+            report['batches'] += 1
+            try:
+                records = await self._write(bulk_triples_query(*key), rows=rows)
+                inserted = record_batch_result(report, rows, records)
+                self.stats.record_rows(key[1], key[0], key[2], inserted)
+                self.stats.record_sources(merged_sources(records))
+                graph_cache.invalidate_entities(name for row in rows for name in (row['head'], row['tail']))
+            except Exception as e:
+                report['failed'] += len(rows)
+                report['failures'].append({'batch': report['batches'], 'key': key, 'size': len(rows), 'error': str(e)})
+
+        report['elapsed'] = time.time() - start_time
+        report['rate'] = report['imported'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+        return report
+
+    async def query_by_entity(self, entity_name: str, entity_type: str = None) -> List[Dict]:
+        """查询实体相关关系"""
+        return await self._read(entity_relations_query(self.schema.entity_types, entity_type),
+                                name=self.normalizer.canonical_name(entity_name, entity_type))
+
+    async def iter_neighborhood(self, entity_name: str, entity_type: str = None, depth: int = 1,
+                                fanout: Iterable[int] = (50,), relations: List[str] = None,
+                                labels: List[str] = None) -> AsyncIterator[Dict]:
+        """多跳邻域展开，逐行产出 {'hop', 'n', 'r', 'm'}"""
+        entity_name = self.normalizer.canonical_name(entity_name, entity_type)
+        expansion = NeighborhoodExpansion(self.schema.entity_types, entity_name, entity_type, depth,
+                                          tuple(fanout), relations, labels)
+        for query, params in expansion.queries():
+            for row in expansion.rows(await self._read(query, **params)):
+                yield row
+
+    async def query_path(self, start_name: str, end_name: str, max_depth: int = 3,
+                         start_type: str = None, end_type: str = None) -> List[Dict]:
+        """查询两实体间路径"""
+        return (await self.find_paths(start_name, end_name, max_depth, start_type, end_type))['paths']
+
+    async def find_paths(self, start_name: str, end_name: str, max_depth: int = 3,
+                         start_type: str = None, end_type: str = None,
+                         relations: List[str] = None, labels: List[str] = None, k: int = 10,
+                         max_expansions: int = None, timeout: float = None) -> Dict:
+        """k最短路径查询，返回 {'paths': [...], 'truncated': bool}
+
+        timeout 作为每条语句的事务超时在服务端执行；max_expansions 无法在服务端统计，传入时抛出 ValueError。
+        """
+        check_path_budget(max_expansions, timeout)
+        start_name = self.normalizer.canonical_name(start_name, start_type)
+        end_name = self.normalizer.canonical_name(end_name, end_type)
+        search = PathSearch(self.schema.entity_types, start_name, end_name, max_depth, k,
+                            start_type, end_type, relations, labels, timeout)
+        for query, params, step_timeout in search.steps():
+            try:
+                search.add(await self._read_timed(query, step_timeout, params))
+            except Neo4jError as e:
+                if not _is_timeout(e):
+                    raise
+                search.truncated = True
+                break
+        return search.result()
+
+    async def get_statistics(self, degree_histogram: bool = False, sources: bool = False) -> Dict:
+        """获取图谱统计信息（计数存储，与图规模无关；可选来源计数和度分布）"""
+        tokens = (await self._read(TOKENS_QUERY))[0]
+        labels, types = tokens['labels'], tokens['types']
+        query = count_store_query(labels, types)
+        entities, relations = count_store_result(await self._read(query) if query else [], labels, types)
+        self.stats.expire_stale(sum(relations.values()))
+        if sources and not self.stats.tracks_sources:
+            self.stats.seed_sources({r['source']: r['count'] for r in await self._read(SOURCE_COUNTS_QUERY)})
+        if degree_histogram and not self.stats.tracks_degrees:
+            self.stats.seed_degrees(((r['type'], r['name']), r['degree']) for r in await self._read(DEGREE_QUERY))
+        return self.stats.report(entities, relations, degree_histogram, sources)
+
+    async def entity_names(self) -> List[Tuple[str, str, List[str]]]:
+        """全部实体的 (类型, 名称, 别名列表)，供模糊检索建索引"""
+        return [(r['type'], r['name'], r['aliases']) for r in await self._read(ENTITY_NAMES_QUERY)]
+
+    async def clear_graph(self):
+        """清空图谱（慎用）"""
+        await self._write("MATCH (n) DETACH DELETE n")
+        self.stats.clear()
+        graph_cache.clear()
+
+
+# 全局实例（首次使用时才创建驱动，驱动在首次查询时才建立连接）
+async_kg_store = LazyProxy(AsyncDriverGraphStore, 'async_kg_store')
@@ -2,9 +2,21 @@
 知识图谱存储模块 - Neo4j图数据库操作
 """
 from py2neo import Graph, Node, Relationship, NodeMatcher
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
 import os
+import time
 from dotenv import load_dotenv
+from src.storage.cypher import (
+    DEGREE_QUERY, ENTITY_NAMES_QUERY, SOURCE_COUNTS_QUERY, TOKENS_QUERY, count_store_query, count_store_result,
+    bulk_triples_query, check_path_budget, entity_relations_query, iter_triple_batches, new_bulk_report,
+    merge_entity_query, merged_sources, record_batch_result, triple_row, validate_triple,
+    NeighborhoodExpansion, PathSearch
+)
+from src.storage.schema import GraphSchema
+from src.storage.cache import graph_cache
+from src.storage.statistics import GraphStatistics
+from src.utils.lazy import LazyProxy
+from src.extraction.entity_normalizer import entity_normalizer
 
 load_dotenv()
 
@@ -17,16 +29,40 @@ class KnowledgeGraphStore:
         self.password = password or os.getenv('NEO4J_PASSWORD', 'password')
         self.graph = Graph(self.uri, auth=(self.user, self.password))
         self.matcher = NodeMatcher(self.graph)
+        self._schema = None
+        self.stats = GraphStatistics(track_counts=False)
+        self.normalizer = entity_normalizer
+    
+    @property
+    def schema(self) -> GraphSchema:
+        if self._schema is None:
+            self._schema = GraphSchema()
+        return self._schema
+    
+    def _run(self, query: str, **params) -> List[Dict]:
+        return self.graph.run(query, **params).data()
+    
+    def ensure_schema(self) -> Dict:
+        """创建唯一约束和全文索引（幂等）"""
+        return self.schema.ensure(self._run)
+    
+    def missing_indexes(self) -> List[str]:
+        """返回缺失或未上线的约束/索引"""
+        return self.schema.missing(self._run)
     
     def create_entity(self, entity_type: str, properties: Dict) -> Node:
-        """创建实体节点"""
-        node = Node(entity_type, **properties)
-        self.graph.create(node)
+        """创建或合并实体节点（按类型和名称 MERGE，其余属性覆盖；名称和 aliases 登记到归一化索引，别名写法归一为规范名称）"""
+        if not properties.get('name'):
+            raise ValueError("entity name is required")
+        _, name = self.normalizer.add(entity_type, properties['name'], properties.get('aliases') or ())
+        properties = {**properties, 'name': name}
+        node = self.graph.run(merge_entity_query(entity_type), name=name, properties=properties).evaluate()
+        graph_cache.invalidate_entities([name])
         return node
     
     def get_entity(self, entity_type: str, name: str) -> Optional[Node]:
         """根据名称获取实体"""
-        return self.matcher.match(entity_type, name=name).first()
+        return self.matcher.match(entity_type, name=self.normalizer.canonical_name(name, entity_type)).first()
     
     def create_relationship(self, from_node: Node, relation_type: str, to_node: Node, properties: Dict = None):
         """创建关系"""
@@ -34,61 +70,125 @@ class KnowledgeGraphStore:
         self.graph.create(rel)
         return rel
     
-    def add_triple(self, head_name: str, head_type: str, relation: str, tail_name: str, tail_type: str, properties: Dict = None):
-        """添加三元组"""
-        head = self.get_entity(head_type, head_name)
-        if not head:
-            head = self.create_entity(head_type, {'name': head_name})
+    def add_triple(self, head_name: str, head_type: str, relation: str, tail_name: str, tail_type: str, properties: Dict = None) -> bool:
+        """添加三元组（幂等：已存在同一关系时合并置信度和来源），返回是否新插入"""
+        triple = {'head': head_name, 'head_type': head_type, 'relation': relation,
+                  'tail': tail_name, 'tail_type': tail_type, 'properties': properties}
+        validate_triple(triple)
+        head_name = self.normalizer.canonical_name(head_name, head_type)
+        tail_name = self.normalizer.canonical_name(tail_name, tail_type)
+        rows = [triple_row(head_name, tail_name, properties)]
+        records = self.graph.run(bulk_triples_query(head_type, relation, tail_type), rows=rows).data()
+        inserted = record_batch_result(new_bulk_report(), rows, records)
+        self.stats.record_rows(relation, head_type, tail_type, inserted)
+        self.stats.record_sources(merged_sources(records))
+        graph_cache.invalidate_entities([head_name, tail_name])
+        return bool(inserted)
+    
+    def bulk_add_triples(self, triples: Iterable[Dict], batch_size: int = 5000) -> Dict:
+        """批量添加三元组
+
+        按 (head_type, relation, tail_type) 分组，每组攒满 batch_size 行后
+        以一个 UNWIND 事务幂等写入。返回插入/更新/拒绝数、吞吐量和各批次失败信息。
+        """
+        report = new_bulk_report()
+        start_time = time.time()
         
-        tail = self.get_entity(tail_type, tail_name)
-        if not tail:
-            tail = self.create_entity(tail_type, {'name': tail_name})
+        for key, rows in iter_triple_batches(triples, batch_size, report, self.normalizer.canonical_name):
+            self._write_triple_batch(key, rows, report)
         
-        return self.create_relationship(head, relation, tail, properties)
+        report['elapsed'] = time.time() - start_time
+        report['rate'] = report['imported'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+        return report
+    
+    def _write_triple_batch(self, key: Tuple[str, str, str], rows: List[Dict], report: Dict):
+        """在一个事务中写入同一类型的一批三元组"""
+        report['batches'] += 1
+        try:
+            query = bulk_triples_query(*key)
+            tx = self.graph.begin()
+            try:
+                records = tx.run(query, rows=rows).data()
+                self.graph.commit(tx)
+            except Exception:
+                self.graph.rollback(tx)
+                raise
+            inserted = record_batch_result(report, rows, records)
+            self.stats.record_rows(key[1], key[0], key[2], inserted)
+            self.stats.record_sources(merged_sources(records))
+            graph_cache.invalidate_entities(name for row in rows for name in (row['head'], row['tail']))
+        except Exception as e:
+            report['failed'] += len(rows)
+            report['failures'].append({
+                'batch': report['batches'],
+                'key': key,
+                'size': len(rows),
+                'error': str(e)
+            })
     
-    def query_by_entity(self, entity_name: str) -> List[Dict]:
+    def query_by_entity(self, entity_name: str, entity_type: str = None) -> List[Dict]:
         """查询实体相关关系"""
-        query = """
-        MATCH (n)-[r]-(m)
-        WHERE n.name = $name
-        RETURN n, r, m
-        """
-        results = self.graph.run(query, name=entity_name).data()
+        query = entity_relations_query(self.schema.entity_types, entity_type)
+        results = self.graph.run(query, name=self.normalizer.canonical_name(entity_name, entity_type)).data()
         return results
+
+    def iter_neighborhood(self, entity_name: str, entity_type: str = None, depth: int = 1,
+                          fanout: Iterable[int] = (50,), relations: List[str] = None,
+                          labels: List[str] = None) -> Iterator[Dict]:
+        """多跳邻域展开，逐行产出 {'hop', 'n', 'r', 'm'}"""
+        entity_name = self.normalizer.canonical_name(entity_name, entity_type)
+        expansion = NeighborhoodExpansion(self.schema.entity_types, entity_name, entity_type, depth,
+                                          tuple(fanout), relations, labels)
+        for query, params in expansion.queries():
+            yield from expansion.rows(self.graph.run(query, **params).data())
     
-    def query_path(self, start_name: str, end_name: str, max_depth: int = 3) -> List[Dict]:
+    def query_path(self, start_name: str, end_name: str, max_depth: int = 3,
+                   start_type: str = None, end_type: str = None) -> List[Dict]:
         """查询两实体间路径"""
-        query = """
-        MATCH path = (start)-[*1..{max_depth}]-(end)
-        WHERE start.name = $start_name AND end.name = $end_name
-        RETURN path
-        LIMIT 10
-        """.format(max_depth=max_depth)
-        return self.graph.run(query, start_name=start_name, end_name=end_name).data()
-    
-    def get_statistics(self) -> Dict:
-        """获取图谱统计信息"""
-        stats = {}
-        
-        # 实体数量
-        entity_counts = self.graph.run("""
-            MATCH (n)
-            RETURN labels(n)[0] as type, count(*) as count
-        """).data()
-        stats['entities'] = {item['type']: item['count'] for item in entity_counts}
+        return self.find_paths(start_name, end_name, max_depth, start_type, end_type)['paths']
+
+    def find_paths(self, start_name: str, end_name: str, max_depth: int = 3,
+                   start_type: str = None, end_type: str = None,
+                   relations: List[str] = None, labels: List[str] = None, k: int = 10,
+                   max_expansions: int = None, timeout: float = None) -> Dict:
+        """k最短路径查询，返回 {'paths': [...], 'truncated': bool}
+
+        py2neo 无法设置单条语句的事务超时，服务端也无法统计扩展次数，
+        传入 timeout 或 max_expansions 时抛出 ValueError（需要预算时使用 DriverGraphStore）。
+        """
+        check_path_budget(max_expansions, timeout, supports_timeout=False)
+        start_name = self.normalizer.canonical_name(start_name, start_type)
+        end_name = self.normalizer.canonical_name(end_name, end_type)
+        search = PathSearch(self.schema.entity_types, start_name, end_name, max_depth, k,
+                            start_type, end_type, relations, labels)
+        for query, params, _ in search.steps():
+            search.add(self.graph.run(query, **params).data())
+        return search.result()
+    
+    def get_statistics(self, degree_histogram: bool = False, sources: bool = False) -> Dict:
+        """获取图谱统计信息（计数存储，与图规模无关；可选来源计数和度分布）"""
+        tokens = self.graph.run(TOKENS_QUERY).data()[0]
+        labels, types = tokens['labels'], tokens['types']
+        query = count_store_query(labels, types)
+        entities, relations = count_store_result(self.graph.run(query).data() if query else [], labels, types)
         
-        # 关系数量
-        relation_counts = self.graph.run("""
-            MATCH ()-[r]-()
-            RETURN type(r) as type, count(*) as count
-        """).data()
-        stats['relations'] = {item['type']: item['count'] for item in relation_counts}
+        self.stats.expire_stale(sum(relations.values()))
+        if sources and not self.stats.tracks_sources:
+            self.stats.seed_sources({r['source']: r['count'] for r in self.graph.run(SOURCE_COUNTS_QUERY)})
+        if degree_histogram and not self.stats.tracks_degrees:
+            self.stats.seed_degrees(((r['type'], r['name']), r['degree']) for r in self.graph.run(DEGREE_QUERY))
         
-        return stats
+        return self.stats.report(entities, relations, degree_histogram, sources)
+    
+    def entity_names(self) -> List[Tuple[str, str, List[str]]]:
+        """全部实体的 (类型, 名称, 别名列表)，供模糊检索建索引"""
+        return [(r['type'], r['name'], r['aliases']) for r in self._run(ENTITY_NAMES_QUERY)]
     
     def clear_graph(self):
         """清空图谱（慎用）"""
         self.graph.run("MATCH (n) DETACH DELETE n")
+        self.stats.clear()
+        graph_cache.clear()
 
-# 全局实例
-kg_store = KnowledgeGraphStore()
+# 全局实例（首次使用时才连接数据库）
+kg_store = LazyProxy(KnowledgeGraphStore, 'kg_store')
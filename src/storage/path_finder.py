@@ -0,0 +1,149 @@
+"""
+路径查找模块 - 双向BFS最短路径与k最短路径
+"""
+import heapq
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# neighbors(node) -> [(邻居节点, 边编号), ...]
+NeighborFn = Callable[[int], Iterable[Tuple[int, int]]]
+
+Path = Tuple[Tuple[int, ...], Tuple[int, ...]]
+
+
+class SearchBudgetExceeded(Exception):
+    """扩展次数或时间超出预算"""
+
+
+class SearchBudget:
+    """单次查询的扩展预算与超时"""
+
+    def __init__(self, max_expansions: Optional[int] = None, timeout: Optional[float] = None):
+        self.max_expansions = max_expansions
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.expansions = 0
+
+    def tick(self):
+        self.expansions += 1
+        if self.max_expansions is not None and self.expansions > self.max_expansions:
+            raise SearchBudgetExceeded('expansion budget exceeded')
+        # 每扩展64个节点检查一次时间，避免频繁调用时钟
+        if self.deadline is not None and self.expansions & 63 == 0 and time.monotonic() > self.deadline:
+            raise SearchBudgetExceeded('timeout')
+
+
+class PathFinder:
+    """基于邻接函数的无向路径查找
+
+    neighbors 返回已按关系类型过滤的邻接；node_allowed 过滤中间节点（如按标签），
+    起点和终点不受节点过滤限制。
+    """
+
+    def __init__(self, neighbors: NeighborFn, node_allowed: Optional[Callable[[int], bool]] = None):
+        self.neighbors = neighbors
+        self.node_allowed = node_allowed
+
+    def shortest_path(self, source: int, target: int, max_depth: int, budget: SearchBudget,
+                      banned_nodes: Set[int] = frozenset(), banned_edges: Set[int] = frozenset()) -> Optional[Path]:
+        """双向BFS，返回 (节点序列, 边序列)；不存在长度不超过max_depth的路径时返回None"""
+        if source == target:
+            return (source,), ()
+
+        # 节点 -> (前驱, 边, 深度)
+        forward = {source: (None, None, 0)}
+        backward = {target: (None, None, 0)}
+        frontier_f, frontier_b = [source], [target]
+        depth_f = depth_b = 0
+        node_allowed = self.node_allowed
+
+        while frontier_f and frontier_b and depth_f + depth_b < max_depth:
+            # 总是扩展较小的一侧
+            expand_forward = len(frontier_f) <= len(frontier_b)
+            frontier, visited, other = (frontier_f, forward, backward) if expand_forward else (frontier_b, backward, forward)
+            depth = (depth_f if expand_forward else depth_b) + 1
+            endpoint = target if expand_forward else source
+
+            best = None
+            next_frontier = []
+            for node in frontier:
+                budget.tick()
+                for neighbor, edge in self.neighbors(node):
+                    if neighbor in visited or neighbor in banned_nodes or edge in banned_edges:
+                        continue
+                    if node_allowed is not None and neighbor != endpoint and not node_allowed(neighbor):
+                        continue
+                    visited[neighbor] = (node, edge, depth)
+                    next_frontier.append(neighbor)
+                    if neighbor in other:
+                        length = depth + other[neighbor][2]
+                        if length <= max_depth and (best is None or length < best[0]):
+                            best = (length, neighbor)
+
+            if best is not None:
+                return self._join(best[1], forward, backward)
+
+            if expand_forward:
+                frontier_f, depth_f = next_frontier, depth
+            else:
+                frontier_b, depth_b = next_frontier, depth
+        return None
+
+    @staticmethod
+    def _join(meet: int, forward: Dict, backward: Dict) -> Path:
+        nodes, edges = [meet], []
+        node = meet
+        while forward[node][0] is not None:
+            prev, edge, _ = forward[node]
+            nodes.append(prev)
+            edges.append(edge)
+            node = prev
+        nodes.reverse()
+        edges.reverse()
+        node = meet
+        while backward[node][0] is not None:
+            prev, edge, _ = backward[node]
+            nodes.append(prev)
+            edges.append(edge)
+            node = prev
+        return tuple(nodes), tuple(edges)
+
+    def k_shortest_paths(self, source: int, target: int, k: int, max_depth: int,
+                         budget: SearchBudget) -> Tuple[List[Path], bool]:
+        """Yen算法求k条最短简单路径，返回 (路径列表, 是否因预算截断)"""
+        paths: List[Path] = []
+        try:
+            first = self.shortest_path(source, target, max_depth, budget)
+            if first is None or not first[1]:
+                return paths, False
+            paths.append(first)
+
+            candidates = []
+            seen = {first}
+            while len(paths) < k:
+                last_nodes, last_edges = paths[-1]
+                for i in range(len(last_nodes) - 1):
+                    spur = last_nodes[i]
+                    root_nodes, root_edges = last_nodes[:i + 1], last_edges[:i]
+
+                    # 禁用与已有路径共享同一前缀（节点和边都相同）的下一条边，以及前缀上的节点；
+                    # 多重图中同一对节点间可有多条边，只比较节点会误禁其他前缀的路径
+                    banned_edges = {
+                        edges[i] for nodes, edges in paths
+                        if len(edges) > i and nodes[:i + 1] == root_nodes and edges[:i] == root_edges
+                    }
+                    banned_nodes = set(root_nodes[:-1])
+
+                    spur_path = self.shortest_path(spur, target, max_depth - i, budget, banned_nodes, banned_edges)
+                    if spur_path is None:
+                        continue
+                    path = (root_nodes[:-1] + spur_path[0], root_edges + spur_path[1])
+                    if path not in seen:
+                        seen.add(path)
+                        heapq.heappush(candidates, (len(path[1]), path))
+
+                if not candidates:
+                    break
+                paths.append(heapq.heappop(candidates)[1])
+        except SearchBudgetExceeded:
+            return paths, True
+        return paths, False
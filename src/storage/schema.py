@@ -0,0 +1,74 @@
+"""
+图谱模式管理模块 - 唯一约束与索引的声明、创建和校验
+"""
+from typing import Callable, Dict, List, Optional
+
+from src.storage.cypher import check_identifier
+
+
+def default_entity_types() -> List[str]:
+    """实体类型以 MedicalNER.ENTITY_TYPES 为准"""
+    from src.extraction.ner import MedicalNER
+    return list(MedicalNER.ENTITY_TYPES)
+
+
+class GraphSchema:
+    """知识图谱模式
+
+    每个实体类型一个 (label, name) 唯一约束（同时提供name上的范围索引），
+    另有一个覆盖全部实体类型 name/aliases 的全文索引。
+    所有语句均带 IF NOT EXISTS，可在每次启动时重复执行。
+    """
+
+    FULLTEXT_INDEX = 'entity_name_fulltext'
+    FULLTEXT_PROPERTIES = ['name', 'aliases']
+
+    def __init__(self, entity_types: Optional[List[str]] = None):
+        self.entity_types = [check_identifier(t) for t in (entity_types or default_entity_types())]
+
+    @staticmethod
+    def constraint_name(label: str) -> str:
+        return f'{label.lower()}_name_unique'
+
+    def statements(self) -> Dict[str, str]:
+        """返回 {约束/索引名: 创建语句}"""
+        statements = {}
+        for label in self.entity_types:
+            name = self.constraint_name(label)
+            statements[name] = (
+                f'CREATE CONSTRAINT {name} IF NOT EXISTS '
+                f'FOR (n:`{label}`) REQUIRE n.name IS UNIQUE'
+            )
+
+        labels = '|'.join(f'`{label}`' for label in self.entity_types)
+        properties = ', '.join(f'n.{p}' for p in self.FULLTEXT_PROPERTIES)
+        statements[self.FULLTEXT_INDEX] = (
+            f'CREATE FULLTEXT INDEX {self.FULLTEXT_INDEX} IF NOT EXISTS '
+            f'FOR (n:{labels}) ON EACH [{properties}]'
+        )
+        return statements
+
+    def ensure(self, run: Callable[..., List[Dict]]) -> Dict:
+        """创建缺失的约束和索引
+
+        run: 执行Cypher并返回记录字典列表的函数
+        """
+        report = {'applied': [], 'failed': {}}
+        for name, statement in self.statements().items():
+            try:
+                run(statement)
+                report['applied'].append(name)
+            except Exception as e:
+                # 已有重复数据时唯一约束会创建失败，记录后继续
+                report['failed'][name] = str(e)
+        return report
+
+    def missing(self, run: Callable[..., List[Dict]]) -> List[str]:
+        """返回尚未创建或尚未上线的约束/索引名称"""
+        existing = {}
+        for record in run('SHOW INDEXES YIELD name, state'):
+            existing[record['name']] = record['state']
+        for record in run('SHOW CONSTRAINTS YIELD name, ownedIndex'):
+            existing[record['name']] = existing.get(record['ownedIndex'], 'ONLINE')
+
+        return [name for name in self.statements() if existing.get(name) != 'ONLINE']
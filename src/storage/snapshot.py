@@ -0,0 +1,291 @@
+"""
+图谱快照模块 - 可内存映射的二进制快照格式
+"""
+import argparse
+import bisect
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'DKGSNAP\x00'
+VERSION = 2
+
+# 段顺序固定；每段在文件头的段表中记录 (偏移, 字节数)
+SECTIONS = [
+    ('meta', None),
+    ('name_offsets', np.int64),
+    ('name_blob', np.uint8),
+    ('name_order', np.int32),
+    ('node_types', np.int16),
+    ('props_offsets', np.int64),
+    ('props_blob', np.uint8),
+    ('out_offsets', np.int32),
+    ('out_edges', np.int32),
+    ('out_targets', np.int32),
+    ('in_offsets', np.int32),
+    ('in_edges', np.int32),
+    ('in_targets', np.int32),
+    ('edge_src', np.int32),
+    ('edge_dst', np.int32),
+    ('edge_rel', np.int16),
+    ('edge_conf', np.float32),
+    ('edge_source', np.int32),
+    # 每条边合并进来的其余来源：偏移数组 + 来源编码（与 edge_source 共用 meta['sources']）
+    ('edge_sources_offsets', np.int64),
+    ('edge_sources', np.int32),
+    # 每条边的其余属性：每条一段JSON，空属性长度为0
+    ('edge_props_offsets', np.int64),
+    ('edge_props_blob', np.uint8),
+]
+
+_HEADER = struct.Struct('<8sII')
+_SECTION = struct.Struct('<QQ')
+_ALIGN = 8
+
+
+class StringTable:
+    """快照中的字符串表：偏移数组 + UTF-8字节块，按需解码"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, order: Optional[np.ndarray] = None):
+        self.offsets = offsets
+        self.blob = blob
+        # 按字节序排列的编号，用于二分查找
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, index: int) -> bytes:
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+    def __getitem__(self, index: int) -> str:
+        return self.raw(index).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value: str) -> List[int]:
+        """二分查找所有等于value的编号"""
+        target = value.encode('utf-8')
+        order = self.order
+        keys = _OrderedKeys(self, order)
+        lo = bisect.bisect_left(keys, target)
+        hi = bisect.bisect_right(keys, target, lo)
+        return [int(order[i]) for i in range(lo, hi)]
+
+
+class _OrderedKeys:
+    """供 bisect 使用的有序视图"""
+
+    def __init__(self, table: StringTable, order: np.ndarray):
+        self.table = table
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.table.raw(int(self.order[i]))
+
+
+class PropsTable:
+    """节点/边属性表：每个节点或边一段JSON，空属性长度为0"""
+
+    def __init__(self, strings: StringTable):
+        self.strings = strings
+
+    def get(self, node_id: int, default=None):
+        raw = self.strings.raw(node_id)
+        return json.loads(raw) if raw else default
+
+    def items(self):
+        for i in np.flatnonzero(np.diff(self.strings.offsets)).tolist():
+            yield i, self.get(i)
+
+
+class EdgeSourcesTable:
+    """边的附加来源表，接口与 Dict[边编号, 来源列表] 的读取部分一致"""
+
+    def __init__(self, offsets: np.ndarray, codes: np.ndarray, sources: List[str]):
+        self.offsets = offsets
+        self.codes = codes
+        self.sources = sources
+
+    def get(self, edge_id: int, default=None):
+        start, end = self.offsets[edge_id], self.offsets[edge_id + 1]
+        if start == end:
+            return default
+        return [self.sources[c] for c in self.codes[start:end].tolist()]
+
+    def items(self):
+        for edge_id in np.flatnonzero(np.diff(self.offsets)).tolist():
+            yield edge_id, self.get(edge_id)
+
+    def values(self):
+        for _, sources in self.items():
+            yield sources
+
+
+def _encode_strings(values) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def write_snapshot(store, path: str) -> Path:
+    """将 InMemoryGraphStore 写为快照文件"""
+    store._ensure_built()
+    num_nodes = len(store._names)
+    names = [store._names[i] for i in range(num_nodes)]
+    name_offsets, name_blob = _encode_strings(names)
+    encoded_names = [n.encode('utf-8') for n in names]
+    name_order = np.array(sorted(range(num_nodes), key=encoded_names.__getitem__), dtype=np.int32)
+
+    props = []
+    for i in range(num_nodes):
+        node_props = store._node_props.get(i)
+        props.append(json.dumps(node_props, ensure_ascii=False) if node_props else '')
+    props_offsets, props_blob = _encode_strings(props)
+
+    num_edges = int(len(store._edge_src))
+    sources = list(store._sources)
+    source_index = {s: i for i, s in enumerate(sources)}
+    edge_sources_offsets = np.zeros(num_edges + 1, dtype=np.int64)
+    edge_sources = []
+    for edge_id, extra in store._edge_extra_sources.items():
+        edge_sources_offsets[edge_id + 1] = len(extra)
+    np.cumsum(edge_sources_offsets, out=edge_sources_offsets)
+    for edge_id in np.flatnonzero(np.diff(edge_sources_offsets)).tolist():
+        for source in store._edge_extra_sources.get(edge_id):
+            edge_sources.append(store._intern(source, sources, source_index))
+
+    edge_props = [''] * num_edges
+    for edge_id, extra in store._edge_props.items():
+        if extra:
+            edge_props[edge_id] = json.dumps(extra, ensure_ascii=False)
+    edge_props_offsets, edge_props_blob = _encode_strings(edge_props)
+
+    meta = {
+        'num_nodes': num_nodes,
+        'num_edges': num_edges,
+        'types': list(store._types),
+        'relations': list(store._relations),
+        'sources': sources,
+        'entity_counts': {str(store._type_index[k]): v for k, v in store.stats.entities.items()},
+        'relation_counts': {str(store._relation_index[k]): v for k, v in store.stats.relations.items()},
+    }
+
+    arrays = {
+        'meta': np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+        'name_offsets': name_offsets,
+        'name_blob': name_blob,
+        'name_order': name_order,
+        'node_types': np.asarray(store._node_types, dtype=np.int16),
+        'props_offsets': props_offsets,
+        'props_blob': props_blob,
+        'out_offsets': store._out_offsets,
+        'out_edges': store._out_edges,
+        'out_targets': store._out_targets,
+        'in_offsets': store._in_offsets,
+        'in_edges': store._in_edges,
+        'in_targets': store._in_targets,
+        'edge_src': store._edge_src,
+        'edge_dst': store._edge_dst,
+        'edge_rel': store._edge_rel,
+        'edge_conf': store._edge_conf,
+        'edge_source': store._edge_source,
+        'edge_sources_offsets': edge_sources_offsets,
+        'edge_sources': np.asarray(edge_sources, dtype=np.int32),
+        'edge_props_offsets': edge_props_offsets,
+        'edge_props_blob': edge_props_blob,
+    }
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    header_size = _HEADER.size + _SECTION.size * len(SECTIONS)
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * header_size)
+        table = []
+        for name, dtype in SECTIONS:
+            data = arrays[name] if dtype is None else np.ascontiguousarray(arrays[name], dtype=dtype)
+            padding = (-f.tell()) % _ALIGN
+            f.write(b'\0' * padding)
+            table.append((f.tell(), data.nbytes))
+            f.write(data.tobytes())
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, len(SECTIONS)))
+        for offset, nbytes in table:
+            f.write(_SECTION.pack(offset, nbytes))
+    tmp_path.replace(path)
+    return path
+
+
+class GraphSnapshot:
+    """以 mmap 方式打开的只读快照
+
+    所有数组直接引用映射内存，多个工作进程打开同一文件时共享一份页缓存。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION or count != len(SECTIONS):
+            raise ValueError(f"Unsupported snapshot file: {self.path}")
+
+        self.arrays: Dict[str, np.ndarray] = {}
+        for i, (name, dtype) in enumerate(SECTIONS):
+            offset, nbytes = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            dtype = np.uint8 if dtype is None else dtype
+            count = nbytes // np.dtype(dtype).itemsize
+            self.arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+
+        self.meta = json.loads(self.arrays.pop('meta').tobytes())
+        self.names = StringTable(self.arrays['name_offsets'], self.arrays['name_blob'], self.arrays['name_order'])
+        self.props = PropsTable(StringTable(self.arrays['props_offsets'], self.arrays['props_blob']))
+        self.edge_sources = EdgeSourcesTable(self.arrays['edge_sources_offsets'], self.arrays['edge_sources'],
+                                             self.meta['sources'])
+        self.edge_props = PropsTable(StringTable(self.arrays['edge_props_offsets'], self.arrays['edge_props_blob']))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+
+def main():
+    """命令行入口：从数据文件或Neo4j生成快照"""
+    parser = argparse.ArgumentParser(description='生成图谱快照')
+    parser.add_argument('output', help='快照文件路径')
+    parser.add_argument('--data-dir', default='data/processed', help='medical_data.json / triples.csv 所在目录')
+    parser.add_argument('--from-neo4j', action='store_true', help='从Neo4j导出')
+    args = parser.parse_args()
+
+    from src.storage.memory_store import InMemoryGraphStore
+    if args.from_neo4j:
+        from src.storage.neo4j_driver_store import DriverGraphStore
+        source = DriverGraphStore()
+        try:
+            store = InMemoryGraphStore.from_neo4j(source)
+        finally:
+            source.close()
+    else:
+        store = InMemoryGraphStore.from_files(args.data_dir)
+
+    path = write_snapshot(store, args.output)
+    stats = store.get_statistics()
+    print(f"快照已保存: {path}")
+    print(f"实体: {stats['entities']}")
+    print(f"关系: {stats['relations']}")
+
+
+if __name__ == '__main__':
+    main()
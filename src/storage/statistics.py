@@ -0,0 +1,167 @@
+"""
+图谱统计模块 - 增量维护的计数器
+"""
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+class GraphStatistics:
+    """物化的图谱统计计数器
+
+    实体/关系按类型计数，随写入增量更新，读取与图规模无关。
+    Neo4j后端的实体/关系计数直接读取计数存储（track_counts=False），这里只维护可选项：
+    来源计数和度分布在首次请求时由存储全量统计一次（seed_*），之后随写入增量维护。
+    多个进程同时写同一个库时，其他进程的写入不经过本进程的计数器：每次读取前用计数存储的
+    关系总数调用 expire_stale，与本进程预期的总数不一致或超过 reseed_ttl 秒时丢弃可选项，
+    由存储重新全量统计（只改来源、不增减关系的写入由 reseed_ttl 兜底）。
+    """
+
+    def __init__(self, track_counts: bool = True, reseed_ttl: Optional[float] = None):
+        self.track_counts = track_counts
+        self.reseed_ttl = RESEED_TTL if reseed_ttl is None else reseed_ttl
+        self._lock = threading.Lock()
+        self.entities: Counter = Counter()
+        self.relations: Counter = Counter()
+        self.sources: Optional[Counter] = None
+        self.degrees: Optional[Dict[Hashable, int]] = None
+        self._histogram: Optional[Counter] = None
+        # 上次全量统计时的关系总数 + 此后本进程新增的关系数
+        self._expected_relations: Optional[int] = None
+        self._seeded_at = 0.0
+
+    @property
+    def tracks_sources(self) -> bool:
+        return self.sources is not None
+
+    @property
+    def tracks_degrees(self) -> bool:
+        return self.degrees is not None
+
+    # ---------- 增量更新 ----------
+
+    def record_entity(self, entity_type: str):
+        if self.track_counts:
+            with self._lock:
+                self.entities[entity_type] += 1
+
+    def record_relation(self, relation: str, head: Hashable, tail: Hashable, source: str = ''):
+        """记录一条新关系，head/tail 为度分布中的节点键"""
+        with self._lock:
+            if self.track_counts:
+                self.relations[relation] += 1
+            if self._expected_relations is not None:
+                self._expected_relations += 1
+            if self.sources is not None:
+                self.sources[source] += 1
+            if self.degrees is not None:
+                self._bump(head)
+                self._bump(tail)
+
+    def record_sources(self, sources: Iterable[str]):
+        """记录并入关系的附加来源（新关系的首个来源由 record_relation 记录）"""
+        if self.sources is None:
+            return
+        with self._lock:
+            for source in sources:
+                self.sources[source] += 1
+
+    def record_rows(self, relation: str, head_type: str, tail_type: str, rows: Iterable[Dict]):
+        """记录一批新插入的 bulk_triples_query 行（见 triple_row），节点键为 (类型, 名称)"""
+        if not self.track_counts and self.sources is None and self.degrees is None:
+            return
+        for row in rows:
+            self.record_relation(relation, (head_type, row['head']), (tail_type, row['tail']), row['source'] or '')
+            self.record_sources(s for s in row['sources'] if s != row['source'])
+
+    def _bump(self, node: Hashable):
+        degree = self.degrees.get(node, 0)
+        if degree:
+            self._histogram[degree] -= 1
+            if not self._histogram[degree]:
+                del self._histogram[degree]
+        self.degrees[node] = degree + 1
+        self._histogram[degree + 1] += 1
+
+    def clear(self):
+        """图谱清空后调用；已开启的可选项保持开启"""
+        with self._lock:
+            self.entities.clear()
+            self.relations.clear()
+            if self.sources is not None:
+                self.sources = Counter()
+            if self.degrees is not None:
+                self.degrees = {}
+                self._histogram = Counter()
+            if self._expected_relations is not None:
+                self._expected_relations = 0
+
+    # ---------- 初始化 ----------
+
+    def expire_stale(self, total_relations: int):
+        """按计数存储的关系总数检查可选项是否过期，过期则丢弃，随后的请求重新 seed_*"""
+        now = time.monotonic()
+        with self._lock:
+            if self.sources is not None or self.degrees is not None:
+                expired = self.reseed_ttl > 0 and now - self._seeded_at > self.reseed_ttl
+                if self._expected_relations == total_relations and not expired:
+                    return
+                self.sources = self.degrees = self._histogram = None
+            # 没有可选项时记下当前总数，作为接下来 seed_* 的基准
+            self._expected_relations = total_relations
+            self._seeded_at = now
+
+    def seed_counts(self, entities: Dict[str, int], relations: Dict[str, int]):
+        with self._lock:
+            self.entities = Counter(entities)
+            self.relations = Counter(relations)
+
+    def seed_sources(self, sources: Dict[str, int]):
+        with self._lock:
+            self.sources = Counter(sources)
+
+    def seed_degrees(self, degrees: Iterable[Tuple[Hashable, int]]):
+        """degrees 为 (节点键, 度) 序列，度为0的节点可省略"""
+        table = {node: int(degree) for node, degree in degrees if degree}
+        with self._lock:
+            self.degrees = table
+            self._histogram = Counter(table.values())
+
+    # ---------- 读取 ----------
+
+    def degree_histogram(self, total_entities: int) -> Dict[str, int]:
+        """按2的幂分桶的度分布，如 {'0': .., '1': .., '2-3': .., '4-7': ..}"""
+        with self._lock:
+            histogram = Counter({0: max(total_entities - len(self.degrees), 0)} if self.degrees is not None else {})
+            for degree, count in (self._histogram or {}).items():
+                histogram[1 << (degree.bit_length() - 1)] += count
+        buckets = {}
+        for low in sorted(histogram):
+            high = low * 2 - 1
+            buckets[str(low) if high <= low else f"{low}-{high}"] = histogram[low]
+        return buckets
+
+    def report(self, entities: Optional[Dict[str, int]] = None, relations: Optional[Dict[str, int]] = None,
+               degree_histogram: bool = False, sources: bool = False) -> Dict:
+        """组装 get_statistics 的返回值；entities/relations 缺省时使用本地计数"""
+        with self._lock:
+            entities = dict(self.entities if entities is None else entities)
+            relations = dict(self.relations if relations is None else relations)
+            source_counts = dict(self.sources) if sources and self.sources is not None else None
+        stats = {
+            'entities': {k: v for k, v in entities.items() if v},
+            'relations': {k: v for k, v in relations.items() if v},
+            'total_entities': sum(entities.values()),
+            'total_relations': sum(relations.values())
+        }
+        if source_counts is not None:
+            stats['sources'] = source_counts
+        if degree_histogram and self.degrees is not None:
+            stats['degree_histogram'] = self.degree_histogram(stats['total_entities'])
+        return stats
+
+
+# 来源计数和度分布的最长复用时间（秒），0 表示只按关系总数判断
+RESEED_TTL = float(os.getenv('STATS_RESEED_TTL', '600'))
@@ -0,0 +1,473 @@
+"""
+实体向量库模块 - 本地内存映射向量索引（暴力检索 + IVF粗量化）
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from src.extraction.entity_normalizer import fold
+from src.extraction.ner import MedicalNER
+from src.utils.lazy import LazyProxy
+
+# (实体类型, 规范名称, 别名列表)
+EntityEntry = Tuple[str, str, Sequence[str]]
+
+INDEX_VERSION = 1
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class HashingEncoder:
+    """字符n-gram特征哈希编码器
+
+    不依赖模型文件，离线可用；相似度反映字面相近（同字、同词根），不含语义。
+    """
+
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (1, 3)):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.dim = dim
+        self.fingerprint = f"hashing:{dim}:{ngram_range[0]}-{ngram_range[1]}"
+        self._vectorizer = HashingVectorizer(analyzer='char', preprocessor=fold, lowercase=False,
+                                             ngram_range=ngram_range, n_features=dim,
+                                             alternate_sign=True, norm='l2', dtype=np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 4096) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            out[start:start + batch_size] = self._vectorizer.transform(texts[start:start + batch_size]).toarray()
+        return out
+
+
+class TransformerEncoder:
+    """Transformer句向量编码器（按注意力掩码平均池化后L2归一化）
+
+    model_name 可以是本地目录，离线环境下预先下载模型即可。
+    """
+
+    def __init__(self, model_name: str, device: Optional[str] = None, max_length: int = 32):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        self._torch = torch
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(self.device).eval()
+        self.max_length = max_length
+        self.dim = self.model.config.hidden_size
+        self.fingerprint = f"transformer:{model_name}:{max_length}"
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        torch = self._torch
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        # 按长度排序后分批，减少每批的填充
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                batch = self.tokenizer([texts[i] for i in rows], padding=True, truncation=True,
+                                       max_length=self.max_length, return_tensors='pt').to(self.device)
+                hidden = self.model(**batch).last_hidden_state
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                pooled = torch.nn.functional.normalize(pooled, dim=1)
+                out[rows] = pooled.float().cpu().numpy()
+        return out
+
+
+class VectorStore(ABC):
+    """实体向量库接口
+
+    本地索引与外部向量服务（如Milvus）实现同一组方法，由 VECTOR_BACKEND 选择；
+    API 只依赖这里的方法。向量均为L2归一化，相似度为余弦（内积）。
+    未实现全部抽象方法的后端在实例化时即报错。
+    """
+
+    @property
+    @abstractmethod
+    def encoder(self):
+        """文本编码器（encode / dim / fingerprint），search 和未入库实体的 similar 使用"""
+
+    @property
+    @abstractmethod
+    def ready(self) -> bool:
+        """索引是否可查询"""
+
+    @abstractmethod
+    def build(self, entries: Iterable[EntityEntry], batch_size: int = 256) -> int:
+        """由 (类型, 名称, 别名) 序列重建索引，返回实体数"""
+
+    @abstractmethod
+    def vector_of(self, name: str, entity_type: Optional[str] = None) -> Optional[np.ndarray]:
+        """已入库实体的向量；未入库返回None"""
+
+    @abstractmethod
+    def search_vectors(self, vectors: np.ndarray, k: int = 10, entity_type: Optional[str] = None,
+                       exclude: Optional[Sequence[Tuple[str, str]]] = None) -> List[List[Dict]]:
+        """按向量批量检索最近邻，exclude 为每个查询要排除的 (类型, 名称)"""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """索引规模、编码器等状态"""
+
+    def close(self):
+        pass
+
+    def search(self, queries: List[str], k: int = 10, entity_type: Optional[str] = None) -> List[List[Dict]]:
+        """按文本批量检索"""
+        return self.search_vectors(self.encoder.encode(queries), k, entity_type)
+
+    def similar(self, name: str, entity_type: Optional[str] = None, k: int = 10) -> List[Dict]:
+        """与实体最相似的k个实体；实体未入库时按名称编码检索"""
+        vector = self.vector_of(name, entity_type)
+        if vector is None:
+            vector = self.encoder.encode([name])[0]
+        return self.search_vectors(vector[None, :], k, entity_type, exclude=[(entity_type, name)])[0]
+
+
+class LocalVectorStore(VectorStore):
+    """本地实体向量索引
+
+    目录布局：vectors.npy（float32，或 float16 以减半磁盘和页缓存占用、检索时逐块转换，
+    按IVF倒排表顺序存放，内存映射打开）、
+    entity_types.npy、names.json、meta.json，实体数不少于 ivf_min 时另有
+    centroids.npy 和 list_offsets.npy。实体数较少时逐块暴力计算内积；
+    较多时用球面k-means训练 nlist 个质心，查询只扫描与查询最接近的 nprobe 个倒排表，
+    每个倒排表在文件中连续，读取即一次顺序切片。
+    类型编码以 MedicalNER.ENTITY_TYPES 的顺序为前缀，其余类型依次追加。
+    """
+
+    def __init__(self, path: str, encoder, dtype: str = 'float32', nprobe: int = 16,
+                 ivf_min: int = 20000, scan_rows: int = 65536):
+        self.path = Path(path)
+        self._encoder = encoder
+        self.dtype = np.dtype(dtype)
+        self.nprobe = nprobe
+        self.ivf_min = ivf_min
+        self.scan_rows = scan_rows
+        self._lock = threading.Lock()
+        self._state = None
+        if (self.path / 'meta.json').exists():
+            self._load()
+
+    @property
+    def encoder(self):
+        return self._encoder
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    def __len__(self) -> int:
+        return 0 if self._state is None else len(self._state['names'])
+
+    # ---------- 建索引 ----------
+
+    def build(self, entries: Iterable[EntityEntry], batch_size: int = 256) -> int:
+        types = list(MedicalNER.ENTITY_TYPES)
+        type_index = {entity_type: i for i, entity_type in enumerate(types)}
+        names: List[str] = []
+        entity_types: List[int] = []
+        seen = set()
+        for entity_type, name, _ in entries:
+            if not name or (entity_type, name) in seen:
+                continue
+            seen.add((entity_type, name))
+            if entity_type not in type_index:
+                type_index[entity_type] = len(types)
+                types.append(entity_type)
+            names.append(name)
+            entity_types.append(type_index[entity_type])
+
+        tmp = self.path.with_name(f"{self.path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        count, dim = len(names), self.encoder.dim
+        codes = np.asarray(entity_types, dtype=np.int16)
+
+        # 分批编码写入内存映射文件，向量矩阵不必整体驻留内存
+        raw_path = tmp / 'raw.npy'
+        raw = np.lib.format.open_memmap(raw_path, mode='w+', dtype=self.dtype, shape=(count, dim))
+        for start in range(0, count, batch_size):
+            raw[start:start + batch_size] = self.encoder.encode(names[start:start + batch_size], batch_size)
+        raw.flush()
+
+        nlist = 0
+        if count >= self.ivf_min:
+            nlist = int(min(65536, max(16, 2 * np.sqrt(count))))
+            centroids = self._train_centroids(raw, nlist)
+            assign = np.concatenate([
+                self._assign(np.asarray(raw[start:start + self.scan_rows], dtype=np.float32), centroids)
+                for start in range(0, count, self.scan_rows)
+            ])
+            order = np.argsort(assign, kind='stable')
+            offsets = np.zeros(nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+            vectors = np.lib.format.open_memmap(tmp / 'vectors.npy', mode='w+', dtype=self.dtype, shape=(count, dim))
+            for start in range(0, count, self.scan_rows):
+                vectors[start:start + self.scan_rows] = raw[order[start:start + self.scan_rows]]
+            vectors.flush()
+            del vectors, raw
+            raw_path.unlink()
+            names = [names[i] for i in order]
+            codes = codes[order]
+            np.save(tmp / 'centroids.npy', centroids)
+            np.save(tmp / 'list_offsets.npy', offsets)
+        else:
+            del raw
+            raw_path.rename(tmp / 'vectors.npy')
+
+        np.save(tmp / 'entity_types.npy', codes)
+        with open(tmp / 'names.json', 'w', encoding='utf-8') as f:
+            json.dump(names, f, ensure_ascii=False)
+        meta = {
+            'version': INDEX_VERSION,
+            'encoder': self.encoder.fingerprint,
+            'dim': dim,
+            'dtype': self.dtype.name,
+            'count': count,
+            'nlist': nlist,
+            'types': types,
+            'built_at': time.time()
+        }
+        with open(tmp / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        # 新索引完整写出后再替换旧目录；已打开的内存映射在旧文件删除后仍然有效
+        with self._lock:
+            old = self.path.with_name(f"{self.path.name}.old-{os.getpid()}")
+            if self.path.exists():
+                self.path.rename(old)
+            tmp.rename(self.path)
+            shutil.rmtree(old, ignore_errors=True)
+        self._load()
+        return count
+
+    def _train_centroids(self, vectors: np.ndarray, nlist: int, iterations: int = 10) -> np.ndarray:
+        """球面k-means：在至多 32×nlist 行的样本上训练，质心L2归一化"""
+        rng = np.random.default_rng(0)
+        count = len(vectors)
+        sample_size = min(count, nlist * 32)
+        rows = np.sort(rng.choice(count, sample_size, replace=False))
+        sample = np.asarray(vectors[rows], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._assign(sample, centroids)
+            members = sparse.csr_matrix(
+                (np.ones(sample_size, dtype=np.float32), (assign, np.arange(sample_size))),
+                shape=(nlist, sample_size)
+            )
+            sums = np.asarray(members @ sample)
+            empty = np.flatnonzero(members.getnnz(axis=1) == 0)
+            # 空簇重新取随机样本点作为质心
+            sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            centroids = _normalize_rows(sums).astype(np.float32)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + self.scan_rows] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), self.scan_rows)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    def _load(self):
+        with open(self.path / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION or meta.get('encoder') != self.encoder.fingerprint:
+            print(f"向量索引 {self.path} 与当前编码器不一致，需要重建")
+            self._state = None
+            return
+        with open(self.path / 'names.json', 'r', encoding='utf-8') as f:
+            names = json.load(f)
+        codes = np.load(self.path / 'entity_types.npy')
+        types = meta['types']
+        state = {
+            'meta': meta,
+            'vectors': np.load(self.path / 'vectors.npy', mmap_mode='r'),
+            'names': names,
+            'entity_types': codes,
+            'types': types,
+            'type_index': {entity_type: i for i, entity_type in enumerate(types)},
+            'rows': {(types[code], name): row for row, (code, name) in enumerate(zip(codes.tolist(), names))},
+            'rows_by_name': {},
+            'centroids': None,
+            'list_offsets': None
+        }
+        for (entity_type, name), row in state['rows'].items():
+            state['rows_by_name'].setdefault(name, row)
+        if meta['nlist']:
+            state['centroids'] = np.load(self.path / 'centroids.npy')
+            state['list_offsets'] = np.load(self.path / 'list_offsets.npy')
+        with self._lock:
+            self._state = state
+
+    # ---------- 检索 ----------
+
+    def _row_of(self, state: Dict, name: str, entity_type: Optional[str]) -> Optional[int]:
+        if entity_type:
+            return state['rows'].get((entity_type, name))
+        return state['rows_by_name'].get(name)
+
+    def vector_of(self, name: str, entity_type: Optional[str] = None) -> Optional[np.ndarray]:
+        state = self._state
+        if state is None:
+            return None
+        row = self._row_of(state, name, entity_type)
+        return None if row is None else np.asarray(state['vectors'][row], dtype=np.float32)
+
+    def search_vectors(self, vectors: np.ndarray, k: int = 10, entity_type: Optional[str] = None,
+                       exclude: Optional[Sequence[Tuple[str, str]]] = None,
+                       nprobe: Optional[int] = None, exact: bool = False) -> List[List[Dict]]:
+        state = self._state
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if state is None or not len(state['names']):
+            return [[] for _ in queries]
+        type_code = None
+        if entity_type is not None:
+            type_code = state['type_index'].get(entity_type)
+            if type_code is None:
+                return [[] for _ in queries]
+
+        results = []
+        for i, query in enumerate(queries):
+            excluded = None
+            if exclude is not None and exclude[i] is not None:
+                excluded = self._row_of(state, exclude[i][1], exclude[i][0])
+            if state['centroids'] is None or exact:
+                rows, scores = self._scan(state, query, [(0, len(state['names']))], type_code, excluded, k)
+            else:
+                rows, scores = self._probe(state, query, nprobe or self.nprobe, type_code, excluded, k)
+            names, types, codes = state['names'], state['types'], state['entity_types']
+            results.append([
+                {'name': names[row], 'type': types[codes[row]], 'score': round(float(score), 6)}
+                for row, score in zip(rows, scores)
+            ])
+        return results
+
+    def _probe(self, state: Dict, query: np.ndarray, nprobe: int, type_code: Optional[int],
+               excluded: Optional[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """扫描最接近查询的 nprobe 个倒排表；类型过滤后不足k个时加倍 nprobe 重试"""
+        centroid_scores = state['centroids'] @ query
+        offsets = state['list_offsets']
+        nlist = len(centroid_scores)
+        while True:
+            nprobe = min(nprobe, nlist)
+            lists = np.sort(np.argpartition(-centroid_scores, nprobe - 1)[:nprobe])
+            ranges = [(offsets[j], offsets[j + 1]) for j in lists if offsets[j + 1] > offsets[j]]
+            rows, scores = self._scan(state, query, ranges, type_code, excluded, k)
+            if len(rows) >= k or nprobe >= nlist:
+                return rows, scores
+            nprobe *= 2
+
+    def _scan(self, state: Dict, query: np.ndarray, ranges: List[Tuple[int, int]],
+              type_code: Optional[int], excluded: Optional[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """逐块计算若干连续行区间与查询的内积，返回前k行及分数"""
+        vectors, codes = state['vectors'], state['entity_types']
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start, end in ranges:
+            for block in range(start, end, self.scan_rows):
+                stop = min(block + self.scan_rows, end)
+                scores = np.asarray(vectors[block:stop], dtype=np.float32) @ query
+                rows = np.arange(block, stop)
+                if type_code is not None:
+                    keep = codes[block:stop] == type_code
+                    rows, scores = rows[keep], scores[keep]
+                if excluded is not None and block <= excluded < stop:
+                    keep = rows != excluded
+                    rows, scores = rows[keep], scores[keep]
+                best_rows = np.concatenate([best_rows, rows])
+                best_scores = np.concatenate([best_scores, scores])
+                if len(best_scores) > k:
+                    top = np.argpartition(-best_scores, k - 1)[:k]
+                    best_rows, best_scores = best_rows[top], best_scores[top]
+        order = np.argsort(-best_scores, kind='stable')
+        return best_rows[order], best_scores[order]
+
+    def stats(self) -> Dict:
+        state = self._state
+        if state is None:
+            return {'path': str(self.path), 'ready': False, 'encoder': self.encoder.fingerprint}
+        meta = state['meta']
+        return {
+            'path': str(self.path),
+            'ready': True,
+            'encoder': meta['encoder'],
+            'entities': meta['count'],
+            'dim': meta['dim'],
+            'dtype': meta['dtype'],
+            'nlist': meta['nlist'],
+            'nprobe': self.nprobe,
+            'built_at': meta['built_at']
+        }
+
+    def close(self):
+        with self._lock:
+            self._state = None
+
+
+def create_encoder():
+    """EMBEDDING_MODEL 为空时使用字符哈希编码器，否则加载对应的Transformer模型"""
+    model = os.getenv('EMBEDDING_MODEL', '')
+    if model:
+        return TransformerEncoder(model, device=os.getenv('EMBEDDING_DEVICE') or None)
+    return HashingEncoder(int(os.getenv('EMBEDDING_DIM', '256')))
+
+
+def _create_vector_store() -> VectorStore:
+    backend = os.getenv('VECTOR_BACKEND', 'local')
+    if backend == 'local':
+        return LocalVectorStore(
+            os.getenv('VECTOR_INDEX_PATH', 'data/vectors/entities'),
+            create_encoder(),
+            dtype=os.getenv('VECTOR_DTYPE', 'float32'),
+            nprobe=int(os.getenv('VECTOR_NPROBE', '16'))
+        )
+    raise ValueError(f"不支持的向量库后端: {backend}")
+
+# 全局实例（首次使用时加载编码器和索引）
+entity_vectors = LazyProxy(_create_vector_store, 'entity_vectors')
+
+
+def main():
+    """命令行入口：为图谱实体建立向量索引"""
+    parser = argparse.ArgumentParser(description='建立实体向量索引')
+    parser.add_argument('--data-dir', default='data/processed', help='medical_data.json / triples.csv 所在目录')
+    parser.add_argument('--snapshot', help='从图谱快照读取实体')
+    parser.add_argument('--from-neo4j', action='store_true', help='从Neo4j读取实体')
+    parser.add_argument('--batch-size', type=int, default=256, help='编码批大小')
+    args = parser.parse_args()
+
+    from src.storage.memory_store import InMemoryGraphStore
+    if args.from_neo4j:
+        from src.storage.neo4j_driver_store import DriverGraphStore
+        source = DriverGraphStore()
+        try:
+            entries = source.entity_names()
+        finally:
+            source.close()
+    elif args.snapshot:
+        entries = InMemoryGraphStore.open_snapshot(args.snapshot).entity_names()
+    else:
+        entries = InMemoryGraphStore.from_files(args.data_dir).entity_names()
+
+    store = entity_vectors.get()
+    start = time.time()
+    count = store.build(entries, args.batch_size)
+    print(f"向量索引已保存: {store.stats()['path']}")
+    print(f"实体: {count}，耗时 {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+延迟初始化模块 - 线程安全的全局实例代理
+"""
+import threading
+from typing import Any, Callable
+
+
+class LazyProxy:
+    """全局实例的延迟初始化代理
+
+    首次访问属性时才调用工厂函数创建实例（如加载spaCy模型、连接数据库），
+    之后的属性访问直接转发给该实例；多线程同时首次访问时工厂只执行一次。
+    导入模块不再承担初始化开销，fork 出的子进程在父进程未初始化时各自初始化一次。
+    """
+
+    __slots__ = ('_factory', '_name', '_instance', '_lock')
+
+    def __init__(self, factory: Callable[[], Any], name: str = None):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name or getattr(factory, '__name__', 'instance'))
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> Any:
+        """返回实例，未创建时创建"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, '_instance', instance)
+        return instance
+
+    def reset(self):
+        """丢弃已创建的实例，下次访问时重新创建"""
+        with self._lock:
+            object.__setattr__(self, '_instance', None)
+
+    def __getattr__(self, attr: str) -> Any:
+        # 只有代理自身没有的属性才会走到这里
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self.get(), attr, value)
+
+    def __repr__(self) -> str:
+        state = repr(self._instance) if self.initialized else 'not initialized'
+        return f"<LazyProxy {self._name}: {state}>"
@@ -0,0 +1,161 @@
+"""
+数据下载模块测试 - 以本地 http.server 代替远端站点
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from src.data.fetcher import FetchError, Fetcher, HostRateLimiter, PubMedSource, iter_url_documents
+
+EFETCH_XML = b'''<PubmedArticleSet>
+<PubmedArticle><MedlineCitation><PMID>1</PMID><Article>
+<ArticleTitle>Metformin in <i>type 2</i> diabetes</ArticleTitle>
+<Abstract><AbstractText Label="BACKGROUND">Metformin lowers glucose.</AbstractText></Abstract>
+</Article></MedlineCitation></PubmedArticle>
+<PubmedArticle><MedlineCitation><PMID>2</PMID><Article>
+<ArticleTitle>Hypertension</ArticleTitle>
+</Article></MedlineCitation></PubmedArticle>
+</PubmedArticleSet>'''
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        hits = self.server.hits
+        hits[path] = hits.get(path, 0) + 1
+        if path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                return self._send(304, headers={'ETag': '"v1"'})
+            return self._send(200, b'hello', {'ETag': '"v1"', 'Content-Type': 'text/plain'})
+        if path == '/flaky':
+            if hits[path] < 3:
+                return self._send(503, b'busy', {'Retry-After': '0'})
+            return self._send(200, b'ok', {'Content-Type': 'text/plain'})
+        if path == '/down':
+            return self._send(503)
+        if path.startswith('/doc'):
+            return self._send(200, path.encode(), {'Content-Type': 'text/plain; charset=utf-8'})
+        if path == '/esearch.fcgi':
+            body = json.dumps({'esearchresult': {'idlist': ['1', '2']}}).encode()
+            return self._send(200, body, {'Content-Type': 'application/json'})
+        if path == '/efetch.fcgi':
+            return self._send(200, EFETCH_XML, {'Content-Type': 'text/xml'})
+        self._send(404)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.hits = {}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base = f'http://127.0.0.1:{httpd.server_port}'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = Fetcher(str(tmp_path / 'http'), rate_limiter=HostRateLimiter(0), backoff=0.01, max_age=0)
+    yield fetcher
+    fetcher.close()
+
+
+def test_conditional_request_reuses_cache_on_304(server, fetcher):
+    first = fetcher.fetch(server.base + '/etag')
+    second = fetcher.fetch(server.base + '/etag')
+    assert first['content'] == b'hello' and not first['from_cache']
+    assert second['content'] == b'hello' and second['not_modified']
+    assert fetcher.stats['not_modified'] == 1
+
+
+def test_fresh_cache_hit_skips_request(server, tmp_path):
+    fetcher = Fetcher(str(tmp_path / 'http'), rate_limiter=HostRateLimiter(0), max_age=3600)
+    fetcher.fetch(server.base + '/etag')
+    result = fetcher.fetch(server.base + '/etag')
+    assert result['from_cache'] and not result['not_modified']
+    assert server.hits['/etag'] == 1
+
+
+def test_retries_on_503(server, fetcher):
+    result = fetcher.fetch(server.base + '/flaky')
+    assert result['content'] == b'ok'
+    assert server.hits['/flaky'] == 3
+    assert fetcher.stats['retries'] == 2
+
+
+def test_404_is_not_retried(server, fetcher):
+    with pytest.raises(FetchError):
+        fetcher.fetch(server.base + '/missing')
+    assert server.hits['/missing'] == 1
+
+
+def test_retries_exhausted_falls_back_to_stale_cache(server, fetcher):
+    url = server.base + '/down'
+    with pytest.raises(FetchError):
+        fetcher.fetch(url)
+    assert server.hits['/down'] == fetcher.max_retries + 1
+
+    f, commit, _ = fetcher.cache.body_writer(url)
+    f.write(b'old')
+    commit({'url': url, 'status': 200, 'content_type': 'text/plain', 'encoding': None, 'fetched_at': 0})
+    result = fetcher.fetch(url)
+    assert result['stale'] and result['content'] == b'old'
+
+
+def test_retry_after_is_honoured_beyond_backoff_max(tmp_path):
+    class Response:
+        headers = {'Retry-After': '60'}
+
+    fetcher = Fetcher(str(tmp_path / 'http'), backoff_max=30, retry_after_max=600)
+    assert fetcher._delay(0, Response()) >= 60
+    assert fetcher._delay(10, None) <= 30
+    Response.headers = {'Retry-After': '100000'}
+    assert fetcher._delay(0, Response()) == 600
+
+
+def test_rate_limit_and_input_order(server):
+    fetcher = Fetcher(None, max_workers=8, rate_limiter=HostRateLimiter(5.0))
+    urls = [f'{server.base}/doc{i}' for i in range(10)]
+    start = time.monotonic()
+    results = list(fetcher.fetch_many(urls + [server.base + '/missing']))
+    elapsed = time.monotonic() - start
+    fetcher.close()
+    # 5次/秒、突发1：11个请求至少需要2秒
+    assert elapsed >= 1.9
+    assert [r['content'] for r in results[:10]] == [f'/doc{i}'.encode() for i in range(10)]
+    assert 'error' in results[10]
+
+
+def test_pubmed_documents(server, fetcher):
+    source = PubMedSource(fetcher, base_url=server.base)
+    documents = list(source.iter_documents(['diabetes', 'hypertension']))
+    assert documents == [
+        {'text': 'Metformin in type 2 diabetes\nBACKGROUND: Metformin lowers glucose.', 'source': 'pubmed:1'},
+        {'text': 'Hypertension', 'source': 'pubmed:2'},
+    ]
+    # 两个检索式返回相同的PMID，只下载一批
+    assert server.hits['/efetch.fcgi'] == 1
+
+
+def test_url_documents_skip_failures(server, fetcher):
+    documents = list(iter_url_documents(fetcher, [server.base + '/doc1', server.base + '/missing']))
+    assert documents == [{'text': '/doc1', 'source': server.base + '/doc1'}]
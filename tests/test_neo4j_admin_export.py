@@ -0,0 +1,103 @@
+"""
+neo4j-admin 导出模块测试 - 导出演示数据并检查文件
+"""
+import csv
+from pathlib import Path
+
+from src.data.neo4j_admin_export import (
+    Neo4jAdminExporter, export_for_neo4j_admin, read_entities_csv, read_triples_csv
+)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data' / 'processed'
+TRIPLES_CSV = str(DATA_DIR / 'triples.csv')
+ENTITIES_CSV = str(DATA_DIR / 'entities.csv')
+
+
+def _rows(path: Path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def _export(output_dir: Path):
+    return export_for_neo4j_admin(TRIPLES_CSV, ENTITIES_CSV, str(output_dir))
+
+
+def test_files_per_label_and_relation_type(tmp_path):
+    manifest = _export(tmp_path)
+    entities = list(read_entities_csv(ENTITIES_CSV))
+    triples = list(read_triples_csv(TRIPLES_CSV))
+
+    labels = {e['type'] for e in entities} | {t['head_type'] for t in triples} | {t['tail_type'] for t in triples}
+    relations = {t['relation'] for t in triples}
+    assert set(manifest['nodes']) == labels
+    assert set(manifest['relationships']) == relations
+    assert sum(manifest['relationships'].values()) == len(triples)
+
+    assert sorted(p.name for p in (tmp_path / 'nodes').iterdir()) == sorted(
+        name for label in labels for name in (f'{label}.csv', f'{label}.header.csv'))
+    assert sorted(p.name for p in (tmp_path / 'relationships').iterdir()) == sorted(
+        name for rel in relations for name in (f'{rel}.csv', f'{rel}.header.csv'))
+    assert f"--nodes=DISEASE={tmp_path / 'nodes' / 'DISEASE.header.csv'},{tmp_path / 'nodes' / 'DISEASE.csv'}" \
+        in manifest['command']
+
+
+def test_headers(tmp_path):
+    _export(tmp_path)
+    node_header = _rows(tmp_path / 'nodes' / 'DISEASE.header.csv')[0]
+    assert node_header[:2] == [':ID(Entity)', 'name']
+    assert 'aliases:string[]' in node_header
+    assert 'icd10' in node_header
+    assert 'type' not in node_header and 'name:string[]' not in node_header
+    # 所有标签共用同一份表头
+    assert all(_rows(p)[0] == node_header for p in (tmp_path / 'nodes').glob('*.header.csv'))
+
+    relationship_header = _rows(tmp_path / 'relationships' / 'HAS_SYMPTOM.header.csv')[0]
+    assert relationship_header == [':START_ID(Entity)', ':END_ID(Entity)', 'confidence:float', 'source:string']
+
+
+def test_ids_are_stable_and_resolve(tmp_path):
+    _export(tmp_path / 'a')
+    _export(tmp_path / 'b')
+    for path in (tmp_path / 'a').rglob('*.csv'):
+        assert path.read_bytes() == (tmp_path / 'b' / path.relative_to(tmp_path / 'a')).read_bytes()
+
+    # ID 按首次出现顺序从0连续分配
+    nodes = {}
+    for path in (tmp_path / 'a' / 'nodes').glob('*.csv'):
+        if not path.name.endswith('.header.csv'):
+            for row in _rows(path):
+                nodes[int(row[0])] = (path.stem, row[1])
+    assert sorted(nodes) == list(range(len(nodes)))
+    first = next(read_entities_csv(ENTITIES_CSV))
+    assert nodes[0] == (first['type'], first['name'])
+
+    resolved = []
+    for path in sorted((tmp_path / 'a' / 'relationships').glob('*.csv')):
+        if not path.name.endswith('.header.csv'):
+            resolved += [(nodes[int(r[0])], path.stem, nodes[int(r[1])]) for r in _rows(path)]
+    expected = [((t['head_type'], t['head']), t['relation'], (t['tail_type'], t['tail']))
+                for t in read_triples_csv(TRIPLES_CSV)]
+    assert sorted(resolved) == sorted(expected)
+
+
+def test_dedup_by_type_and_name(tmp_path):
+    with open(ENTITIES_CSV, 'r', encoding='utf-8') as f:
+        fields = next(csv.reader(f))
+    exporter = Neo4jAdminExporter(str(tmp_path), fields)
+    entities = list(read_entities_csv(ENTITIES_CSV))
+    exporter.add_entities(entities)
+    exporter.add_entities({**e, 'definition': 'changed'} for e in entities)
+    exporter.add_triples(read_triples_csv(TRIPLES_CSV))
+    manifest = exporter.close()
+
+    keys = {(e['type'], e['name']) for e in entities}
+    for t in read_triples_csv(TRIPLES_CSV):
+        keys.update({(t['head_type'], t['head']), (t['tail_type'], t['tail'])})
+    assert sum(manifest['nodes'].values()) == len(exporter.node_ids) == len(keys)
+
+    # 重复行保留首次出现的属性
+    definition = 2 + exporter.property_fields.index('definition')
+    rows = [row for path in (tmp_path / 'nodes').glob('*.csv') if not path.name.endswith('.header.csv')
+            for row in _rows(path)]
+    assert len(rows) == len(keys)
+    assert 'changed' not in {row[definition] for row in rows}
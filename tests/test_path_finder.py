@@ -0,0 +1,61 @@
+"""
+路径查找模块测试 - 与暴力枚举对照
+"""
+from collections import defaultdict
+
+from src.storage.path_finder import PathFinder, SearchBudget
+
+
+def _graph(edges):
+    """edges 为 (a, b) 列表，边编号即下标；同一对节点可出现多次（多重图）"""
+    adjacency = defaultdict(list)
+    for edge, (a, b) in enumerate(edges):
+        adjacency[a].append((b, edge))
+        adjacency[b].append((a, edge))
+    return lambda node: adjacency[node]
+
+
+def _all_paths(neighbors, source, target, max_depth):
+    found = []
+
+    def walk(node, nodes, edges):
+        if node == target:
+            found.append((tuple(nodes), tuple(edges)))
+            return
+        if len(edges) == max_depth:
+            return
+        for neighbor, edge in neighbors(node):
+            if neighbor not in nodes:
+                walk(neighbor, nodes + [neighbor], edges + [edge])
+
+    walk(source, [source], [])
+    return found
+
+
+def test_k_shortest_paths_with_parallel_edges():
+    # 0-1 之间两条边，1-2 之间两条边，另有 0-3-2 和 0-3-1 绕行
+    edges = [(0, 1), (0, 1), (1, 2), (1, 2), (0, 3), (3, 2), (3, 1)]
+    neighbors = _graph(edges)
+    expected = _all_paths(neighbors, 0, 2, 4)
+
+    paths, truncated = PathFinder(neighbors).k_shortest_paths(0, 2, 20, 4, SearchBudget())
+    assert not truncated
+    assert sorted(paths) == sorted(expected)
+    assert [len(e) for _, e in paths] == sorted(len(e) for _, e in expected)
+
+
+def test_k_shortest_paths_matches_brute_force_prefix():
+    edges = [(0, 1), (0, 1), (1, 2), (2, 3), (1, 3), (1, 3), (0, 4), (4, 3), (2, 4)]
+    neighbors = _graph(edges)
+    expected = sorted(len(e) for _, e in _all_paths(neighbors, 0, 3, 4))
+    for k in range(1, len(expected) + 2):
+        paths, truncated = PathFinder(neighbors).k_shortest_paths(0, 3, k, 4, SearchBudget())
+        assert not truncated
+        assert len(set(paths)) == len(paths)
+        assert [len(e) for _, e in paths] == expected[:k]
+
+
+def test_budget_truncates():
+    edges = [(i, i + 1) for i in range(50)]
+    paths, truncated = PathFinder(_graph(edges)).k_shortest_paths(0, 50, 1, 60, SearchBudget(max_expansions=5))
+    assert truncated and paths == []